@@ -7,22 +7,70 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 
-from typing import Dict, Any
+from typing import Dict, Any, List
 from agents.analysts.base import BaseAnalyst
 from utils.state import AgentState
+from utils.prompt_templates import register_prompt
 from utils.logger import get_logger
 from data_providers.fundamentals import FundamentalsDataProvider
 
 logger = get_logger(__name__)
 
+# 静态前缀（角色、规则、输出格式），修改后需提升版本号并运行 python -m utils.prompt_templates --update
+FUNDAMENTALS_ANALYSIS_PROMPT = register_prompt("fundamentals_analyst", "v1", """
+你是一位专业的加密货币基本面分析师。
+
+用户消息会给出分析目标（币种与交易对）以及真实的基本面数据、历史价格数据、项目评分与项目信息。
+请基于这些真实数据进行基本面分析，生成完整的中文基本面分析报告，包括：
+
+## 📊 项目基本信息
+- 币种名称
+- 市值排名与规模分析
+- 供应量结构与代币经济模型
+
+## 📈 基本面指标分析
+- 市值、成交量、流通量分析
+- 历史价格表现与当前估值水平
+- 项目评分与社区活跃度
+
+## 🔹 项目价值评估
+- 项目定位与竞争优势
+- 技术实力与开发活跃度
+- 社区建设与用户基础
+
+## 💭 投资价值分析
+- 长期投资价值评估
+- 风险因素分析
+- 投资建议（买入/持有/卖出，中文表达）
+
+要求：
+- 所有分析必须基于提供的真实数据
+- 投资建议必须使用中文（买入/持有/卖出）
+- 报告长度不少于600字
+- 分析要具体、专业、有说服力
+- 重点关注项目的长期价值和发展潜力
+""")
+
 
 class FundamentalsAnalyst(BaseAnalyst):
     """基本面分析师"""
     
+    writes = ("analysis_reports.fundamental",)
+    # 基本面变化慢，缓存6小时
+    llm_cache_ttl = 21600
+    
     def __init__(self, name: str = "Fundamentals Analyst"):
         super().__init__(name)
         self.fundamentals_provider = FundamentalsDataProvider()
     
+    def prefetch(self, symbols: List[str]):
+        """批量模式开始前一次性预取整批币种的市场快照（/coins/markets 每次请求最多 250 个币种）"""
+        self.fundamentals_provider.prefetch([AgentState(symbol).coin_name for symbol in symbols])
+    
+    async def aprefetch(self, symbols: List[str]):
+        """批量预取（异步）"""
+        await self.fundamentals_provider.aprefetch([AgentState(symbol).coin_name for symbol in symbols])
+    
     def process(self, state: AgentState) -> AgentState:
         """处理基本面分析"""
         try:
@@ -48,6 +96,29 @@ class FundamentalsAnalyst(BaseAnalyst):
             logger.error(f"{self.name} 分析失败: {e}")
             return state
     
+    async def aprocess(self, state: AgentState) -> AgentState:
+        """处理基本面分析（异步）"""
+        try:
+            logger.info(f"{self.name} 开始分析 {state.symbol}")
+            
+            fundamentals_data = await self.fundamentals_provider.aget_fundamentals_data(state.coin_name)
+            
+            if not fundamentals_data:
+                logger.error(f"无法获取 {state.coin_name} 的基本面数据")
+                return state
+            
+            prompt = self._create_fundamentals_analysis_prompt(state, fundamentals_data)
+            analysis_result = await self.acall_llm(prompt, template=FUNDAMENTALS_ANALYSIS_PROMPT)
+            
+            self.update_state_with_analysis(state, "fundamental", analysis_result)
+            
+            logger.info(f"{self.name} 完成 {state.symbol} 基本面分析")
+            return state
+            
+        except Exception as e:
+            logger.error(f"{self.name} 分析失败: {e}")
+            return state
+    
     def _generate_fundamentals_analysis(self, state: AgentState, fundamentals_data: Dict[str, Any]) -> str:
         """生成基本面分析报告"""
         
@@ -55,7 +126,7 @@ class FundamentalsAnalyst(BaseAnalyst):
         prompt = self._create_fundamentals_analysis_prompt(state, fundamentals_data)
         
         # 调用LLM生成分析
-        analysis = self.call_llm(prompt)
+        analysis = self.call_llm(prompt, template=FUNDAMENTALS_ANALYSIS_PROMPT)
         
         return analysis
     
@@ -85,8 +156,6 @@ class FundamentalsAnalyst(BaseAnalyst):
         categories = coin_info.get('categories', [])
         
         prompt = f"""
-你是一位专业的加密货币基本面分析师。
-
 分析目标：{state.coin_name}（交易对：{state.symbol}）
 
 📊 基本面数据：
@@ -111,34 +180,7 @@ class FundamentalsAnalyst(BaseAnalyst):
 - 项目描述：{description[:500]}...
 - 项目分类：{', '.join(categories) if categories else '未分类'}
 
-请基于以上真实数据进行基本面分析，生成完整的中文基本面分析报告，包括：
-
-## 📊 项目基本信息
-- 币种名称：{state.coin_name}
-- 市值排名与规模分析
-- 供应量结构与代币经济模型
-
-## 📈 基本面指标分析
-- 市值、成交量、流通量分析
-- 历史价格表现与当前估值水平
-- 项目评分与社区活跃度
-
-## 🔹 项目价值评估
-- 项目定位与竞争优势
-- 技术实力与开发活跃度
-- 社区建设与用户基础
-
-## 💭 投资价值分析
-- 长期投资价值评估
-- 风险因素分析
-- 投资建议（买入/持有/卖出，中文表达）
-
-要求：
-- 所有分析必须基于提供的真实数据
-- 投资建议必须使用中文（买入/持有/卖出）
-- 报告长度不少于600字
-- 分析要具体、专业、有说服力
-- 重点关注项目的长期价值和发展潜力
+请基于以上真实数据，按要求的结构生成基本面分析报告。
 """
 
         return prompt
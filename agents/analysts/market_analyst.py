@@ -10,15 +10,53 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 from typing import Dict, Any
 from agents.analysts.base import BaseAnalyst
 from utils.state import AgentState
+from utils.prompt_templates import register_prompt
 from utils.logger import get_logger
 from data_providers.market_data import MarketDataProvider
 
 logger = get_logger(__name__)
 
+# 静态前缀（角色、规则、输出格式），修改后需提升版本号并运行 python -m utils.prompt_templates --update
+TECHNICAL_ANALYSIS_PROMPT = register_prompt("market_analyst", "v1", """
+你是一位专业的加密货币技术分析师。
+
+用户消息会给出分析目标（币种与交易对）、真实的市场数据、技术指标与支撑阻力位，价格以其中标注的计价货币为单位。
+请基于这些真实数据进行技术分析，生成完整的中文技术分析报告，包括：
+
+## 📊 币种基本信息
+- 币种名称与交易对
+- 当前价格、24小时涨跌幅、交易量
+
+## 📈 技术指标分析
+- MACD、RSI、布林带分析
+- 指标数值与含义解释
+
+## 📉 价格趋势分析
+- 短期/中期趋势方向
+- 关键支撑位与阻力位
+
+## 🔹 市场情绪分析
+- 基于技术指标的市场情绪判断
+
+## 💭 投资建议
+- 买入/持有/卖出建议（中文表达）
+- 简要说明风险或条件
+
+要求：
+- 所有分析必须基于提供的真实数据
+- 投资建议必须使用中文（买入/持有/卖出）
+- 报告长度不少于600字
+- 分析要具体、专业、有说服力
+""")
+
 
 class MarketAnalyst(BaseAnalyst):
     """技术分析师"""
     
+    writes = ("analysis_reports.technical",)
+    # 行情变化快，技术分析缓存5分钟
+    llm_cache_ttl = 300
+    
     def __init__(self, name: str = "Market Analyst"):
         super().__init__(name)
         self.market_provider = MarketDataProvider()
@@ -38,8 +76,31 @@ class MarketAnalyst(BaseAnalyst):
             # 生成技术分析报告
             analysis_result = self._generate_technical_analysis(state, market_data)
             
-            # 更新状态
-            self.update_state_with_analysis(state, "technical", analysis_result)
+            # 更新状态（附带行情数据中的当前价格，供交易员直接使用）
+            self.update_state_with_analysis(state, "technical", analysis_result, self._report_fields(market_data))
+            
+            logger.info(f"{self.name} 完成 {state.symbol} 技术分析")
+            return state
+            
+        except Exception as e:
+            logger.error(f"{self.name} 分析失败: {e}")
+            return state
+    
+    async def aprocess(self, state: AgentState) -> AgentState:
+        """处理技术分析（异步）"""
+        try:
+            logger.info(f"{self.name} 开始分析 {state.symbol}")
+            
+            market_data = await self.market_provider.aget_market_data(state.symbol)
+            
+            if not market_data:
+                logger.error(f"无法获取 {state.symbol} 的市场数据")
+                return state
+            
+            prompt = self._create_technical_analysis_prompt(state, market_data)
+            analysis_result = await self.acall_llm(prompt, template=TECHNICAL_ANALYSIS_PROMPT)
+            
+            self.update_state_with_analysis(state, "technical", analysis_result, self._report_fields(market_data))
             
             logger.info(f"{self.name} 完成 {state.symbol} 技术分析")
             return state
@@ -48,6 +109,10 @@ class MarketAnalyst(BaseAnalyst):
             logger.error(f"{self.name} 分析失败: {e}")
             return state
     
+    def _report_fields(self, market_data: Dict[str, Any]) -> Dict[str, Any]:
+        """写入技术分析报告的结构化字段"""
+        return {"current_price": market_data.get("current_price")}
+    
     def _generate_technical_analysis(self, state: AgentState, market_data: Dict[str, Any]) -> str:
         """生成技术分析报告"""
         
@@ -55,7 +120,7 @@ class MarketAnalyst(BaseAnalyst):
         prompt = self._create_technical_analysis_prompt(state, market_data)
         
         # 调用LLM生成分析
-        analysis = self.call_llm(prompt)
+        analysis = self.call_llm(prompt, template=TECHNICAL_ANALYSIS_PROMPT)
         
         return analysis
     
@@ -77,8 +142,6 @@ class MarketAnalyst(BaseAnalyst):
         support_levels = support_resistance.get('support_levels', [])
         
         prompt = f"""
-你是一位专业的加密货币技术分析师。
-
 分析目标：{state.coin_name}（交易对：{state.symbol}）
 
 📊 市场数据：
@@ -96,33 +159,7 @@ class MarketAnalyst(BaseAnalyst):
 - 阻力位：{resistance_levels}
 - 支撑位：{support_levels}
 
-请基于以上真实数据进行技术分析，生成完整的中文技术分析报告，包括：
-
-## 📊 币种基本信息
-- 币种名称：{state.coin_name}
-- 交易对：{state.symbol}
-- 当前价格、24小时涨跌幅、交易量
-
-## 📈 技术指标分析
-- MACD、RSI、布林带分析
-- 指标数值与含义解释
-
-## 📉 价格趋势分析
-- 短期/中期趋势方向
-- 关键支撑位与阻力位
-
-## 🔹 市场情绪分析
-- 基于技术指标的市场情绪判断
-
-## 💭 投资建议
-- 买入/持有/卖出建议（中文表达）
-- 简要说明风险或条件
-
-要求：
-- 所有分析必须基于提供的真实数据
-- 投资建议必须使用中文（买入/持有/卖出）
-- 报告长度不少于600字
-- 分析要具体、专业、有说服力
+请基于以上真实数据，按要求的结构生成技术分析报告。
 """
 
         return prompt
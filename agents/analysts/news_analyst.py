@@ -7,22 +7,70 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 
-from typing import Dict, Any
+from typing import Dict, Any, List
 from agents.analysts.base import BaseAnalyst
 from utils.state import AgentState
+from utils.prompt_templates import register_prompt
 from utils.logger import get_logger
 from data_providers.news_data import NewsDataProvider
 
 logger = get_logger(__name__)
 
+# 静态前缀（角色、规则、输出格式），修改后需提升版本号并运行 python -m utils.prompt_templates --update
+NEWS_ANALYSIS_PROMPT = register_prompt("news_analyst", "v1", """
+你是一位专业的加密货币新闻分析师。
+
+用户消息会给出分析目标（币种与交易对）、币种相关新闻与市场整体新闻标题，以及新闻情绪得分（-1到1，正值表示正面）与情绪统计。
+请基于这些真实新闻数据进行新闻分析，生成完整的中文新闻分析报告，包括：
+
+## 📰 新闻概览
+- 币种相关新闻数量与质量
+- 市场整体新闻环境
+- 重要新闻事件梳理
+
+## 📊 情绪分析
+- 币种相关新闻情绪解读
+- 市场整体情绪趋势
+- 情绪对价格的影响分析
+
+## 🔍 事件影响评估
+- 重要新闻事件对币种的影响
+- 市场整体新闻对币种的影响
+- 短期和长期影响预测
+
+## 💭 投资建议
+- 基于新闻情绪的投资建议（买入/持有/卖出，中文表达）
+- 风险提示与注意事项
+- 需要关注的后续新闻事件
+
+要求：
+- 所有分析必须基于提供的真实新闻数据
+- 投资建议必须使用中文（买入/持有/卖出）
+- 报告长度不少于600字
+- 分析要具体、专业、有说服力
+- 重点关注新闻对价格走势的影响
+""")
+
 
 class NewsAnalyst(BaseAnalyst):
     """新闻分析师"""
     
+    writes = ("analysis_reports.news",)
+    # 新闻缓存15分钟
+    llm_cache_ttl = 900
+    
     def __init__(self, name: str = "News Analyst"):
         super().__init__(name)
         self.news_provider = NewsDataProvider()
     
+    def prefetch(self, symbols: List[str]):
+        """批量模式每轮开始时拉取一次整批币种的新闻与市场整体新闻，本轮所有币种共享"""
+        self.news_provider.prefetch([AgentState(symbol).coin_name for symbol in symbols])
+    
+    async def aprefetch(self, symbols: List[str]):
+        """每轮拉取一次新闻（异步）"""
+        await self.news_provider.aprefetch([AgentState(symbol).coin_name for symbol in symbols])
+    
     def process(self, state: AgentState) -> AgentState:
         """处理新闻分析"""
         try:
@@ -48,6 +96,29 @@ class NewsAnalyst(BaseAnalyst):
             logger.error(f"{self.name} 分析失败: {e}")
             return state
     
+    async def aprocess(self, state: AgentState) -> AgentState:
+        """处理新闻分析（异步）"""
+        try:
+            logger.info(f"{self.name} 开始分析 {state.symbol}")
+            
+            news_data = await self.news_provider.aget_news_data(state.coin_name)
+            
+            if not news_data:
+                logger.error(f"无法获取 {state.coin_name} 的新闻数据")
+                return state
+            
+            prompt = self._create_news_analysis_prompt(state, news_data)
+            analysis_result = await self.acall_llm(prompt, template=NEWS_ANALYSIS_PROMPT)
+            
+            self.update_state_with_analysis(state, "news", analysis_result)
+            
+            logger.info(f"{self.name} 完成 {state.symbol} 新闻分析")
+            return state
+            
+        except Exception as e:
+            logger.error(f"{self.name} 分析失败: {e}")
+            return state
+    
     def _generate_news_analysis(self, state: AgentState, news_data: Dict[str, Any]) -> str:
         """生成新闻分析报告"""
         
@@ -55,7 +126,7 @@ class NewsAnalyst(BaseAnalyst):
         prompt = self._create_news_analysis_prompt(state, news_data)
         
         # 调用LLM生成分析
-        analysis = self.call_llm(prompt)
+        analysis = self.call_llm(prompt, template=NEWS_ANALYSIS_PROMPT)
         
         return analysis
     
@@ -82,8 +153,6 @@ class NewsAnalyst(BaseAnalyst):
         total_general_news = analysis_summary.get('total_general_news', 0)
         
         prompt = f"""
-你是一位专业的加密货币新闻分析师。
-
 分析目标：{state.coin_name}（交易对：{state.symbol}）
 
 📰 币种相关新闻（共{total_coin_news}条）：
@@ -93,7 +162,7 @@ class NewsAnalyst(BaseAnalyst):
 {chr(10).join([f"- {title}" for title in general_news_titles])}
 
 📊 新闻情绪分析：
-- 币种相关新闻情绪得分：{coin_sentiment_score:.3f} (-1到1，正值表示正面)
+- 币种相关新闻情绪得分：{coin_sentiment_score:.3f}
 - 市场整体新闻情绪得分：{general_sentiment_score:.3f}
 - 综合情绪得分：{overall_sentiment:.3f}
 
@@ -102,34 +171,7 @@ class NewsAnalyst(BaseAnalyst):
 - 币种负面新闻：{coin_sentiment.get('negative_count', 0)}条
 - 币种中性新闻：{coin_sentiment.get('neutral_count', 0)}条
 
-请基于以上真实新闻数据进行新闻分析，生成完整的中文新闻分析报告，包括：
-
-## 📰 新闻概览
-- 币种相关新闻数量与质量
-- 市场整体新闻环境
-- 重要新闻事件梳理
-
-## 📊 情绪分析
-- 币种相关新闻情绪解读
-- 市场整体情绪趋势
-- 情绪对价格的影响分析
-
-## 🔍 事件影响评估
-- 重要新闻事件对币种的影响
-- 市场整体新闻对币种的影响
-- 短期和长期影响预测
-
-## 💭 投资建议
-- 基于新闻情绪的投资建议（买入/持有/卖出，中文表达）
-- 风险提示与注意事项
-- 需要关注的后续新闻事件
-
-要求：
-- 所有分析必须基于提供的真实新闻数据
-- 投资建议必须使用中文（买入/持有/卖出）
-- 报告长度不少于600字
-- 分析要具体、专业、有说服力
-- 重点关注新闻对价格走势的影响
+请基于以上真实新闻数据，按要求的结构生成新闻分析报告。
 """
 
         return prompt
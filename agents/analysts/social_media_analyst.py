@@ -10,15 +10,55 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 from typing import Dict, Any
 from agents.analysts.base import BaseAnalyst
 from utils.state import AgentState
+from utils.prompt_templates import register_prompt
 from utils.logger import get_logger
 from data_providers.social_data import SocialDataProvider
 
 logger = get_logger(__name__)
 
+# 静态前缀（角色、规则、输出格式），修改后需提升版本号并运行 python -m utils.prompt_templates --update
+SOCIAL_ANALYSIS_PROMPT = register_prompt("social_media_analyst", "v1", """
+你是一位专业的加密货币社交媒体分析师。
+
+用户消息会给出分析目标（币种与交易对）、社交媒体数据概览、情绪得分（-1到1，正值表示正面）与热门帖子标题。
+请基于这些真实社交媒体数据进行社交情绪分析，生成完整的中文社交分析报告，包括：
+
+## 📱 社交媒体概览
+- Reddit等平台讨论热度
+- 用户参与度与活跃度
+- 社区讨论质量分析
+
+## 📊 情绪趋势分析
+- 社交媒体情绪解读
+- 用户情绪变化趋势
+- 情绪对价格的影响分析
+
+## 🔍 社区行为分析
+- 用户讨论焦点与热点话题
+- 社区反应与情绪波动
+- 社交媒体对市场的影响
+
+## 💭 投资建议
+- 基于社交情绪的投资建议（买入/持有/卖出，中文表达）
+- 社交媒体风险提示
+- 需要关注的社区动态
+
+要求：
+- 所有分析必须基于提供的真实社交数据
+- 投资建议必须使用中文（买入/持有/卖出）
+- 报告长度不少于600字
+- 分析要具体、专业、有说服力
+- 重点关注社交媒体情绪对价格走势的影响
+""")
+
 
 class SocialMediaAnalyst(BaseAnalyst):
     """社交媒体分析师"""
     
+    writes = ("analysis_reports.social",)
+    # 社交情绪缓存15分钟
+    llm_cache_ttl = 900
+    
     def __init__(self, name: str = "Social Media Analyst"):
         super().__init__(name)
         self.social_provider = SocialDataProvider()
@@ -48,6 +88,29 @@ class SocialMediaAnalyst(BaseAnalyst):
             logger.error(f"{self.name} 分析失败: {e}")
             return state
     
+    async def aprocess(self, state: AgentState) -> AgentState:
+        """处理社交分析（异步）"""
+        try:
+            logger.info(f"{self.name} 开始分析 {state.symbol}")
+            
+            social_data = await self.social_provider.aget_social_data(state.coin_name)
+            
+            if not social_data:
+                logger.error(f"无法获取 {state.coin_name} 的社交数据")
+                return state
+            
+            prompt = self._create_social_analysis_prompt(state, social_data)
+            analysis_result = await self.acall_llm(prompt, template=SOCIAL_ANALYSIS_PROMPT)
+            
+            self.update_state_with_analysis(state, "social", analysis_result)
+            
+            logger.info(f"{self.name} 完成 {state.symbol} 社交分析")
+            return state
+            
+        except Exception as e:
+            logger.error(f"{self.name} 分析失败: {e}")
+            return state
+    
     def _generate_social_analysis(self, state: AgentState, social_data: Dict[str, Any]) -> str:
         """生成社交分析报告"""
         
@@ -55,7 +118,7 @@ class SocialMediaAnalyst(BaseAnalyst):
         prompt = self._create_social_analysis_prompt(state, social_data)
         
         # 调用LLM生成分析
-        analysis = self.call_llm(prompt)
+        analysis = self.call_llm(prompt, template=SOCIAL_ANALYSIS_PROMPT)
         
         return analysis
     
@@ -84,8 +147,6 @@ class SocialMediaAnalyst(BaseAnalyst):
         engagement_rate = analysis_summary.get('engagement_rate', 0)
         
         prompt = f"""
-你是一位专业的加密货币社交媒体分析师。
-
 分析目标：{state.coin_name}（交易对：{state.symbol}）
 
 📱 社交媒体数据概览：
@@ -97,7 +158,7 @@ class SocialMediaAnalyst(BaseAnalyst):
 - 参与度：{engagement_rate:.2f}
 
 📊 情绪分析：
-- 整体情绪得分：{sentiment_score:.3f} (-1到1，正值表示正面)
+- 整体情绪得分：{sentiment_score:.3f}
 - 正面帖子：{positive_count}条
 - 负面帖子：{negative_count}条
 - 中性帖子：{neutral_count}条
@@ -105,34 +166,7 @@ class SocialMediaAnalyst(BaseAnalyst):
 📝 热门帖子标题：
 {chr(10).join([f"- {title}" for title in post_titles])}
 
-请基于以上真实社交媒体数据进行社交情绪分析，生成完整的中文社交分析报告，包括：
-
-## 📱 社交媒体概览
-- Reddit等平台讨论热度
-- 用户参与度与活跃度
-- 社区讨论质量分析
-
-## 📊 情绪趋势分析
-- 社交媒体情绪解读
-- 用户情绪变化趋势
-- 情绪对价格的影响分析
-
-## 🔍 社区行为分析
-- 用户讨论焦点与热点话题
-- 社区反应与情绪波动
-- 社交媒体对市场的影响
-
-## 💭 投资建议
-- 基于社交情绪的投资建议（买入/持有/卖出，中文表达）
-- 社交媒体风险提示
-- 需要关注的社区动态
-
-要求：
-- 所有分析必须基于提供的真实社交数据
-- 投资建议必须使用中文（买入/持有/卖出）
-- 报告长度不少于600字
-- 分析要具体、专业、有说服力
-- 重点关注社交媒体情绪对价格走势的影响
+请基于以上真实社交媒体数据，按要求的结构生成社交分析报告。
 """
 
         return prompt
@@ -3,11 +3,13 @@
 定义所有管理层的基础接口和通用方法
 """
 
+import asyncio
 from abc import ABC, abstractmethod
-from typing import Dict, Any
-import openai
+from typing import Dict, Any, Tuple, Optional, List
 from utils.state import AgentState
 from utils.config import Config
+from utils.llm_gateway import get_llm_gateway
+from utils.prompt_templates import PromptTemplate
 from utils.logger import get_logger
 
 logger = get_logger(__name__)
@@ -16,21 +18,16 @@ logger = get_logger(__name__)
 class BaseManager(ABC):
     """管理层基类"""
     
+    # 调度声明：读取/写入的 AgentState 字段（支持 a.b 形式的子字段），由 DAGScheduler 构建依赖图
+    reads: Tuple[str, ...] = ()
+    writes: Tuple[str, ...] = ()
+    # 预估耗时（以一次LLM调用为单位），用于 dry-run 计算关键路径
+    estimated_cost: float = 1.0
+    # LLM响应缓存有效期（秒），None 使用 LLM_CACHE_TTL，0 表示不缓存
+    llm_cache_ttl: Optional[float] = None
+    
     def __init__(self, name: str):
         self.name = name
-        self.client = None
-        self._init_openai()
-    
-    def _init_openai(self):
-        """初始化OpenAI客户端"""
-        try:
-            if Config.OPENAI_API_KEY:
-                self.client = openai.OpenAI(api_key=Config.OPENAI_API_KEY)
-                logger.info(f"{self.name} OpenAI客户端初始化成功")
-            else:
-                logger.warning(f"{self.name} OpenAI API密钥未设置")
-        except Exception as e:
-            logger.error(f"{self.name} OpenAI客户端初始化失败: {e}")
     
     @abstractmethod
     def process(self, state: AgentState) -> AgentState:
@@ -45,26 +42,64 @@ class BaseManager(ABC):
         """
         pass
     
-    def call_llm(self, prompt: str, temperature: float = None) -> str:
-        """调用LLM获取分析结果"""
+    async def aprocess(self, state: AgentState) -> AgentState:
+        """
+        异步处理状态（默认在线程中执行同步 process，子类可覆盖为原生异步实现）
+        
+        Args:
+            state: 当前智能体状态
+            
+        Returns:
+            更新后的智能体状态
+        """
+        return await asyncio.to_thread(self.process, state)
+    
+    def _build_messages(self, prompt: str, template: Optional[PromptTemplate] = None) -> List[Dict[str, str]]:
+        """构建对话消息：有模板时静态前缀作为 system 消息放在最前（可命中提示词前缀缓存）"""
+        if template is not None:
+            return template.messages(prompt)
+        return [{"role": "user", "content": prompt}]
+    
+    def chat_messages(self, messages: List[Dict[str, str]], temperature: float = None,
+                      response_format: Optional[Dict[str, Any]] = None) -> str:
+        """以对话消息调用LLM（经共享LLM网关）；response_format 如 {"type": "json_object"}（JSON模式）"""
         try:
-            if not self.client:
+            gateway = get_llm_gateway()
+            if not gateway.available:
                 logger.error("OpenAI客户端未初始化")
                 return "无法获取分析结果，OpenAI客户端未初始化"
             
-            response = self.client.chat.completions.create(
-                model=Config.OPENAI_MODEL,
-                messages=[{"role": "user", "content": prompt}],
-                temperature=temperature or Config.OPENAI_TEMPERATURE,
-                max_tokens=2000
-            )
+            return gateway.chat(messages, agent=self.name, temperature=temperature, cache_ttl=self.llm_cache_ttl,
+                                response_format=response_format)
+            
+        except Exception as e:
+            logger.error(f"调用LLM失败: {e}")
+            return f"分析过程中出现错误: {str(e)}"
+    
+    async def achat_messages(self, messages: List[Dict[str, str]], temperature: float = None,
+                             response_format: Optional[Dict[str, Any]] = None) -> str:
+        """以对话消息调用LLM（异步，不占用线程）"""
+        try:
+            gateway = get_llm_gateway()
+            if not gateway.available:
+                logger.error("OpenAI客户端未初始化")
+                return "无法获取分析结果，OpenAI客户端未初始化"
             
-            return response.choices[0].message.content
+            return await gateway.achat(messages, agent=self.name, temperature=temperature, cache_ttl=self.llm_cache_ttl,
+                                       response_format=response_format)
             
         except Exception as e:
             logger.error(f"调用LLM失败: {e}")
             return f"分析过程中出现错误: {str(e)}"
     
+    def call_llm(self, prompt: str, temperature: float = None, template: Optional[PromptTemplate] = None) -> str:
+        """调用LLM获取分析结果（经共享LLM网关）"""
+        return self.chat_messages(self._build_messages(prompt, template), temperature)
+    
+    async def acall_llm(self, prompt: str, temperature: float = None, template: Optional[PromptTemplate] = None) -> str:
+        """调用LLM获取分析结果（异步，不占用线程）"""
+        return await self.achat_messages(self._build_messages(prompt, template), temperature)
+    
     def get_analysis_reports(self, state: AgentState) -> Dict[str, Any]:
         """获取所有分析报告"""
         return state.get_all_analysis_reports()
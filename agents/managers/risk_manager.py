@@ -2,21 +2,97 @@
 风险经理模块 - 综合风险评估并做出最终决策
 """
 
+import asyncio
 import json
+import time
+import re
 import pandas as pd
-from typing import Dict, Any, List
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Dict, Any, List, Optional
 from agents.managers.base import BaseManager
 from agents.risk_management.aggressive_risk import AggressiveRiskManager
 from agents.risk_management.neutral_risk import NeutralRiskManager
 from agents.risk_management.conservative_risk import ConservativeRiskManager
+from utils.config import Config
+from utils.shared_context import SharedContext
+from utils.prompt_templates import register_prompt
+from utils.structured_output import (
+    JSON_OBJECT_FORMAT, OutputSchema, SchemaField, StructuredResult, arequest_structured, request_structured
+)
 from utils.logger import get_logger
 
 logger = get_logger(__name__)
 
+# 风险等级的常见中文写法
+RISK_LEVEL_ALIASES = (
+    ("低", "low"), ("低风险", "low"), ("较低", "low"), ("较低风险", "low"),
+    ("中", "medium"), ("中等", "medium"), ("中风险", "medium"), ("中等风险", "medium"),
+    ("高", "high"), ("高风险", "high"), ("较高", "high"), ("较高风险", "high"),
+)
+
+# 文本中带标签的风险等级，如 "风险等级：中等风险"、"**风险等级**: high"
+RISK_LEVEL_LABEL = re.compile(r"风险等级\W{0,4}[：:]\W{0,4}([A-Za-z]+|较?[低中高]等?(?:风险)?)")
+
+RISK_OUTPUT_SCHEMA = OutputSchema("risk_manager", (
+    SchemaField("final_decision", "choice", "最终风险决策", choices=("买入", "卖出", "持有", "观望")),
+    SchemaField("risk_level", "choice", "综合风险等级", choices=("low", "medium", "high"),
+                aliases=RISK_LEVEL_ALIASES, default="medium"),
+    SchemaField("position_size", "number", "建议仓位比例（0-1）", minimum=0, maximum=1, default=0.3),
+    SchemaField("analysis", "text", "中文详细风险分析报告（决策理由、风险控制策略、风险来源清单、短期风险预警）"),
+))
+
+# 静态前缀（角色、规则、输出格式），修改后需提升版本号并运行 python -m utils.prompt_templates --update
+RISK_DECISION_PROMPT = register_prompt("risk_manager", "v2", """
+你是一位专业的加密货币风险管理委员会主席和风险辩论主持人。  
+⚠️ 你的任务是综合三位风险分析师（激进 / 中性 / 保守）的观点，评估当前加密货币交易策略风险，并输出最终决策（买入 / 卖出 / 持有）。
+
+用户消息会给出分析目标（币种与交易对）、交易员决策与三位风险分析师的评估结果。
+
+### 📊 你的职责：
+1. **总结辩论关键点**：
+   - 汇总三位风险分析师的核心观点
+   - 重点识别潜在风险来源，包括：
+     - 市场波动性（短期价格剧烈波动风险）
+     - 链上安全风险（黑客攻击、巨鲸转账、合约漏洞）
+     - 交易所与流动性风险（下架、提现限制、流动性不足）
+     - 政策与宏观风险（监管政策、全球经济事件）
+2. **给出明确的风险决策**：
+   - 买入 / 卖出 / 持有（三选一）
+   - 必须基于风险评估结果和交易员决策综合考虑
+   - 如果交易员建议买入但风险较高，可以建议持有或降低仓位
+   - 如果交易员建议卖出但风险较低，可以建议持有或观望
+3. **优化交易员计划**：
+   - 在原交易员计划的基础上，提出风险控制和仓位调整建议
+   - 明确止损价位、止盈目标和仓位百分比
+   - 确保风险决策与交易决策的逻辑一致性
+4. **结合历史经验改进决策**：
+   - 使用过往风险管理失误的经验来避免重复错误
+   - 强调如何在波动市场中保护资金安全
+
+### 💡 输出要求：
+- analysis 为中文详细分析报告，必须包含：
+  1. 支撑决策的主要理由
+  2. 风险控制策略（止损、止盈、仓位比例）
+  3. 风险来源清单（市场、链上、交易所、政策）
+- 建议附上短期风险预警（未来1-7天的主要风险）
+- 自然表达，如同给交易团队口头汇报
+- 不允许输出模糊建议或"无法确定"
+- 确保风险决策与交易员决策的逻辑协调
+
+""" + RISK_OUTPUT_SCHEMA.format_instructions() + """
+
+请基于用户消息中的数据提供最终的风险管理决策。注意：你的决策应该与交易员决策保持逻辑一致性，如果存在冲突，请说明理由并提供协调方案。
+""")
+
 
 class RiskManager(BaseManager):
     """风险经理 - 综合风险评估并做出最终决策"""
     
+    reads = ("analysis_reports", "trading_decision")
+    writes = ("risk_assessment", "final_risk_decision")
+    # 三位风险评估员并发执行 + 最终决策
+    estimated_cost = 2.0
+    
     def __init__(self, name: str = "Risk Manager"):
         super().__init__(name)
         
@@ -38,11 +114,13 @@ class RiskManager(BaseManager):
             # 获取分析报告
             analysis_reports = state.analysis_reports or {}
             
-            # 执行风险评估
+            # 执行风险评估（三位评估员并发）
             risk_assessment = self._conduct_risk_assessment(
                 state.symbol,
                 trading_decision,
-                analysis_reports
+                analysis_reports,
+                state.telemetry,
+                state.shared_context
             )
             
             # 生成最终风险决策
@@ -63,54 +141,186 @@ class RiskManager(BaseManager):
             logger.error(f"{self.name} 处理失败: {e}")
             return state
     
-    def _conduct_risk_assessment(self, symbol: str, trading_decision: Dict, analysis_reports: Dict) -> Dict[str, Any]:
-        """执行风险评估"""
+    async def aprocess(self, state) -> Dict[str, Any]:
+        """处理状态并生成风险评估（异步，三位风险评估员并发执行）"""
         try:
-            risk_results = {}
+            logger.info(f"{self.name} 开始风险评估")
             
-            # 让每个风险评估员进行评估
-            for assessor in self.risk_assessors:
+            trading_decision = state.trading_decision or {}
+            analysis_reports = state.analysis_reports or {}
+            
+            risk_assessment = await self._aconduct_risk_assessment(
+                state.symbol,
+                trading_decision,
+                analysis_reports,
+                state.telemetry,
+                state.shared_context
+            )
+            
+            final_risk_decision = await self._agenerate_final_risk_decision(
+                state.symbol,
+                risk_assessment,
+                trading_decision
+            )
+            
+            # 更新状态
+            state.risk_assessment = risk_assessment
+            state.final_risk_decision = final_risk_decision
+            
+            logger.info(f"{self.name} 风险评估完成")
+            return state
+            
+        except Exception as e:
+            logger.error(f"{self.name} 处理失败: {e}")
+            return state
+    
+    def _create_assessor_state(self, symbol: str, trading_decision: Dict, analysis_reports: Dict,
+                               shared_context: Optional[SharedContext] = None):
+        """创建临时状态用于风险评估（共享主状态已渲染的分析师报告块）"""
+        coin_name = symbol.split('/')[0] if '/' in symbol else symbol
+        temp_state = type('TempState', (), {
+            'symbol': symbol,
+            'coin_name': coin_name,
+            'trading_decision': trading_decision,
+            'trade_decision': trading_decision,  # 添加别名
+            'analysis_reports': analysis_reports,
+            'research_consensus': {},
+            'risk_assessment': {},
+            'get_all_analysis_reports': lambda self: analysis_reports,
+            'get_research_consensus': lambda self: {},
+            'get_trade_decision': lambda self: trading_decision
+        })()
+        temp_state.shared_context = shared_context or SharedContext(temp_state)
+        return temp_state
+    
+    def _extract_assessor_result(self, result) -> Dict[str, Any]:
+        """提取风险评估结果（评估员把分析写入临时状态 risk_assessment 中自己的条目）"""
+        entries = [entry for entry in (getattr(result, 'risk_assessment', None) or {}).values() if isinstance(entry, dict)]
+        if not entries:
+            return {
+                "risk_level": "medium",
+                "risk_score": 0.5,
+                "recommendation": "建议观望",
+                "analysis": "风险评估完成"
+            }
+        
+        # 原样保留评估员自己的条目（analysis 等），不从文本中推测风险等级或交易建议
+        return dict(entries[0])
+    
+    def _assessor_failure_result(self, error: Exception) -> Dict[str, Any]:
+        """风险评估员失败时的默认结果"""
+        return {
+            "risk_level": "medium",
+            "risk_score": 0.5,
+            "recommendation": "建议观望",
+            "analysis": f"风险评估失败: {str(error)}"
+        }
+    
+    def _assessor_timeout_result(self, timeout: float) -> Dict[str, Any]:
+        """风险评估员超时时的默认结果"""
+        return {
+            "risk_level": "medium",
+            "risk_score": 0.5,
+            "recommendation": "建议观望",
+            "analysis": f"风险评估超时（{timeout:g}s），按中性风险处理"
+        }
+    
+    def _record_assessment_telemetry(self, telemetry: Optional[Dict[str, Any]], timings: Dict[str, float],
+                                     timed_out: List[str], failed: List[str], wall_time: float):
+        """记录风险评估遥测：各评估员耗时、并发加速比、超时与失败的评估员"""
+        serial_time = sum(timings.values())
+        if timed_out:
+            logger.warning(f"风险评估员超时，使用默认结果: {', '.join(timed_out)}")
+        logger.info(f"风险评估并发完成: 耗时 {wall_time:.2f}s，串行耗时 {serial_time:.2f}s，加速比 {serial_time / wall_time if wall_time else 0:.2f}x")
+        
+        if isinstance(telemetry, dict):
+            telemetry["risk_assessment"] = {
+                "assessor_timings": timings,
+                "timed_out": timed_out,
+                "failed": failed,
+                "wall_time": wall_time,
+                "serial_time": serial_time,
+                "speedup": serial_time / wall_time if wall_time else 0.0
+            }
+    
+    def _conduct_risk_assessment(self, symbol: str, trading_decision: Dict, analysis_reports: Dict,
+                                 telemetry: Optional[Dict[str, Any]] = None,
+                                 shared_context: Optional[SharedContext] = None) -> Dict[str, Any]:
+        """执行风险评估（各评估员使用独立的临时状态并发执行，超过 RISK_ASSESSOR_TIMEOUT 的使用默认结果）"""
+        try:
+            timeout = Config.RISK_ASSESSOR_TIMEOUT
+            timings: Dict[str, float] = {}
+            start = time.perf_counter()
+            
+            def assess(assessor):
+                assessor_start = time.perf_counter()
                 try:
                     logger.info(f"执行 {assessor.name} 风险评估")
-                    
-                    # 创建临时状态用于风险评估
-                    coin_name = symbol.split('/')[0] if '/' in symbol else symbol
-                    temp_state = type('TempState', (), {
-                        'symbol': symbol,
-                        'coin_name': coin_name,
-                        'trading_decision': trading_decision,
-                        'trade_decision': trading_decision,  # 添加别名
-                        'analysis_reports': analysis_reports,
-                        'research_consensus': {},
-                        'risk_assessment': {},
-                        'get_all_analysis_reports': lambda self: analysis_reports,
-                        'get_research_consensus': lambda self: {},
-                        'get_trade_decision': lambda self: trading_decision
-                    })()
-                    
-                    # 执行风险评估
-                    result = assessor.process(temp_state)
-                    
-                    # 提取风险评估结果
-                    if hasattr(result, 'risk_assessment'):
-                        risk_results[assessor.name] = result.risk_assessment
-                    else:
-                        risk_results[assessor.name] = {
-                            "risk_level": "medium",
-                            "risk_score": 0.5,
-                            "recommendation": "建议观望",
-                            "analysis": "风险评估完成"
-                        }
-                        
-                except Exception as e:
-                    logger.error(f"{assessor.name} 风险评估失败: {e}")
-                    risk_results[assessor.name] = {
-                        "risk_level": "medium",
-                        "risk_score": 0.5,
-                        "recommendation": "建议观望",
-                        "analysis": f"风险评估失败: {str(e)}"
-                    }
+                    return assessor.process(self._create_assessor_state(symbol, trading_decision, analysis_reports, shared_context))
+                finally:
+                    timings[assessor.name] = time.perf_counter() - assessor_start
+            
+            executor = ThreadPoolExecutor(max_workers=len(self.risk_assessors), thread_name_prefix="risk")
+            futures = {assessor.name: executor.submit(assess, assessor) for assessor in self.risk_assessors}
+            wait(futures.values(), timeout=timeout)
+            # 不等待超时的评估员（其结果被丢弃，线程在后台结束）
+            executor.shutdown(wait=False)
+            wall_time = time.perf_counter() - start
+            
+            risk_results, timed_out, failed = {}, [], []
+            for assessor in self.risk_assessors:
+                future = futures[assessor.name]
+                if not future.done():
+                    timed_out.append(assessor.name)
+                    timings[assessor.name] = timeout
+                    risk_results[assessor.name] = self._assessor_timeout_result(timeout)
+                elif future.exception() is not None:
+                    logger.error(f"{assessor.name} 风险评估失败: {future.exception()}")
+                    failed.append(assessor.name)
+                    risk_results[assessor.name] = self._assessor_failure_result(future.exception())
+                else:
+                    risk_results[assessor.name] = self._extract_assessor_result(future.result())
+            
+            self._record_assessment_telemetry(telemetry, dict(timings), timed_out, failed, wall_time)
+            return risk_results
             
+        except Exception as e:
+            logger.error(f"执行风险评估失败: {e}")
+            return self._generate_fallback_risk_assessment(symbol)
+    
+    async def _aconduct_risk_assessment(self, symbol: str, trading_decision: Dict, analysis_reports: Dict,
+                                        telemetry: Optional[Dict[str, Any]] = None,
+                                        shared_context: Optional[SharedContext] = None) -> Dict[str, Any]:
+        """执行风险评估（异步，各评估员使用独立的临时状态并发执行，超时的评估员被取消并使用默认结果）"""
+        try:
+            timeout = Config.RISK_ASSESSOR_TIMEOUT
+            timings: Dict[str, float] = {}
+            start = time.perf_counter()
+            
+            async def assess(assessor):
+                assessor_start = time.perf_counter()
+                try:
+                    state = self._create_assessor_state(symbol, trading_decision, analysis_reports, shared_context)
+                    return await asyncio.wait_for(assessor.aprocess(state), timeout)
+                finally:
+                    timings[assessor.name] = time.perf_counter() - assessor_start
+            
+            results = await asyncio.gather(*(assess(assessor) for assessor in self.risk_assessors), return_exceptions=True)
+            wall_time = time.perf_counter() - start
+            
+            risk_results, timed_out, failed = {}, [], []
+            for assessor, result in zip(self.risk_assessors, results):
+                if isinstance(result, asyncio.TimeoutError):
+                    timed_out.append(assessor.name)
+                    risk_results[assessor.name] = self._assessor_timeout_result(timeout)
+                elif isinstance(result, Exception):
+                    logger.error(f"{assessor.name} 风险评估失败: {result}")
+                    failed.append(assessor.name)
+                    risk_results[assessor.name] = self._assessor_failure_result(result)
+                else:
+                    risk_results[assessor.name] = self._extract_assessor_result(result)
+            
+            self._record_assessment_telemetry(telemetry, timings, timed_out, failed, wall_time)
             return risk_results
             
         except Exception as e:
@@ -123,13 +333,23 @@ class RiskManager(BaseManager):
             # 构建风险经理Prompt
             prompt = self._build_risk_manager_prompt(symbol, risk_assessment, trading_decision)
             
-            # 调用LLM生成最终决策
-            response = self.call_llm(prompt)
+            # 调用LLM生成最终决策（JSON模式，未通过校验的字段追问重答）
+            messages = self._build_messages(prompt, RISK_DECISION_PROMPT)
+            result = request_structured(RISK_OUTPUT_SCHEMA, lambda m: self.chat_messages(m, response_format=JSON_OBJECT_FORMAT), messages)
             
-            # 解析响应
-            final_decision = self._parse_risk_response(response, symbol)
+            return self._decision_from_output(result, symbol)
             
-            return final_decision
+        except Exception as e:
+            logger.error(f"生成最终风险决策失败: {e}")
+            return self._generate_fallback_risk_decision(symbol)
+    
+    async def _agenerate_final_risk_decision(self, symbol: str, risk_assessment: Dict, trading_decision: Dict) -> Dict[str, Any]:
+        """生成最终风险决策（异步）"""
+        try:
+            prompt = self._build_risk_manager_prompt(symbol, risk_assessment, trading_decision)
+            messages = self._build_messages(prompt, RISK_DECISION_PROMPT)
+            result = await arequest_structured(RISK_OUTPUT_SCHEMA, lambda m: self.achat_messages(m, response_format=JSON_OBJECT_FORMAT), messages)
+            return self._decision_from_output(result, symbol)
             
         except Exception as e:
             logger.error(f"生成最终风险决策失败: {e}")
@@ -145,44 +365,9 @@ class RiskManager(BaseManager):
         # 构建交易决策摘要
         trading_summary = self._build_trading_summary(trading_decision)
         
-        prompt = f"""你是一位专业的加密货币风险管理委员会主席和风险辩论主持人。  
-⚠️ 你的任务是综合三位风险分析师（激进 / 中性 / 保守）的观点，评估当前加密货币交易策略风险，并输出最终决策（买入 / 卖出 / 持有）。
-
+        prompt = f"""
 分析目标：{coin_name}（交易对：{symbol}）
 
-### 📊 你的职责：
-1. **总结辩论关键点**：
-   - 汇总三位风险分析师的核心观点
-   - 重点识别潜在风险来源，包括：
-     - 市场波动性（短期价格剧烈波动风险）
-     - 链上安全风险（黑客攻击、巨鲸转账、合约漏洞）
-     - 交易所与流动性风险（下架、提现限制、流动性不足）
-     - 政策与宏观风险（监管政策、全球经济事件）
-2. **给出明确的风险决策**：
-   - 买入 / 卖出 / 持有（三选一）
-   - 必须基于风险评估结果和交易员决策综合考虑
-   - 如果交易员建议买入但风险较高，可以建议持有或降低仓位
-   - 如果交易员建议卖出但风险较低，可以建议持有或观望
-3. **优化交易员计划**：
-   - 在原交易员计划的基础上，提出风险控制和仓位调整建议
-   - 明确止损价位、止盈目标和仓位百分比
-   - 确保风险决策与交易决策的逻辑一致性
-4. **结合历史经验改进决策**：
-   - 使用过往风险管理失误的经验来避免重复错误
-   - 强调如何在波动市场中保护资金安全
-
-### 💡 输出要求：
-- 中文详细分析报告
-- 必须包含：
-  1. 明确最终风险决策（买入 / 卖出 / 持有）
-  2. 支撑决策的主要理由
-  3. 风险控制策略（止损、止盈、仓位比例）
-  4. 风险来源清单（市场、链上、交易所、政策）
-- 建议附上短期风险预警（未来1-7天的主要风险）
-- 自然表达，如同给交易团队口头汇报
-- 不允许输出模糊建议或"无法确定"
-- 确保风险决策与交易员决策的逻辑协调
-
 ### 📈 当前数据：
 
 **交易员决策：**
@@ -191,7 +376,8 @@ class RiskManager(BaseManager):
 **风险评估结果：**
 {risk_summary}
 
-请基于以上数据，为 {coin_name} 提供最终的风险管理决策。注意：你的决策应该与交易员决策保持逻辑一致性，如果存在冲突，请说明理由并提供协调方案。"""
+请为 {coin_name} 提供最终的风险管理决策。
+"""
 
         return prompt
     
@@ -201,15 +387,13 @@ class RiskManager(BaseManager):
         
         for assessor_name, assessment in risk_assessment.items():
             if isinstance(assessment, dict):
-                risk_level = assessment.get("risk_level", "medium")
-                risk_score = assessment.get("risk_score", 0.5)
-                recommendation = assessment.get("recommendation", "建议观望")
                 analysis = assessment.get("analysis", "风险评估完成")
                 
                 summary.append(f"**{assessor_name}：**")
-                summary.append(f"- 风险等级：{risk_level}")
-                summary.append(f"- 风险评分：{risk_score}")
-                summary.append(f"- 建议：{recommendation}")
+                # 评估员只给出分析文本时不补写风险等级、评分和建议
+                for label, key in (("风险等级", "risk_level"), ("风险评分", "risk_score"), ("建议", "recommendation")):
+                    if key in assessment:
+                        summary.append(f"- {label}：{assessment[key]}")
                 summary.append(f"- 分析：{analysis}")
                 summary.append("")
         
@@ -236,8 +420,36 @@ class RiskManager(BaseManager):
         
         return summary
     
+    def _decision_from_output(self, result: StructuredResult, symbol: str) -> Dict[str, Any]:
+        """由结构化输出组装最终风险决策；输出不是JSON时整体按文本解析，追问后仍未通过校验的决策按文本解析补齐，其他字段使用模式默认值"""
+        if not result.parsed:
+            logger.warning(f"{self.name} 输出不是JSON，按文本解析")
+            decision = self._parse_risk_response(result.raw, symbol)
+            decision["parse_method"] = "text"
+            return decision
+        
+        values = dict(result.values)
+        parse_method = "json" if not result.repairs else "json_repaired"
+        if result.errors:
+            logger.warning(f"{self.name} 字段仍未通过校验，按文本解析补齐: {result.errors}")
+            for name in result.errors:
+                values[name] = RISK_OUTPUT_SCHEMA.field(name).default
+            if "final_decision" in result.errors:
+                text_decision = self._parse_risk_response(values.get("analysis") or result.raw, symbol)
+                values["final_decision"] = text_decision["final_decision"]
+            parse_method = "json_text"
+        
+        return {
+            "final_decision": values["final_decision"],
+            "risk_level": values["risk_level"],
+            "position_size": values["position_size"],
+            "analysis": values.get("analysis") or result.raw,
+            "symbol": symbol,
+            "parse_method": parse_method
+        }
+    
     def _parse_risk_response(self, response: str, symbol: str) -> Dict[str, Any]:
-        """解析风险经理响应"""
+        """按文本解析风险经理响应（非JSON输出的兜底）"""
         try:
             # 提取最终决策
             if "最终风险决策:" in response:
@@ -253,17 +465,22 @@ class RiskManager(BaseManager):
             else:
                 decision = "观望"
             
-            # 提取风险等级
-            risk_level = "medium"
-            if "高风险" in response or "high" in response.lower():
-                risk_level = "high"
-            elif "低风险" in response or "low" in response.lower():
-                risk_level = "low"
+            # 提取风险等级：优先取带标签的等级，其次按中文关键词，都没有时为 medium
+            risk_level = None
+            label_match = RISK_LEVEL_LABEL.search(response)
+            if label_match:
+                risk_level, _ = RISK_OUTPUT_SCHEMA.field("risk_level").validate(label_match.group(1))
+            if risk_level is None:
+                if "高风险" in response:
+                    risk_level = "high"
+                elif "低风险" in response:
+                    risk_level = "low"
+                else:
+                    risk_level = RISK_OUTPUT_SCHEMA.field("risk_level").default
             
             # 提取仓位建议
             position_size = 0.3  # 默认30%
             if "仓位" in response:
-                import re
                 position_match = re.search(r'仓位[：:]\s*(\d+(?:\.\d+)?)', response)
                 if position_match:
                     try:
@@ -329,7 +546,6 @@ if __name__ == "__main__":
     sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
     
     from utils.state import AgentState
-    from utils.config import Config
     
     # 测试配置
     if not Config.validate_config():
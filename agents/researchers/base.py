@@ -3,34 +3,48 @@
 定义所有研究员的基础接口和通用方法
 """
 
+import asyncio
 from abc import ABC, abstractmethod
-from typing import Dict, Any
-import openai
+from typing import Dict, Any, Tuple, Optional, List
 from utils.state import AgentState
 from utils.config import Config
+from utils.llm_gateway import get_llm_gateway
+from utils.prompt_templates import PromptTemplate, register_prompt
 from utils.logger import get_logger
 
 logger = get_logger(__name__)
 
+# 静态前缀（角色、规则、输出格式），修改后需提升版本号并运行 python -m utils.prompt_templates --update
+REBUTTAL_PROMPT = register_prompt("researcher_rebuttal", "v1", """
+你是一名专业的加密货币分析师，正在与持相反立场的分析师进行多轮辩论。
+用户消息会给出你的立场、辩论目标与轮次、你上一轮的论点以及对方最新的论点。
+
+请完成本轮反驳：
+1. 指出对方最有力的 2-3 个论点，并逐条用数据和逻辑反驳
+2. 补充上一轮没有提到的新证据，不要重复已有内容
+3. 如果对方的某些论点确实成立，请坦率承认并相应调整你的立场
+
+要求：
+- 使用中文，300-500字
+- 最后一行单独输出：立场强度: X/10（10 表示完全坚持你的立场，0 表示完全认同对方）
+""")
+
 
 class BaseResearcher(ABC):
     """研究员基类"""
     
+    # 调度声明：读取/写入的 AgentState 字段（支持 a.b 形式的子字段），由 DAGScheduler 构建依赖图
+    reads: Tuple[str, ...] = ()
+    writes: Tuple[str, ...] = ()
+    # 预估耗时（以一次LLM调用为单位），用于 dry-run 计算关键路径
+    estimated_cost: float = 1.0
+    # LLM响应缓存有效期（秒），None 使用 LLM_CACHE_TTL，0 表示不缓存
+    llm_cache_ttl: Optional[float] = None
+    # 辩论立场（看涨 / 看跌），用于多轮反驳
+    stance: str = ""
+    
     def __init__(self, name: str):
         self.name = name
-        self.client = None
-        self._init_openai()
-    
-    def _init_openai(self):
-        """初始化OpenAI客户端"""
-        try:
-            if Config.OPENAI_API_KEY:
-                self.client = openai.OpenAI(api_key=Config.OPENAI_API_KEY)
-                logger.info(f"{self.name} OpenAI客户端初始化成功")
-            else:
-                logger.warning(f"{self.name} OpenAI API密钥未设置")
-        except Exception as e:
-            logger.error(f"{self.name} OpenAI客户端初始化失败: {e}")
     
     @abstractmethod
     def process(self, state: AgentState) -> AgentState:
@@ -45,21 +59,47 @@ class BaseResearcher(ABC):
         """
         pass
     
-    def call_llm(self, prompt: str, temperature: float = None) -> str:
-        """调用LLM获取分析结果"""
+    async def aprocess(self, state: AgentState) -> AgentState:
+        """
+        异步处理状态（默认在线程中执行同步 process，子类可覆盖为原生异步实现）
+        
+        Args:
+            state: 当前智能体状态
+            
+        Returns:
+            更新后的智能体状态
+        """
+        return await asyncio.to_thread(self.process, state)
+    
+    def _build_messages(self, prompt: str, template: Optional[PromptTemplate] = None) -> List[Dict[str, str]]:
+        """构建对话消息：有模板时静态前缀作为 system 消息放在最前（可命中提示词前缀缓存）"""
+        if template is not None:
+            return template.messages(prompt)
+        return [{"role": "user", "content": prompt}]
+    
+    def call_llm(self, prompt: str, temperature: float = None, template: Optional[PromptTemplate] = None) -> str:
+        """调用LLM获取分析结果（经共享LLM网关）"""
         try:
-            if not self.client:
+            gateway = get_llm_gateway()
+            if not gateway.available:
                 logger.error("OpenAI客户端未初始化")
                 return "无法获取分析结果，OpenAI客户端未初始化"
             
-            response = self.client.chat.completions.create(
-                model=Config.OPENAI_MODEL,
-                messages=[{"role": "user", "content": prompt}],
-                temperature=temperature or Config.OPENAI_TEMPERATURE,
-                max_tokens=2000
-            )
+            return gateway.chat(self._build_messages(prompt, template), agent=self.name, temperature=temperature, cache_ttl=self.llm_cache_ttl)
+            
+        except Exception as e:
+            logger.error(f"调用LLM失败: {e}")
+            return f"分析过程中出现错误: {str(e)}"
+    
+    async def acall_llm(self, prompt: str, temperature: float = None, template: Optional[PromptTemplate] = None) -> str:
+        """调用LLM获取分析结果（异步，不占用线程）"""
+        try:
+            gateway = get_llm_gateway()
+            if not gateway.available:
+                logger.error("OpenAI客户端未初始化")
+                return "无法获取分析结果，OpenAI客户端未初始化"
             
-            return response.choices[0].message.content
+            return await gateway.achat(self._build_messages(prompt, template), agent=self.name, temperature=temperature, cache_ttl=self.llm_cache_ttl)
             
         except Exception as e:
             logger.error(f"调用LLM失败: {e}")
@@ -68,6 +108,20 @@ class BaseResearcher(ABC):
     def get_analysis_reports(self, state: AgentState) -> Dict[str, Any]:
         """获取所有分析报告"""
         return state.get_all_analysis_reports()
+    
+    def create_rebuttal_prompt(self, state: AgentState, own_argument: str, opponent_argument: str, round_index: int) -> str:
+        """创建反驳轮提示词（动态部分）：双方立场与最新论点"""
+        opponent_stance = "看跌" if self.stance == "看涨" else "看涨"
+        return f"""
+你的立场：{self.stance}；对方立场：{opponent_stance}
+辩论目标：{state.coin_name}（交易对：{state.symbol}），第 {round_index} 轮
+
+## 你上一轮的论点
+{own_argument}
+
+## 对方（{opponent_stance}）最新论点
+{opponent_argument}
+"""
 
 
 def create_researcher(researcher_class: type, name: str) -> BaseResearcher:
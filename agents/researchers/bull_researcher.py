@@ -11,14 +11,64 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 from typing import Dict, Any
 from agents.researchers.base import BaseResearcher
 from utils.state import AgentState
+from utils.prompt_templates import register_prompt
 from utils.logger import get_logger
 
 logger = get_logger(__name__)
 
+# 静态前缀（角色、规则、输出格式），修改后需提升版本号并运行 python -m utils.prompt_templates --update
+BULL_ANALYSIS_PROMPT = register_prompt("bull_researcher", "v1", """
+你是一名专业的加密货币看涨分析师（Bull Researcher），负责为用户消息中的目标币种的投资构建强有力的看涨论点。
+
+⚠️ 注意：所有价格或估值请使用用户消息中指定的计价货币作为单位。
+
+你的任务是基于真实数据和分析报告，提出令人信服的看涨观点，展示该加密货币的上涨潜力，并有效反驳看跌论点。
+
+用户消息会给出目标币种、计价货币与各分析师的报告。
+
+请重点关注以下方面：
+
+1️⃣ **增长潜力**  
+- 行业或生态发展的积极趋势（如DeFi、NFT、L2或跨链生态）  
+- 代币应用场景、用户增长、活跃地址数提升  
+- 潜在利好事件（上币、机构入场、链上升级等）
+
+2️⃣ **竞争优势**  
+- 代币经济模型优越（稀缺性、销毁机制、合理的通胀率）  
+- 项目在行业的独特地位或技术领先性  
+- 社区活跃度高、开发者生态强大
+
+3️⃣ **积极指标**  
+- 链上数据：交易量增长、资金流入、活跃度上升  
+- 市场指标：技术面多头信号、突破关键阻力位  
+- 新闻与舆情：近期利好消息、投资者情绪积极
+
+4️⃣ **反驳看跌论点**  
+- 指出可能的看跌担忧并给出积极回应
+- 用真实数据和逻辑证明上涨的合理性与可持续性
+
+5️⃣ **参与动态辩论**  
+- 以自然中文表达你的看涨论点  
+- 增强团队对看涨立场的信心
+
+请基于用户消息中的分析报告，提出充分的看涨论点，并呈现动态辩论风格。  
+所有回答必须为中文，适合直接写入投资辩论历史。
+
+要求：
+- 所有分析必须基于提供的真实数据
+- 论点要具体、专业、有说服力
+- 报告长度不少于800字
+- 重点关注上涨潜力和积极因素
+""")
+
 
 class BullResearcher(BaseResearcher):
     """看涨研究员"""
     
+    reads = ("analysis_reports",)
+    writes = ("research_consensus.bull_analysis",)
+    stance = "看涨"
+    
     def __init__(self, name: str = "Bull Researcher"):
         super().__init__(name)
     
@@ -37,14 +87,39 @@ class BullResearcher(BaseResearcher):
             # 生成看涨观点
             bull_analysis = self._generate_bull_analysis(state, analysis_reports)
             
-            # 更新状态
-            state.research_consensus = {
-                "bull_analysis": {
-                    "researcher": self.name,
-                    "analysis": bull_analysis,
-                    "timestamp": str(pd.Timestamp.now())
-                }
-            }
+            # 更新状态（只写入自己的条目，不覆盖看跌研究员的结果）
+            state.update_research_consensus("bull_analysis", {
+                "researcher": self.name,
+                "analysis": bull_analysis,
+                "timestamp": str(pd.Timestamp.now())
+            })
+            
+            logger.info(f"{self.name} 完成 {state.symbol} 看涨分析")
+            return state
+            
+        except Exception as e:
+            logger.error(f"{self.name} 分析失败: {e}")
+            return state
+    
+    async def aprocess(self, state: AgentState) -> AgentState:
+        """处理看涨分析（异步）"""
+        try:
+            logger.info(f"{self.name} 开始分析 {state.symbol}")
+            
+            analysis_reports = self.get_analysis_reports(state)
+            
+            if not analysis_reports:
+                logger.error(f"无法获取 {state.symbol} 的分析报告")
+                return state
+            
+            prompt = self._create_bull_analysis_prompt(state, analysis_reports)
+            bull_analysis = await self.acall_llm(prompt, template=BULL_ANALYSIS_PROMPT)
+            
+            state.update_research_consensus("bull_analysis", {
+                "researcher": self.name,
+                "analysis": bull_analysis,
+                "timestamp": str(pd.Timestamp.now())
+            })
             
             logger.info(f"{self.name} 完成 {state.symbol} 看涨分析")
             return state
@@ -60,78 +135,25 @@ class BullResearcher(BaseResearcher):
         prompt = self._create_bull_analysis_prompt(state, analysis_reports)
         
         # 调用LLM生成分析
-        analysis = self.call_llm(prompt)
+        analysis = self.call_llm(prompt, template=BULL_ANALYSIS_PROMPT)
         
         return analysis
     
     def _create_bull_analysis_prompt(self, state: AgentState, analysis_reports: Dict[str, Any]) -> str:
         """创建看涨分析提示词"""
         
-        technical_report = analysis_reports.get("technical", {})
-        fundamental_report = analysis_reports.get("fundamental", {})
-        news_report = analysis_reports.get("news", {})
-        social_report = analysis_reports.get("social", {})
-        
-        # 提取分析内容
-        technical_analysis = technical_report.get("analysis", "无技术分析数据")
-        fundamental_analysis = fundamental_report.get("analysis", "无基本面分析数据")
-        news_analysis = news_report.get("analysis", "无新闻分析数据")
-        social_analysis = social_report.get("analysis", "无社交分析数据")
+        # 分析师报告块（本次运行内共享，按 SHARED_CONTEXT_MODE 使用完整报告或摘要）
+        analyst_block = state.shared_context.analyst_block()
         
         prompt = f"""
-你是一名专业的加密货币看涨分析师（Bull Researcher），负责为 {state.coin_name}（交易对：{state.symbol}） 的投资构建强有力的看涨论点。
-
-⚠️ 注意：所有价格或估值请使用 {state.currency_name}（{state.currency_symbol}）作为单位。
-
-你的任务是基于真实数据和分析报告，提出令人信服的看涨观点，展示该加密货币的上涨潜力，并有效反驳看跌论点。
+分析目标：{state.coin_name}（交易对：{state.symbol}）
+计价货币：{state.currency_name}（{state.currency_symbol}）
 
 📊 可用分析报告：
 
-## 技术分析报告
-{technical_analysis}
-
-## 基本面分析报告
-{fundamental_analysis}
-
-## 新闻分析报告
-{news_analysis}
-
-## 社交情绪分析报告
-{social_analysis}
-
-请重点关注以下方面：
-
-1️⃣ **增长潜力**  
-- 行业或生态发展的积极趋势（如DeFi、NFT、L2或跨链生态）  
-- 代币应用场景、用户增长、活跃地址数提升  
-- 潜在利好事件（上币、机构入场、链上升级等）
-
-2️⃣ **竞争优势**  
-- 代币经济模型优越（稀缺性、销毁机制、合理的通胀率）  
-- 项目在行业的独特地位或技术领先性  
-- 社区活跃度高、开发者生态强大
-
-3️⃣ **积极指标**  
-- 链上数据：交易量增长、资金流入、活跃度上升  
-- 市场指标：技术面多头信号、突破关键阻力位  
-- 新闻与舆情：近期利好消息、投资者情绪积极
-
-4️⃣ **反驳看跌论点**  
-- 指出可能的看跌担忧并给出积极回应
-- 用真实数据和逻辑证明上涨的合理性与可持续性
-
-5️⃣ **参与动态辩论**  
-- 以自然中文表达你的看涨论点  
-- 增强团队对看涨立场的信心
-
-请基于以上信息，提出充分的看涨论点，并呈现动态辩论风格。  
-所有回答必须为中文，适合直接写入投资辩论历史。
+{analyst_block}
 
-要求：
-- 所有分析必须基于提供的真实数据
-- 论点要具体、专业、有说服力
-- 报告长度不少于800字
-- 重点关注上涨潜力和积极因素
+请基于以上分析报告，提出你的看涨论点。
 """
 
         return prompt
@@ -0,0 +1,197 @@
+"""
+辩论引擎
+在看涨/看跌研究员的开场论点之后进行多轮反驳：每轮双方的LLM调用并发发出，
+双方立场强度在相邻两轮间变化都不超过阈值时提前结束
+"""
+
+import asyncio
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from difflib import SequenceMatcher
+from typing import Any, Dict, List, Optional
+from agents.researchers.base import BaseResearcher, REBUTTAL_PROMPT
+from utils.state import AgentState, AgentMessage
+from utils.config import Config
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class DebateEngine:
+    """看涨/看跌多轮辩论"""
+
+    STANCE_PATTERN = re.compile(r"立场强度\s*[:：]\s*(\d+(?:\.\d+)?)")
+    # 回复中没有立场强度时，以相邻两轮文本相似度判断是否收敛
+    SIMILARITY_THRESHOLD = 0.9
+
+    def __init__(self, bull: BaseResearcher, bear: BaseResearcher, max_rounds: Optional[int] = None,
+                 convergence_threshold: Optional[float] = None):
+        self.bull = bull
+        self.bear = bear
+        self.max_rounds = max(0, max_rounds if max_rounds is not None else Config.DEBATE_ROUNDS)
+        self.convergence_threshold = (convergence_threshold if convergence_threshold is not None
+                                      else Config.DEBATE_CONVERGENCE_THRESHOLD)
+
+    @classmethod
+    def parse_stance(cls, text: str) -> Optional[float]:
+        """解析回复最后给出的立场强度（0-10），没有时返回 None"""
+        matches = cls.STANCE_PATTERN.findall(text or "")
+        return min(10.0, float(matches[-1])) if matches else None
+
+    def _side_converged(self, previous: Dict[str, Any], current: Dict[str, Any]) -> bool:
+        if previous["stance"] is not None and current["stance"] is not None:
+            return abs(current["stance"] - previous["stance"]) <= self.convergence_threshold
+        return SequenceMatcher(None, previous["argument"], current["argument"]).quick_ratio() >= self.SIMILARITY_THRESHOLD
+
+    def _converged(self, previous_round: Dict[str, Any], current_round: Dict[str, Any]) -> bool:
+        """双方立场在相邻两轮间的变化都不超过阈值"""
+        return all(self._side_converged(previous_round[side], current_round[side]) for side in ("bull", "bear"))
+
+    def _openings(self, state: AgentState) -> Optional[List[str]]:
+        research_consensus = state.research_consensus or {}
+        openings = [(research_consensus.get(key) or {}).get("analysis") for key in ("bull_analysis", "bear_analysis")]
+        return openings if all(openings) else None
+
+    def _make_round(self, state: AgentState, index: int, bull_reply: str, bear_reply: str, elapsed: float) -> Dict[str, Any]:
+        """记录一轮反驳并写入辩论历史"""
+        for researcher, reply in ((self.bull, bull_reply), (self.bear, bear_reply)):
+            state.add_debate_message(AgentMessage(
+                sender=researcher.name,
+                receiver=(self.bear if researcher is self.bull else self.bull).name,
+                message_type="rebuttal",
+                content={"round": index, "argument": reply},
+                timestamp=time.strftime("%Y-%m-%d %H:%M:%S")
+            ))
+        return {
+            "round": index,
+            "bull": {"argument": bull_reply, "stance": self.parse_stance(bull_reply)},
+            "bear": {"argument": bear_reply, "stance": self.parse_stance(bear_reply)},
+            "elapsed": elapsed
+        }
+
+    def _prompts(self, state: AgentState, bull_argument: str, bear_argument: str, index: int):
+        return (
+            self.bull.create_rebuttal_prompt(state, bull_argument, bear_argument, index),
+            self.bear.create_rebuttal_prompt(state, bear_argument, bull_argument, index)
+        )
+
+    def _finish(self, state: AgentState, rounds: List[Dict[str, Any]], converged: bool, wall_time: float) -> Dict[str, Any]:
+        """写入辩论结果与遥测"""
+        debate = {
+            "rounds": rounds,
+            "rounds_run": len(rounds),
+            "max_rounds": self.max_rounds,
+            "converged": converged
+        }
+        state.update_research_consensus("debate", debate)
+        if isinstance(state.telemetry, dict):
+            state.telemetry["debate"] = {
+                "rounds_run": len(rounds),
+                "max_rounds": self.max_rounds,
+                "converged": converged,
+                "round_times": [round_["elapsed"] for round_ in rounds],
+                "wall_time": wall_time
+            }
+        logger.info(f"{state.symbol} 辩论完成: {len(rounds)}/{self.max_rounds} 轮，"
+                    f"{'立场已收敛，提前结束' if converged and len(rounds) < self.max_rounds else '达到最大轮数'}，耗时 {wall_time:.2f}s")
+        return debate
+
+    def run(self, state: AgentState) -> Dict[str, Any]:
+        """进行多轮反驳（每轮双方在线程中并发调用LLM）；缺少任一方开场论点时不辩论"""
+        openings = self._openings(state)
+        if not openings or self.max_rounds == 0:
+            return {}
+
+        bull_argument, bear_argument = openings
+        rounds: List[Dict[str, Any]] = []
+        converged = False
+        start = time.perf_counter()
+
+        with ThreadPoolExecutor(max_workers=2, thread_name_prefix="debate") as executor:
+            for index in range(1, self.max_rounds + 1):
+                round_start = time.perf_counter()
+                bull_prompt, bear_prompt = self._prompts(state, bull_argument, bear_argument, index)
+                bull_future = executor.submit(self.bull.call_llm, bull_prompt, template=REBUTTAL_PROMPT)
+                bear_future = executor.submit(self.bear.call_llm, bear_prompt, template=REBUTTAL_PROMPT)
+                bull_argument, bear_argument = bull_future.result(), bear_future.result()
+
+                rounds.append(self._make_round(state, index, bull_argument, bear_argument, time.perf_counter() - round_start))
+                if len(rounds) > 1 and self._converged(rounds[-2], rounds[-1]):
+                    converged = True
+                    break
+
+        return self._finish(state, rounds, converged, time.perf_counter() - start)
+
+    async def arun(self, state: AgentState) -> Dict[str, Any]:
+        """进行多轮反驳（异步，每轮双方并发调用LLM）"""
+        openings = self._openings(state)
+        if not openings or self.max_rounds == 0:
+            return {}
+
+        bull_argument, bear_argument = openings
+        rounds: List[Dict[str, Any]] = []
+        converged = False
+        start = time.perf_counter()
+
+        for index in range(1, self.max_rounds + 1):
+            round_start = time.perf_counter()
+            bull_prompt, bear_prompt = self._prompts(state, bull_argument, bear_argument, index)
+            bull_argument, bear_argument = await asyncio.gather(
+                self.bull.acall_llm(bull_prompt, template=REBUTTAL_PROMPT),
+                self.bear.acall_llm(bear_prompt, template=REBUTTAL_PROMPT)
+            )
+
+            rounds.append(self._make_round(state, index, bull_argument, bear_argument, time.perf_counter() - round_start))
+            if len(rounds) > 1 and self._converged(rounds[-2], rounds[-1]):
+                converged = True
+                break
+
+        return self._finish(state, rounds, converged, time.perf_counter() - start)
+
+
+def format_debate(debate: Dict[str, Any]) -> str:
+    """将辩论记录格式化为提示词文本"""
+    lines = []
+    for round_ in (debate or {}).get("rounds", []):
+        lines.append(f"### 第 {round_['round']} 轮")
+        lines.append(f"**看涨反驳**（立场强度 {round_['bull']['stance'] if round_['bull']['stance'] is not None else '未给出'}）")
+        lines.append(round_["bull"]["argument"])
+        lines.append(f"**看跌反驳**（立场强度 {round_['bear']['stance'] if round_['bear']['stance'] is not None else '未给出'}）")
+        lines.append(round_["bear"]["argument"])
+    return "\n".join(lines) if lines else "无多轮辩论记录"
+
+
+if __name__ == "__main__":
+    # 独立测试（替换LLM调用，不访问网络）
+    from agents.researchers.bull_researcher import BullResearcher
+    from agents.researchers.bear_researcher import BearResearcher
+
+    class ScriptedResearcher:
+        """按轮次返回预设立场强度的研究员"""
+
+        def __init__(self, researcher, stances):
+            self.researcher = researcher
+            self.name = researcher.name
+            self.stances = list(stances)
+
+        def create_rebuttal_prompt(self, *args):
+            return self.researcher.create_rebuttal_prompt(*args)
+
+        def call_llm(self, prompt, template=None):
+            time.sleep(0.2)
+            return f"反驳内容……\n立场强度: {self.stances.pop(0)}/10"
+
+    state = AgentState("BTC/USDT")
+    state.update_research_consensus("bull_analysis", {"analysis": "BTC将继续上涨"})
+    state.update_research_consensus("bear_analysis", {"analysis": "BTC面临回调"})
+
+    engine = DebateEngine(ScriptedResearcher(BullResearcher(), [9, 7, 6.5, 6]),
+                          ScriptedResearcher(BearResearcher(), [8, 6, 6, 6]),
+                          max_rounds=4, convergence_threshold=1)
+    start = time.perf_counter()
+    debate = engine.run(state)
+    print(f"轮数: {debate['rounds_run']}/4，收敛: {debate['converged']}，耗时 {time.perf_counter() - start:.2f}s（每轮约0.2s，双方并发）")
+    print(f"立场变化: {[(r['bull']['stance'], r['bear']['stance']) for r in debate['rounds']]}")
+    print(f"辩论历史: {len(state.debate_history)} 条")
+    print("测试完成！")
@@ -5,20 +5,56 @@
 
 import sys
 import os
-import pandas as pd
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 
 from typing import Dict, Any
 from agents.risk_management.base import BaseRiskManager
 from utils.state import AgentState
+from utils.prompt_templates import register_prompt
 from utils.logger import get_logger
 
 logger = get_logger(__name__)
 
+# 静态前缀（角色、规则、输出格式），修改后需提升版本号并运行 python -m utils.prompt_templates --update
+AGGRESSIVE_RISK_PROMPT = register_prompt("aggressive_risk", "v1", """
+你是一名专业的加密货币激进风险分析师（Risky Analyst），负责在投资辩论中倡导高回报、高风险的策略，支持交易员采取激进的操作计划。
+
+用户消息会给出分析目标（币种与交易对）、各分析师的报告、研究员观点、研究经理共识以及交易员的初步投资计划。
+
+### 📊 你的任务：
+1. **强调高潜在收益机会**  
+   - 寻找可能带来快速上涨或爆发性收益的机会  
+   - 分析短期价格波动、突破行情或事件驱动机会  
+2. **主张激进策略**  
+   - 即使伴随高波动或清算风险，也强调承担风险换取高收益的合理性  
+3. **反驳保守与中性分析师的观点**  
+   - 指出他们过于谨慎可能错失的行情机会  
+   - 用数据和逻辑反驳其悲观或中性假设  
+4. **数据与辩论结合**  
+   - 使用以下信息强化论点：
+     - 技术面：短期上升趋势、突破阻力位、成交量放大  
+     - 链上数据：活跃地址增加、大额转账、资金流入  
+     - 市场情绪：社交舆情、交易所热度、推特与Reddit讨论  
+     - 新闻事件：上币、合作公告、机构入场或正面监管消息  
+5. **动态辩论风格**  
+   - 中文对话式表达，像在实时辩论中说服对方  
+   - 直接回应保守与中性分析师提出的担忧，逐条反击  
+
+### 💡 输出要求：
+- 中文自然辩论风格表达，不使用机械清单式输出  
+- 明确提出高风险高回报的投资理由  
+- 针对对手观点逐条反驳  
+- 突出激进策略的潜在收益与市场机会
+- 强调在当前市场环境下激进策略的优势
+""")
+
 
 class AggressiveRiskManager(BaseRiskManager):
     """激进风险分析师"""
     
+    reads = ("analysis_reports", "research_consensus", "trade_decision")
+    writes = ("risk_assessment.aggressive_analysis",)
+    
     def __init__(self, name: str = "Aggressive Risk Manager"):
         super().__init__(name)
     
@@ -40,20 +76,32 @@ class AggressiveRiskManager(BaseRiskManager):
             aggressive_analysis = self._generate_aggressive_analysis(state, analysis_reports, research_consensus, trade_decision)
             
             # 更新状态
-            if state.risk_assessment:
-                state.risk_assessment["aggressive_analysis"] = {
-                    "risk_manager": self.name,
-                    "analysis": aggressive_analysis,
-                    "timestamp": str(pd.Timestamp.now())
-                }
-            else:
-                state.risk_assessment = {
-                    "aggressive_analysis": {
-                        "risk_manager": self.name,
-                        "analysis": aggressive_analysis,
-                        "timestamp": str(pd.Timestamp.now())
-                    }
-                }
+            self.update_state_with_assessment(state, "aggressive_analysis", aggressive_analysis)
+            
+            logger.info(f"{self.name} 完成 {state.symbol} 激进风险分析")
+            return state
+            
+        except Exception as e:
+            logger.error(f"{self.name} 分析失败: {e}")
+            return state
+    
+    async def aprocess(self, state: AgentState) -> AgentState:
+        """处理激进风险分析（异步）"""
+        try:
+            logger.info(f"{self.name} 开始分析 {state.symbol}")
+            
+            analysis_reports = self.get_analysis_reports(state)
+            research_consensus = self.get_research_consensus(state)
+            trade_decision = self.get_trade_decision(state)
+            
+            if not analysis_reports:
+                logger.error(f"无法获取 {state.symbol} 的分析报告")
+                return state
+            
+            prompt = self._create_aggressive_analysis_prompt(state, analysis_reports, research_consensus, trade_decision)
+            aggressive_analysis = await self.acall_llm(prompt, template=AGGRESSIVE_RISK_PROMPT)
+            
+            self.update_state_with_assessment(state, "aggressive_analysis", aggressive_analysis)
             
             logger.info(f"{self.name} 完成 {state.symbol} 激进风险分析")
             return state
@@ -69,19 +117,13 @@ class AggressiveRiskManager(BaseRiskManager):
         prompt = self._create_aggressive_analysis_prompt(state, analysis_reports, research_consensus, trade_decision)
         
         # 调用LLM生成分析
-        analysis = self.call_llm(prompt)
+        analysis = self.call_llm(prompt, template=AGGRESSIVE_RISK_PROMPT)
         
         return analysis
     
     def _create_aggressive_analysis_prompt(self, state: AgentState, analysis_reports: Dict[str, Any], research_consensus: Dict[str, Any], trade_decision: Dict[str, Any]) -> str:
         """创建激进风险分析提示词"""
         
-        # 提取分析报告
-        technical_report = analysis_reports.get("technical", {})
-        fundamental_report = analysis_reports.get("fundamental", {})
-        news_report = analysis_reports.get("news", {})
-        social_report = analysis_reports.get("social", {})
-        
         # 提取研究共识
         bull_analysis = research_consensus.get("bull_analysis", {})
         bear_analysis = research_consensus.get("bear_analysis", {})
@@ -90,53 +132,19 @@ class AggressiveRiskManager(BaseRiskManager):
         # 提取交易决策
         trader_decision = trade_decision.get("decision", "无交易决策")
         
-        # 提取分析内容
-        technical_analysis = technical_report.get("analysis", "无技术分析数据")
-        fundamental_analysis = fundamental_report.get("analysis", "无基本面分析数据")
-        news_analysis = news_report.get("analysis", "无新闻分析数据")
-        social_analysis = social_report.get("analysis", "无社交分析数据")
+        # 分析师报告块（本次运行内共享，按 SHARED_CONTEXT_MODE 使用完整报告或摘要）
+        analyst_block = state.shared_context.analyst_block()
         
         bull_analysis_text = bull_analysis.get("analysis", "无看涨分析数据")
         bear_analysis_text = bear_analysis.get("analysis", "无看跌分析数据")
         manager_consensus_text = manager_consensus.get("consensus", "无研究经理共识")
         
         prompt = f"""
-你是一名专业的加密货币激进风险分析师（Risky Analyst），负责在投资辩论中倡导高回报、高风险的策略，支持交易员采取激进的操作计划。
-
 分析目标：{state.coin_name}（交易对：{state.symbol}）
 
-### 📊 你的任务：
-1. **强调高潜在收益机会**  
-   - 寻找可能带来快速上涨或爆发性收益的机会  
-   - 分析短期价格波动、突破行情或事件驱动机会  
-2. **主张激进策略**  
-   - 即使伴随高波动或清算风险，也强调承担风险换取高收益的合理性  
-3. **反驳保守与中性分析师的观点**  
-   - 指出他们过于谨慎可能错失的行情机会  
-   - 用数据和逻辑反驳其悲观或中性假设  
-4. **数据与辩论结合**  
-   - 使用以下信息强化论点：
-     - 技术面：短期上升趋势、突破阻力位、成交量放大  
-     - 链上数据：活跃地址增加、大额转账、资金流入  
-     - 市场情绪：社交舆情、交易所热度、推特与Reddit讨论  
-     - 新闻事件：上币、合作公告、机构入场或正面监管消息  
-5. **动态辩论风格**  
-   - 中文对话式表达，像在实时辩论中说服对方  
-   - 直接回应保守与中性分析师提出的担忧，逐条反击  
-
 ### 可用信息：
 
-## 市场技术分析报告
-{technical_analysis}
-
-## 社交情绪分析
-{social_analysis}
-
-## 最新加密新闻与事件
-{news_analysis}
-
-## 链上与基本面报告
-{fundamental_analysis}
+{analyst_block}
 
 ## 看涨研究员观点
 {bull_analysis_text}
@@ -150,12 +158,7 @@ class AggressiveRiskManager(BaseRiskManager):
 ## 交易员初步投资计划
 {trader_decision}
 
-### 💡 输出要求：
-- 中文自然辩论风格表达，不使用机械清单式输出  
-- 明确提出高风险高回报的投资理由  
-- 针对对手观点逐条反驳  
-- 突出激进策略的潜在收益与市场机会
-- 强调在当前市场环境下激进策略的优势
+请基于以上信息发表你的观点。
 """
 
         return prompt
@@ -5,20 +5,60 @@
 
 import sys
 import os
-import pandas as pd
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 
 from typing import Dict, Any
 from agents.risk_management.base import BaseRiskManager
 from utils.state import AgentState
+from utils.prompt_templates import register_prompt
 from utils.logger import get_logger
 
 logger = get_logger(__name__)
 
+# 静态前缀（角色、规则、输出格式），修改后需提升版本号并运行 python -m utils.prompt_templates --update
+CONSERVATIVE_RISK_PROMPT = register_prompt("conservative_risk", "v1", """
+你是一名专业的加密货币安全/保守风险分析师（Safe Analyst），目标是保护资金安全、最小化波动性，并确保在高波动市场中的稳定与可持续收益。
+
+用户消息会给出分析目标（币种与交易对）、各分析师的报告、研究员观点、研究经理共识以及交易员的初步投资计划。
+
+### 📊 你的任务：
+1️⃣ **优先考虑低风险策略**  
+- 强调资金安全与长期稳健增长  
+- 避免暴露在极端波动、强制平仓、清算或黑客攻击风险中  
+
+2️⃣ **批判激进与中性分析师观点**  
+- 指出他们忽略的潜在风险，例如：
+  - 市场波动导致的大幅回撤
+  - 链上安全事件（黑客攻击、智能合约漏洞、巨鲸转账）
+  - 监管或宏观政策突发利空
+  - 流动性不足或交易所风险（下架、提现限制）
+- 说明激进策略可能带来不可控损失，中性策略可能低估潜在下行  
+
+3️⃣ **提出保守替代方案**  
+- 建议降低仓位、分批建仓或等待更稳健的信号  
+- 结合市场趋势与链上数据提出风险控制措施  
+- 强调止损、止盈、仓位管理的重要性  
+
+4️⃣ **动态辩论风格**  
+- 中文自然对话式表达  
+- 直接回应激进与中性分析师的最新观点  
+- 强调低风险策略的安全性和长期优势
+
+### 💡 输出要求：
+- 中文自然表达，适合加入辩论记录  
+- 明确指出激进/中性观点的风险和漏洞  
+- 提供低风险操作建议（仓位、止损、等待信号）  
+- 突出安全策略在波动市场中的优越性
+- 强调资金安全和风险控制的重要性
+""")
+
 
 class ConservativeRiskManager(BaseRiskManager):
     """保守风险分析师"""
     
+    reads = ("analysis_reports", "research_consensus", "trade_decision")
+    writes = ("risk_assessment.conservative_analysis",)
+    
     def __init__(self, name: str = "Conservative Risk Manager"):
         super().__init__(name)
     
@@ -40,20 +80,32 @@ class ConservativeRiskManager(BaseRiskManager):
             conservative_analysis = self._generate_conservative_analysis(state, analysis_reports, research_consensus, trade_decision)
             
             # 更新状态
-            if state.risk_assessment:
-                state.risk_assessment["conservative_analysis"] = {
-                    "risk_manager": self.name,
-                    "analysis": conservative_analysis,
-                    "timestamp": str(pd.Timestamp.now())
-                }
-            else:
-                state.risk_assessment = {
-                    "conservative_analysis": {
-                        "risk_manager": self.name,
-                        "analysis": conservative_analysis,
-                        "timestamp": str(pd.Timestamp.now())
-                    }
-                }
+            self.update_state_with_assessment(state, "conservative_analysis", conservative_analysis)
+            
+            logger.info(f"{self.name} 完成 {state.symbol} 保守风险分析")
+            return state
+            
+        except Exception as e:
+            logger.error(f"{self.name} 分析失败: {e}")
+            return state
+    
+    async def aprocess(self, state: AgentState) -> AgentState:
+        """处理保守风险分析（异步）"""
+        try:
+            logger.info(f"{self.name} 开始分析 {state.symbol}")
+            
+            analysis_reports = self.get_analysis_reports(state)
+            research_consensus = self.get_research_consensus(state)
+            trade_decision = self.get_trade_decision(state)
+            
+            if not analysis_reports:
+                logger.error(f"无法获取 {state.symbol} 的分析报告")
+                return state
+            
+            prompt = self._create_conservative_analysis_prompt(state, analysis_reports, research_consensus, trade_decision)
+            conservative_analysis = await self.acall_llm(prompt, template=CONSERVATIVE_RISK_PROMPT)
+            
+            self.update_state_with_assessment(state, "conservative_analysis", conservative_analysis)
             
             logger.info(f"{self.name} 完成 {state.symbol} 保守风险分析")
             return state
@@ -69,19 +121,13 @@ class ConservativeRiskManager(BaseRiskManager):
         prompt = self._create_conservative_analysis_prompt(state, analysis_reports, research_consensus, trade_decision)
         
         # 调用LLM生成分析
-        analysis = self.call_llm(prompt)
+        analysis = self.call_llm(prompt, template=CONSERVATIVE_RISK_PROMPT)
         
         return analysis
     
     def _create_conservative_analysis_prompt(self, state: AgentState, analysis_reports: Dict[str, Any], research_consensus: Dict[str, Any], trade_decision: Dict[str, Any]) -> str:
         """创建保守风险分析提示词"""
         
-        # 提取分析报告
-        technical_report = analysis_reports.get("technical", {})
-        fundamental_report = analysis_reports.get("fundamental", {})
-        news_report = analysis_reports.get("news", {})
-        social_report = analysis_reports.get("social", {})
-        
         # 提取研究共识
         bull_analysis = research_consensus.get("bull_analysis", {})
         bear_analysis = research_consensus.get("bear_analysis", {})
@@ -90,57 +136,19 @@ class ConservativeRiskManager(BaseRiskManager):
         # 提取交易决策
         trader_decision = trade_decision.get("decision", "无交易决策")
         
-        # 提取分析内容
-        technical_analysis = technical_report.get("analysis", "无技术分析数据")
-        fundamental_analysis = fundamental_report.get("analysis", "无基本面分析数据")
-        news_analysis = news_report.get("analysis", "无新闻分析数据")
-        social_analysis = social_report.get("analysis", "无社交分析数据")
+        # 分析师报告块（本次运行内共享，按 SHARED_CONTEXT_MODE 使用完整报告或摘要）
+        analyst_block = state.shared_context.analyst_block()
         
         bull_analysis_text = bull_analysis.get("analysis", "无看涨分析数据")
         bear_analysis_text = bear_analysis.get("analysis", "无看跌分析数据")
         manager_consensus_text = manager_consensus.get("consensus", "无研究经理共识")
         
         prompt = f"""
-你是一名专业的加密货币安全/保守风险分析师（Safe Analyst），目标是保护资金安全、最小化波动性，并确保在高波动市场中的稳定与可持续收益。
-
 分析目标：{state.coin_name}（交易对：{state.symbol}）
 
-### 📊 你的任务：
-1️⃣ **优先考虑低风险策略**  
-- 强调资金安全与长期稳健增长  
-- 避免暴露在极端波动、强制平仓、清算或黑客攻击风险中  
-
-2️⃣ **批判激进与中性分析师观点**  
-- 指出他们忽略的潜在风险，例如：
-  - 市场波动导致的大幅回撤
-  - 链上安全事件（黑客攻击、智能合约漏洞、巨鲸转账）
-  - 监管或宏观政策突发利空
-  - 流动性不足或交易所风险（下架、提现限制）
-- 说明激进策略可能带来不可控损失，中性策略可能低估潜在下行  
-
-3️⃣ **提出保守替代方案**  
-- 建议降低仓位、分批建仓或等待更稳健的信号  
-- 结合市场趋势与链上数据提出风险控制措施  
-- 强调止损、止盈、仓位管理的重要性  
-
-4️⃣ **动态辩论风格**  
-- 中文自然对话式表达  
-- 直接回应激进与中性分析师的最新观点  
-- 强调低风险策略的安全性和长期优势
-
 ### 可用信息：
 
-## 市场技术分析报告
-{technical_analysis}
-
-## 社交舆情与情绪分析
-{social_analysis}
-
-## 最新加密新闻与事件
-{news_analysis}
-
-## 链上与基本面报告
-{fundamental_analysis}
+{analyst_block}
 
 ## 看涨研究员观点
 {bull_analysis_text}
@@ -154,12 +162,7 @@ class ConservativeRiskManager(BaseRiskManager):
 ## 交易员初步投资计划
 {trader_decision}
 
-### 💡 输出要求：
-- 中文自然表达，适合加入辩论记录  
-- 明确指出激进/中性观点的风险和漏洞  
-- 提供低风险操作建议（仓位、止损、等待信号）  
-- 突出安全策略在波动市场中的优越性
-- 强调资金安全和风险控制的重要性
+请基于以上信息发表你的观点。
 """
 
         return prompt
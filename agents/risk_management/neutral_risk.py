@@ -5,20 +5,56 @@
 
 import sys
 import os
-import pandas as pd
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 
 from typing import Dict, Any
 from agents.risk_management.base import BaseRiskManager
 from utils.state import AgentState
+from utils.prompt_templates import register_prompt
 from utils.logger import get_logger
 
 logger = get_logger(__name__)
 
+# 静态前缀（角色、规则、输出格式），修改后需提升版本号并运行 python -m utils.prompt_templates --update
+NEUTRAL_RISK_PROMPT = register_prompt("neutral_risk", "v1", """
+你是一名专业的加密货币中性风险分析师（Neutral Analyst），你的角色是提供平衡视角，权衡目标币种的潜在收益与风险。
+
+用户消息会给出分析目标（币种与交易对）、各分析师的报告、研究员观点、研究经理共识以及交易员的初步投资计划。
+
+### 📊 你的任务：
+1️⃣ **平衡分析**  
+- 同时评估短期上涨潜力与下行风险  
+- 考虑市场波动性、链上数据变化和潜在极端事件（清算、黑客攻击、监管利空）  
+- 权衡激进与保守策略的利弊，提出中性、可持续的操作方案  
+
+2️⃣ **批判双方观点**  
+- 指出激进分析师过于乐观、忽视风险的部分  
+- 指出保守分析师过于谨慎、可能错失市场机会的地方  
+
+3️⃣ **提出中性操作建议**  
+- 建议适度仓位、分批建仓或采取对冲/保护性措施  
+- 强调在高波动加密市场中稳健收益的重要性  
+- 建议利用止损、止盈和多币种分散策略平衡风险与收益  
+
+4️⃣ **动态辩论风格**  
+- 中文自然口语表达，仿佛在现场辩论  
+- 逐条回应激进与保守分析师的最新发言  
+- 重点说明为什么中庸策略可以提供相对可靠的长期回报  
+
+### 💡 输出要求：
+- 中文自然辩论风格，直接回应双方观点  
+- 提供明确的中性操作建议（如适度仓位、分批建仓、止损保护）  
+- 强调风险收益平衡与可持续性
+- 突出中庸策略在波动市场中的优势
+""")
+
 
 class NeutralRiskManager(BaseRiskManager):
     """中性风险分析师"""
     
+    reads = ("analysis_reports", "research_consensus", "trade_decision")
+    writes = ("risk_assessment.neutral_analysis",)
+    
     def __init__(self, name: str = "Neutral Risk Manager"):
         super().__init__(name)
     
@@ -40,20 +76,32 @@ class NeutralRiskManager(BaseRiskManager):
             neutral_analysis = self._generate_neutral_analysis(state, analysis_reports, research_consensus, trade_decision)
             
             # 更新状态
-            if state.risk_assessment:
-                state.risk_assessment["neutral_analysis"] = {
-                    "risk_manager": self.name,
-                    "analysis": neutral_analysis,
-                    "timestamp": str(pd.Timestamp.now())
-                }
-            else:
-                state.risk_assessment = {
-                    "neutral_analysis": {
-                        "risk_manager": self.name,
-                        "analysis": neutral_analysis,
-                        "timestamp": str(pd.Timestamp.now())
-                    }
-                }
+            self.update_state_with_assessment(state, "neutral_analysis", neutral_analysis)
+            
+            logger.info(f"{self.name} 完成 {state.symbol} 中性风险分析")
+            return state
+            
+        except Exception as e:
+            logger.error(f"{self.name} 分析失败: {e}")
+            return state
+    
+    async def aprocess(self, state: AgentState) -> AgentState:
+        """处理中性风险分析（异步）"""
+        try:
+            logger.info(f"{self.name} 开始分析 {state.symbol}")
+            
+            analysis_reports = self.get_analysis_reports(state)
+            research_consensus = self.get_research_consensus(state)
+            trade_decision = self.get_trade_decision(state)
+            
+            if not analysis_reports:
+                logger.error(f"无法获取 {state.symbol} 的分析报告")
+                return state
+            
+            prompt = self._create_neutral_analysis_prompt(state, analysis_reports, research_consensus, trade_decision)
+            neutral_analysis = await self.acall_llm(prompt, template=NEUTRAL_RISK_PROMPT)
+            
+            self.update_state_with_assessment(state, "neutral_analysis", neutral_analysis)
             
             logger.info(f"{self.name} 完成 {state.symbol} 中性风险分析")
             return state
@@ -69,19 +117,13 @@ class NeutralRiskManager(BaseRiskManager):
         prompt = self._create_neutral_analysis_prompt(state, analysis_reports, research_consensus, trade_decision)
         
         # 调用LLM生成分析
-        analysis = self.call_llm(prompt)
+        analysis = self.call_llm(prompt, template=NEUTRAL_RISK_PROMPT)
         
         return analysis
     
     def _create_neutral_analysis_prompt(self, state: AgentState, analysis_reports: Dict[str, Any], research_consensus: Dict[str, Any], trade_decision: Dict[str, Any]) -> str:
         """创建中性风险分析提示词"""
         
-        # 提取分析报告
-        technical_report = analysis_reports.get("technical", {})
-        fundamental_report = analysis_reports.get("fundamental", {})
-        news_report = analysis_reports.get("news", {})
-        social_report = analysis_reports.get("social", {})
-        
         # 提取研究共识
         bull_analysis = research_consensus.get("bull_analysis", {})
         bear_analysis = research_consensus.get("bear_analysis", {})
@@ -90,52 +132,19 @@ class NeutralRiskManager(BaseRiskManager):
         # 提取交易决策
         trader_decision = trade_decision.get("decision", "无交易决策")
         
-        # 提取分析内容
-        technical_analysis = technical_report.get("analysis", "无技术分析数据")
-        fundamental_analysis = fundamental_report.get("analysis", "无基本面分析数据")
-        news_analysis = news_report.get("analysis", "无新闻分析数据")
-        social_analysis = social_report.get("analysis", "无社交分析数据")
+        # 分析师报告块（本次运行内共享，按 SHARED_CONTEXT_MODE 使用完整报告或摘要）
+        analyst_block = state.shared_context.analyst_block()
         
         bull_analysis_text = bull_analysis.get("analysis", "无看涨分析数据")
         bear_analysis_text = bear_analysis.get("analysis", "无看跌分析数据")
         manager_consensus_text = manager_consensus.get("consensus", "无研究经理共识")
         
         prompt = f"""
-你是一名专业的加密货币中性风险分析师（Neutral Analyst），你的角色是提供平衡视角，权衡 {state.coin_name}（交易对：{state.symbol}） 的潜在收益与风险。
-
-### 📊 你的任务：
-1️⃣ **平衡分析**  
-- 同时评估短期上涨潜力与下行风险  
-- 考虑市场波动性、链上数据变化和潜在极端事件（清算、黑客攻击、监管利空）  
-- 权衡激进与保守策略的利弊，提出中性、可持续的操作方案  
-
-2️⃣ **批判双方观点**  
-- 指出激进分析师过于乐观、忽视风险的部分  
-- 指出保守分析师过于谨慎、可能错失市场机会的地方  
-
-3️⃣ **提出中性操作建议**  
-- 建议适度仓位、分批建仓或采取对冲/保护性措施  
-- 强调在高波动加密市场中稳健收益的重要性  
-- 建议利用止损、止盈和多币种分散策略平衡风险与收益  
-
-4️⃣ **动态辩论风格**  
-- 中文自然口语表达，仿佛在现场辩论  
-- 逐条回应激进与保守分析师的最新发言  
-- 重点说明为什么中庸策略可以提供相对可靠的长期回报  
+分析目标：{state.coin_name}（交易对：{state.symbol}）
 
 ### 可用信息：
 
-## 市场技术分析报告
-{technical_analysis}
-
-## 社交舆情与情绪分析
-{social_analysis}
-
-## 最新加密新闻与事件
-{news_analysis}
-
-## 链上与基本面分析报告
-{fundamental_analysis}
+{analyst_block}
 
 ## 看涨研究员观点
 {bull_analysis_text}
@@ -149,11 +158,7 @@ class NeutralRiskManager(BaseRiskManager):
 ## 交易员初步投资计划
 {trader_decision}
 
-### 💡 输出要求：
-- 中文自然辩论风格，直接回应双方观点  
-- 提供明确的中性操作建议（如适度仓位、分批建仓、止损保护）  
-- 强调风险收益平衡与可持续性
-- 突出中庸策略在波动市场中的优势
+请基于以上信息发表你的观点。
 """
 
         return prompt
@@ -2,9 +2,10 @@
 交易员基础类
 """
 
-import openai
-from typing import Dict, Any
-from utils.config import Config
+import asyncio
+from typing import Dict, Any, List, Tuple, Optional
+from utils.llm_gateway import get_llm_gateway
+from utils.prompt_templates import PromptTemplate
 from utils.logger import get_logger
 
 logger = get_logger(__name__)
@@ -13,6 +14,14 @@ logger = get_logger(__name__)
 class BaseTrader:
     """交易员基础类"""
     
+    # 调度声明：读取/写入的 AgentState 字段（支持 a.b 形式的子字段），由 DAGScheduler 构建依赖图
+    reads: Tuple[str, ...] = ()
+    writes: Tuple[str, ...] = ()
+    # 预估耗时（以一次LLM调用为单位），用于 dry-run 计算关键路径
+    estimated_cost: float = 1.0
+    # LLM响应缓存有效期（秒），None 使用 LLM_CACHE_TTL，0 表示不缓存
+    llm_cache_ttl: Optional[float] = None
+    
     def __init__(self, name: str):
         self.name = name
         self.llm = self._init_llm()
@@ -26,30 +35,52 @@ class BaseTrader:
             logger.error(f"初始化LLM失败: {e}")
             return None
     
-    def _call_llm(self, prompt: str) -> str:
-        """调用LLM"""
+    def _build_messages(self, prompt: str, template: Optional[PromptTemplate] = None) -> List[Dict[str, str]]:
+        """构建对话消息：有模板时静态前缀作为 system 消息放在最前（可命中提示词前缀缓存）"""
+        if template is not None:
+            return template.messages(prompt)
+        return [
+            {"role": "system", "content": "你是一名专业的加密货币交易员，擅长技术分析和风险管理。"},
+            {"role": "user", "content": prompt}
+        ]
+    
+    def _chat(self, messages: List[Dict[str, str]], response_format: Optional[Dict[str, Any]] = None) -> str:
+        """以对话消息调用LLM（经共享LLM网关）；response_format 如 {"type": "json_object"}（JSON模式）"""
         try:
-            if not Config.OPENAI_API_KEY:
+            gateway = get_llm_gateway()
+            if not gateway.available:
                 logger.warning("OpenAI API Key未配置，使用模拟响应")
-                return self._generate_mock_response(prompt)
+                return self._generate_mock_response(messages[-1]["content"])
             
-            from openai import OpenAI
-            client = OpenAI(api_key=Config.OPENAI_API_KEY)
-            response = client.chat.completions.create(
-                model=self.llm,
-                messages=[
-                    {"role": "system", "content": "你是一名专业的加密货币交易员，擅长技术分析和风险管理。"},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.1,
-                max_tokens=2000
-            )
+            return gateway.chat(messages, agent=self.name, model=self.llm, temperature=0.1, cache_ttl=self.llm_cache_ttl,
+                                response_format=response_format)
             
-            return response.choices[0].message.content
+        except Exception as e:
+            logger.error(f"调用LLM失败: {e}")
+            return self._generate_mock_response(messages[-1]["content"])
+    
+    async def _achat(self, messages: List[Dict[str, str]], response_format: Optional[Dict[str, Any]] = None) -> str:
+        """以对话消息调用LLM（异步）"""
+        try:
+            gateway = get_llm_gateway()
+            if not gateway.available:
+                logger.warning("OpenAI API Key未配置，使用模拟响应")
+                return self._generate_mock_response(messages[-1]["content"])
+            
+            return await gateway.achat(messages, agent=self.name, model=self.llm, temperature=0.1, cache_ttl=self.llm_cache_ttl,
+                                       response_format=response_format)
             
         except Exception as e:
             logger.error(f"调用LLM失败: {e}")
-            return self._generate_mock_response(prompt)
+            return self._generate_mock_response(messages[-1]["content"])
+    
+    def _call_llm(self, prompt: str, template: Optional[PromptTemplate] = None) -> str:
+        """调用LLM（经共享LLM网关）"""
+        return self._chat(self._build_messages(prompt, template))
+    
+    async def _acall_llm(self, prompt: str, template: Optional[PromptTemplate] = None) -> str:
+        """调用LLM（异步）"""
+        return await self._achat(self._build_messages(prompt, template))
     
     def _generate_mock_response(self, prompt: str) -> str:
         """生成模拟响应"""
@@ -82,4 +113,8 @@ class BaseTrader:
     
     def process(self, state) -> Dict[str, Any]:
         """处理状态并生成交易决策"""
-        raise NotImplementedError 
\ No newline at end of file
+        raise NotImplementedError
+    
+    async def aprocess(self, state) -> Dict[str, Any]:
+        """异步处理状态（默认在线程中执行同步 process，子类可覆盖为原生异步实现）"""
+        return await asyncio.to_thread(self.process, state) 
\ No newline at end of file
@@ -3,17 +3,109 @@
 """
 
 import json
+import re
 import pandas as pd
 from typing import Dict, Any, Optional
 from agents.trader.base import BaseTrader
+from utils.report_digest import digest_report
+from utils.prompt_templates import register_prompt
+from utils.response_parser import CURRENT_PRICE_BANK, TRADE_PRICE_BANK
+from utils.structured_output import (
+    JSON_OBJECT_FORMAT, OutputSchema, SchemaField, StructuredResult, arequest_structured, request_structured
+)
 from utils.logger import get_logger
 
 logger = get_logger(__name__)
 
+PRICE_FIELDS = ("entry_price", "stop_loss", "take_profit")
+
+# 没有任何带标签价格时的兜底：四位以上的裸数字
+BARE_PRICE = re.compile(r"(\d{4,}(?:\.\d+)?)")
+
+
+def _check_trade_prices(values: Dict[str, Any]) -> Dict[str, str]:
+    """买入/卖出必须给出三个价格，且止损、入场、止盈的顺序与方向一致"""
+    if values.get("decision") not in ("买入", "卖出"):
+        return {}
+    missing = {name: "买入/卖出决策必须提供价格" for name in PRICE_FIELDS if values.get(name) is None}
+    if missing:
+        return missing
+
+    entry, stop, target = (values[name] for name in PRICE_FIELDS)
+    if values["decision"] == "买入" and not stop < entry < target:
+        message = "买入时必须满足 止损价 < 入场价 < 止盈价"
+        return {"stop_loss": message, "take_profit": message}
+    if values["decision"] == "卖出" and not target < entry < stop:
+        message = "卖出时必须满足 止盈价 < 入场价 < 止损价"
+        return {"stop_loss": message, "take_profit": message}
+    return {}
+
+
+TRADER_OUTPUT_SCHEMA = OutputSchema("trader", (
+    SchemaField("decision", "choice", "交易决策", choices=("买入", "卖出", "观望")),
+    SchemaField("entry_price", "number", "入场价格（数值，计价货币）", minimum=0, nullable=True),
+    SchemaField("stop_loss", "number", "止损价格（数值，计价货币）", minimum=0, nullable=True),
+    SchemaField("take_profit", "number", "止盈价格（数值，计价货币）", minimum=0, nullable=True),
+    SchemaField("confidence_score", "number", "置信度（0-1）", minimum=0, maximum=1, default=0.5),
+    SchemaField("risk_score", "number", "风险评分（0-1，0为低风险，1为高风险）", minimum=0, maximum=1, default=0.5),
+    SchemaField("position_size", "number", "建议仓位比例（0-1，观望为0）", minimum=0, maximum=1, default=0.1),
+    SchemaField("analysis", "text", "中文完整分析报告（含详细推理）"),
+), checks=(_check_trade_prices,))
+
+# 静态前缀（角色、规则、输出格式），修改后需提升版本号并运行 python -m utils.prompt_templates --update
+TRADER_PROMPT = register_prompt("trader", "v2", """
+你是一名专业的加密货币交易员（Trader），
+负责基于多维度分析为用户消息中的交易对做出最终交易决策。
+
+⚠️ 重要要求：
+- 所有价格必须使用用户消息中指定的计价货币为单位
+- 绝对禁止回答"无法确定目标价"或"需要更多信息"
+- 必须提供具体的数值型目标价格或价格区间
+- 价格建议必须基于用户消息中的当前市场价格，不能偏离太远
+- **盈亏比要求**：止损与止盈的盈亏比至少为1:2，理想为1:3，确保风险收益合理
+- **决策逻辑**：只有明确建议买入或卖出时才提供具体价格，观望时不提供价格
+
+用户消息会给出当前市场信息（交易对、当前价格与计价货币）、各维度分析摘要与研究共识。
+
+### 📊 分析内容要求：
+1️⃣ **投资建议**
+- 明确的买入 / 卖出 / 观望决策
+- 观望：当市场信号不明确或风险过高时选择观望
+
+2️⃣ **目标价格或区间**
+- **买入决策**：提供入场价格、止损价格、止盈价格（盈亏比≥1:2）
+- **卖出决策**：提供卖出价格、止损价格、止盈价格（盈亏比≥1:2）
+- **观望决策**：不提供具体价格，说明观望理由
+
+3️⃣ **量化指标**
+- 置信度（0-1）
+- 风险评分（0-1，0为低风险，1为高风险）
+
+4️⃣ **详细推理**
+- 综合以下维度进行分析：
+  - 技术面：支撑位、阻力位、突破形态、交易量
+  - 链上数据：活跃地址、资金流入流出、大额转账
+  - 市场情绪与舆情：社交热度、情绪偏向
+  - 新闻与事件：上币、合作公告、监管动态
+  - 历史交易经验和风险控制措施
+
+5️⃣ **最终输出**
+""" + TRADER_OUTPUT_SCHEMA.format_instructions() + """
+
+请基于用户消息中的分析数据做出专业的交易决策。注意：
+1. 所有价格建议必须基于当前市场价格
+2. 盈亏比至少为1:2，确保风险收益合理
+3. 观望决策不提供具体价格
+4. 只有明确买入或卖出建议时才提供入场价格、止损价格、止盈价格
+""")
+
 
 class Trader(BaseTrader):
     """交易员 - 综合分析与研究共识生成交易决策"""
     
+    reads = ("analysis_reports", "research_consensus.manager_consensus")
+    writes = ("trading_decision",)
+    
     def __init__(self, name: str = "Trader"):
         super().__init__(name)
         
@@ -45,6 +137,27 @@ class Trader(BaseTrader):
             logger.error(f"{self.name} 处理失败: {e}")
             return state
     
+    async def aprocess(self, state) -> Dict[str, Any]:
+        """处理状态并生成交易决策（异步）"""
+        try:
+            logger.info(f"{self.name} 开始生成交易决策")
+            
+            trading_decision = await self._agenerate_trading_decision(
+                state.symbol,
+                state.analysis_reports or {},
+                state.research_consensus or {}
+            )
+            
+            # 更新状态
+            state.trading_decision = trading_decision
+            
+            logger.info(f"{self.name} 交易决策生成完成")
+            return state
+            
+        except Exception as e:
+            logger.error(f"{self.name} 处理失败: {e}")
+            return state
+    
     def _generate_trading_decision(self, symbol: str, analysis_reports: Dict, research_consensus: Dict) -> Dict[str, Any]:
         """生成交易决策"""
         try:
@@ -57,13 +170,27 @@ class Trader(BaseTrader):
             # 构建交易员Prompt
             prompt = self._build_trader_prompt(symbol, analysis_summary, consensus_text)
             
-            # 调用LLM生成交易决策
-            response = self._call_llm(prompt)
+            # 调用LLM生成交易决策（JSON模式，未通过校验的字段追问重答）
+            messages = self._build_messages(prompt, TRADER_PROMPT)
+            result = request_structured(TRADER_OUTPUT_SCHEMA, lambda m: self._chat(m, JSON_OBJECT_FORMAT), messages)
+            
+            return self._decision_from_output(result, symbol, analysis_summary)
+            
+        except Exception as e:
+            logger.error(f"生成交易决策失败: {e}")
+            return self._generate_fallback_decision(symbol)
+    
+    async def _agenerate_trading_decision(self, symbol: str, analysis_reports: Dict, research_consensus: Dict) -> Dict[str, Any]:
+        """生成交易决策（异步）"""
+        try:
+            analysis_summary = self._build_analysis_summary(analysis_reports)
+            consensus_text = research_consensus.get("manager_consensus", {}).get("consensus", "无研究共识")
+            prompt = self._build_trader_prompt(symbol, analysis_summary, consensus_text)
             
-            # 解析响应
-            trading_decision = self._parse_trading_response(response, symbol, analysis_summary)
+            messages = self._build_messages(prompt, TRADER_PROMPT)
+            result = await arequest_structured(TRADER_OUTPUT_SCHEMA, lambda m: self._achat(m, JSON_OBJECT_FORMAT), messages)
             
-            return trading_decision
+            return self._decision_from_output(result, symbol, analysis_summary)
             
         except Exception as e:
             logger.error(f"生成交易决策失败: {e}")
@@ -77,15 +204,19 @@ class Trader(BaseTrader):
         if "technical" in analysis_reports:
             tech_report = analysis_reports["technical"]
             if isinstance(tech_report, dict):
-                summary["technical"] = tech_report.get("summary", "技术分析完成")
+                summary["technical"] = self._report_summary(tech_report, "技术分析完成")
+                # 当前价格优先取技术报告中的行情数据，其次从完整报告文本中提取（摘要可能已截掉）
+                summary["current_price"] = self._report_current_price(tech_report)
             else:
                 summary["technical"] = str(tech_report)
+        if summary.get("current_price") is None:
+            summary["current_price"] = self._extract_current_price(summary.get("technical", ""))
         
         # 基本面分析
         if "fundamental" in analysis_reports:
             fund_report = analysis_reports["fundamental"]
             if isinstance(fund_report, dict):
-                summary["fundamental"] = fund_report.get("summary", "基本面分析完成")
+                summary["fundamental"] = self._report_summary(fund_report, "基本面分析完成")
             else:
                 summary["fundamental"] = str(fund_report)
         
@@ -93,7 +224,7 @@ class Trader(BaseTrader):
         if "news" in analysis_reports:
             news_report = analysis_reports["news"]
             if isinstance(news_report, dict):
-                summary["news"] = news_report.get("summary", "新闻分析完成")
+                summary["news"] = self._report_summary(news_report, "新闻分析完成")
             else:
                 summary["news"] = str(news_report)
         
@@ -101,63 +232,35 @@ class Trader(BaseTrader):
         if "social" in analysis_reports:
             social_report = analysis_reports["social"]
             if isinstance(social_report, dict):
-                summary["social"] = social_report.get("summary", "社交分析完成")
+                summary["social"] = self._report_summary(social_report, "社交分析完成")
             else:
                 summary["social"] = str(social_report)
         
         return summary
     
+    def _report_summary(self, report: Dict, default: str) -> str:
+        """报告摘要：优先使用分析师写入的摘要，否则按报告内容现算（有缓存）"""
+        if report.get("summary"):
+            return report["summary"]
+        if report.get("analysis"):
+            return digest_report(report["analysis"])["summary"]
+        return default
+    
     def _build_trader_prompt(self, symbol: str, analysis_summary: Dict, consensus_text: str) -> str:
         """构建交易员Prompt"""
         coin_name = symbol.split('/')[0] if '/' in symbol else symbol
         currency_name = symbol.split('/')[1] if '/' in symbol else "USDT"
         currency_symbol = currency_name
         
-        # 从技术分析中提取当前价格信息
-        current_price = self._extract_current_price(analysis_summary.get('technical', ''))
+        # 当前价格取自技术分析；找不到时如实标注未知，不给模型一个虚构的锚定价格
+        current_price = analysis_summary.get("current_price")
+        price_line = f"{current_price} {currency_symbol}" if current_price is not None else "未知（本次只能给出观望决策）"
         
-        prompt = f"""你是一名专业的加密货币交易员（Trader），
-负责基于多维度分析为 {coin_name}（交易对：{symbol}） 做出最终交易决策。
-
-⚠️ 重要要求：
-- 所有价格必须使用 {currency_name}（{currency_symbol}）为单位
-- 绝对禁止回答"无法确定目标价"或"需要更多信息"
-- 必须提供具体的数值型目标价格或价格区间
-- 价格建议必须基于当前市场价格 {current_price} {currency_symbol}，不能偏离太远
-- **盈亏比要求**：止损与止盈的盈亏比至少为1:2，理想为1:3，确保风险收益合理
-- **决策逻辑**：只有明确建议买入或卖出时才提供具体价格，观望时不提供价格
-
+        prompt = f"""
 ### 📊 当前市场信息：
-- 当前价格：{current_price} {currency_symbol}
 - 交易对：{symbol}
-
-### 📊 分析内容要求：
-1️⃣ **投资建议**
-- 明确的买入 / 卖出 / 观望决策
-- 观望：当市场信号不明确或风险过高时选择观望
-
-2️⃣ **目标价格或区间**
-- **买入决策**：提供入场价格、止损价格、止盈价格（盈亏比≥1:2）
-- **卖出决策**：提供卖出价格、止损价格、止盈价格（盈亏比≥1:2）
-- **观望决策**：不提供具体价格，说明观望理由
-
-3️⃣ **量化指标**
-- 置信度（0-1）
-- 风险评分（0-1，0为低风险，1为高风险）
-
-4️⃣ **详细推理**
-- 综合以下维度进行分析：
-  - 技术面：支撑位、阻力位、突破形态、交易量
-  - 链上数据：活跃地址、资金流入流出、大额转账
-  - 市场情绪与舆情：社交热度、情绪偏向
-  - 新闻与事件：上币、合作公告、监管动态
-  - 历史交易经验和风险控制措施
-
-5️⃣ **最终输出**
-- 中文完整分析报告
-- 末尾必须以：
-    -最终交易建议: 买入/卖出/观望
-结束，明确当前决策
+- 当前价格：{price_line}
+- 计价货币：{currency_name}（{currency_symbol}）
 
 ### 📈 当前分析数据：
 
@@ -176,54 +279,173 @@ class Trader(BaseTrader):
 **研究共识：**
 {consensus_text}
 
-请基于以上分析数据，为 {coin_name} 提供专业的交易决策。注意：
-1. 所有价格建议必须基于当前市场价格 {current_price} {currency_symbol}
-2. 盈亏比至少为1:2，确保风险收益合理
-3. 观望决策不提供具体价格
-4. 只有明确买入或卖出建议时才提供入场价格、止损价格、止盈价格"""
+请为 {coin_name} 提供专业的交易决策。
+"""
 
         return prompt
     
-    def _extract_current_price(self, technical_analysis: str) -> str:
-        """从技术分析中提取当前价格"""
+    def _report_current_price(self, tech_report: Dict) -> Optional[str]:
+        """技术报告中的当前价格：行情数据优先，其次报告文本"""
         try:
-            import re
-            # 尝试从技术分析中提取当前价格
-            price_patterns = [
-                r'当前价格[：:]\s*(\d+(?:,\d+)*(?:\.\d+)?)',
-                r'价格[：:]\s*(\d+(?:,\d+)*(?:\.\d+)?)',
-                r'(\d+(?:,\d+)*(?:\.\d+)?)\s*USDT',
-                r'(\d+(?:,\d+)*(?:\.\d+)?)\s*美元'
-            ]
-            
-            for pattern in price_patterns:
-                match = re.search(pattern, technical_analysis)
-                if match:
-                    return match.group(1).replace(',', '')
-            
-            # 如果没找到，返回默认值
-            return "113000"
+            price = float(tech_report.get("current_price") or 0)
+        except (TypeError, ValueError):
+            price = 0
+        if price > 0:
+            return str(price)
+        return self._extract_current_price(str(tech_report.get("analysis", "")))
+    
+    def _extract_current_price(self, technical_analysis: str, default: Optional[str] = None) -> Optional[str]:
+        """从技术分析中提取当前价格，找不到时返回 default"""
+        try:
+            return CURRENT_PRICE_BANK.extract(technical_analysis).get("current_price", default)
             
         except Exception as e:
             logger.error(f"提取当前价格失败: {e}")
-            return "113000"
+            return default
+    
+    def _decision_from_output(self, result: StructuredResult, symbol: str, analysis_summary: Dict) -> Dict[str, Any]:
+        """由结构化输出组装交易决策；输出不是JSON时整体按文本解析，追问后仍未通过校验的字段按文本解析补齐"""
+        if not result.parsed:
+            logger.warning(f"{self.name} 输出不是JSON，按文本解析")
+            decision = self._parse_trading_response(result.raw, symbol, analysis_summary)
+            decision["parse_method"] = "text"
+            return decision
+        
+        values = dict(result.values)
+        parse_method = "json" if not result.repairs else "json_repaired"
+        if result.errors:
+            values = self._complete_failed_fields(result, values, analysis_summary)
+            parse_method = "json_text"
+        
+        decision = values.get("decision") or "观望"
+        if decision != "观望" and analysis_summary.get("current_price") is None:
+            logger.warning(f"{self.name} 当前价格未知，{decision} 决策改为观望")
+            decision = "观望"
+        prices = {name: values.get(name) for name in PRICE_FIELDS}
+        if decision == "观望":
+            prices = {name: "NA" for name in PRICE_FIELDS}
+        
+        return {
+            "decision": decision,
+            **prices,
+            "confidence_score": values.get("confidence_score", 0.5),
+            "risk_score": values.get("risk_score", 0.5),
+            "position_size": 0.0 if decision == "观望" else values.get("position_size"),
+            "analysis": values.get("analysis") or result.raw,
+            "symbol": symbol,
+            "parse_method": parse_method
+        }
+    
+    def _complete_failed_fields(self, result: StructuredResult, values: Dict[str, Any],
+                                analysis_summary: Dict) -> Dict[str, Any]:
+        """
+        补齐追问后仍未通过校验的字段：决策与价格按文本解析，其他字段使用模式默认值，然后整体复核（含跨字段约束）；
+        价格仍不一致或无法确定入场价时改为观望，不输出拼凑的订单
+        """
+        logger.warning(f"{self.name} 字段仍未通过校验，按文本解析补齐: {result.errors}")
+        text = values.get("analysis") or result.raw
+        values = {**values, "analysis": text}
+        failed = set(result.errors)
+        
+        if "decision" in failed:
+            values["decision"] = self._extract_decision(text)
+        
+        for name in failed - set(PRICE_FIELDS) - {"decision"}:
+            values[name] = TRADER_OUTPUT_SCHEMA.field(name).default
+        
+        if failed & set(PRICE_FIELDS) and values["decision"] in ("买入", "卖出"):
+            prices = self._extract_trade_prices(text, values["decision"], analysis_summary)
+            if prices is None:
+                logger.warning(f"{self.name} 无法确定入场价，改为观望")
+                return {**values, "decision": "观望"}
+            values.update({name: prices[name] for name in PRICE_FIELDS if name in failed})
+        else:
+            values.update({name: None for name in failed & set(PRICE_FIELDS)})
+        
+        checked, errors = TRADER_OUTPUT_SCHEMA.validate(values)
+        if errors:
+            logger.warning(f"{self.name} 补齐后仍未通过校验 {errors}，改为观望")
+            values["decision"] = "观望"
+            return values
+        return {**values, **checked}
+    
+    def _extract_decision(self, response: str) -> str:
+        """从文本中提取最终交易建议，找不到时为观望"""
+        if "最终交易建议:" in response:
+            decision_part = response.split("最终交易建议:")[-1].strip()
+            if "买入" in decision_part:
+                return "买入"
+            if "卖出" in decision_part:
+                return "卖出"
+        return "观望"
+    
+    def _extract_trade_prices(self, response: str, decision: str, analysis_summary: Dict) -> Optional[Dict[str, float]]:
+        """
+        从文本中提取入场、止损、止盈价格，缺失的入场价取当前价格，缺失的止损/止盈按入场价推算
+        
+        Returns:
+            价格字典；文本和技术分析中都没有可用价格时返回 None
+        """
+        # 提取价格信息（预编译模式库，一次扫描提取全部带标签的价格）
+        prices = TRADE_PRICE_BANK.extract_floats(response)
+        entry_price = prices.get("entry_price", 0)
+        stop_loss = prices.get("stop_loss", 0)
+        take_profit = prices.get("take_profit", 0)
+        
+        # 如果没找到具体价格，尝试从数字中提取
+        if entry_price == 0 and stop_loss == 0 and take_profit == 0:
+            bare_prices = BARE_PRICE.findall(response)
+            if len(bare_prices) >= 3:
+                try:
+                    # 按价格大小排序，取合理的价格组合
+                    bare_prices = [float(p) for p in bare_prices if float(p) > 1000]  # 过滤掉太小的数字
+                    bare_prices.sort()
+                    if len(bare_prices) >= 3:
+                        entry_price = bare_prices[0]  # 最低价作为入场价
+                        stop_loss = bare_prices[0] * 0.95  # 止损价略低于入场价
+                        take_profit = bare_prices[-1]  # 最高价作为止盈价
+                except:
+                    pass
+        
+        # 如果仍然没有找到价格，以技术分析中的当前价格作为入场价
+        if entry_price == 0:
+            try:
+                entry_price = float(analysis_summary.get("current_price"))
+            except (TypeError, ValueError):
+                return None
+        
+        # 优化盈亏比计算 - 确保至少1:2的盈亏比
+        if stop_loss == 0 and entry_price > 0:
+            if decision == "买入":
+                stop_loss = entry_price * 0.97  # 止损为入场价的97%
+            else:  # 卖出
+                stop_loss = entry_price * 1.03  # 止损为入场价的103%
+        
+        if take_profit == 0 and entry_price > 0:
+            if decision == "买入":
+                # 确保盈亏比至少1:2
+                risk = entry_price - stop_loss
+                take_profit = entry_price + (risk * 2.5)  # 1:2.5的盈亏比
+            else:  # 卖出
+                # 确保盈亏比至少1:2
+                risk = stop_loss - entry_price
+                take_profit = entry_price - (risk * 2.5)  # 1:2.5的盈亏比
+        
+        return {"entry_price": entry_price, "stop_loss": stop_loss, "take_profit": take_profit}
     
     def _parse_trading_response(self, response: str, symbol: str, analysis_summary: Dict) -> Dict[str, Any]:
-        """解析交易员响应"""
+        """按文本解析交易员响应（非JSON输出的兜底）"""
         try:
             # 提取最终交易建议
-            if "最终交易建议:" in response:
-                decision_part = response.split("最终交易建议:")[-1].strip()
-                if "买入" in decision_part:
-                    decision = "买入"
-                elif "卖出" in decision_part:
-                    decision = "卖出"
-                elif "观望" in decision_part:
+            decision = self._extract_decision(response)
+            prices = None
+            if decision != "观望":
+                # 当前价格未知或无法确定入场价时不下单
+                if analysis_summary.get("current_price") is not None:
+                    prices = self._extract_trade_prices(response, decision, analysis_summary)
+                if prices is None:
+                    logger.warning(f"{self.name} 当前价格未知或无法确定入场价，{decision} 决策改为观望")
                     decision = "观望"
-                else:
-                    decision = "观望"
-            else:
-                decision = "观望"
             
             # 如果是观望决策，不提供价格
             if decision == "观望":
@@ -238,118 +460,7 @@ class Trader(BaseTrader):
                     "symbol": symbol
                 }
             
-            # 提取价格信息（改进版本）
-            entry_price = 0
-            stop_loss = 0
-            take_profit = 0
-            
-            # 尝试从文本中提取价格
-            import re
-            
-            # 提取入场价格 - 增加更多模式
-            entry_patterns = [
-                r'入场价格[：:]\s*(\d+(?:,\d+)*(?:\.\d+)?)',
-                r'买入目标价[：:]\s*(\d+(?:,\d+)*(?:\.\d+)?)',
-                r'建议在\s*(\d+(?:,\d+)*(?:\.\d+)?)\s*USDT',
-                r'(\d+(?:,\d+)*(?:\.\d+)?)\s*USDT\s*附近买入',
-                r'入场价[：:]\s*(\d+(?:,\d+)*(?:\.\d+)?)',
-                r'买入价[：:]\s*(\d+(?:,\d+)*(?:\.\d+)?)',
-                r'建议买入价格[：:]\s*(\d+(?:,\d+)*(?:\.\d+)?)',
-                r'当前价格[：:]\s*(\d+(?:,\d+)*(?:\.\d+)?)',
-                r'价格[：:]\s*(\d+(?:,\d+)*(?:\.\d+)?)'
-            ]
-            
-            for pattern in entry_patterns:
-                entry_match = re.search(pattern, response)
-                if entry_match:
-                    try:
-                        entry_price = float(entry_match.group(1).replace(',', ''))
-                        break
-                    except:
-                        continue
-            
-            # 提取止损价格 - 增加更多模式
-            stop_patterns = [
-                r'止损价格[：:]\s*(\d+(?:,\d+)*(?:\.\d+)?)',
-                r'止损位[：:]\s*(\d+(?:,\d+)*(?:\.\d+)?)',
-                r'设置止损位在\s*(\d+(?:,\d+)*(?:\.\d+)?)',
-                r'止损位在\s*(\d+(?:,\d+)*(?:\.\d+)?)',
-                r'止损价[：:]\s*(\d+(?:,\d+)*(?:\.\d+)?)',
-                r'止损价位[：:]\s*(\d+(?:,\d+)*(?:\.\d+)?)',
-                r'建议止损[：:]\s*(\d+(?:,\d+)*(?:\.\d+)?)'
-            ]
-            
-            for pattern in stop_patterns:
-                stop_match = re.search(pattern, response)
-                if stop_match:
-                    try:
-                        stop_loss = float(stop_match.group(1).replace(',', ''))
-                        break
-                    except:
-                        continue
-            
-            # 提取止盈价格 - 增加更多模式
-            profit_patterns = [
-                r'止盈目标[：:]\s*(\d+(?:,\d+)*(?:\.\d+)?)',
-                r'目标价[：:]\s*(\d+(?:,\d+)*(?:\.\d+)?)',
-                r'目标价为\s*(\d+(?:,\d+)*(?:\.\d+)?)',
-                r'目标价设定为\s*(\d+(?:,\d+)*(?:\.\d+)?)',
-                r'止盈价[：:]\s*(\d+(?:,\d+)*(?:\.\d+)?)',
-                r'止盈价位[：:]\s*(\d+(?:,\d+)*(?:\.\d+)?)',
-                r'建议止盈[：:]\s*(\d+(?:,\d+)*(?:\.\d+)?)',
-                r'目标价格[：:]\s*(\d+(?:,\d+)*(?:\.\d+)?)'
-            ]
-            
-            for pattern in profit_patterns:
-                profit_match = re.search(pattern, response)
-                if profit_match:
-                    try:
-                        take_profit = float(profit_match.group(1).replace(',', ''))
-                        break
-                    except:
-                        continue
-            
-            # 如果没找到具体价格，尝试从数字中提取
-            if entry_price == 0 and stop_loss == 0 and take_profit == 0:
-                price_pattern = r'(\d{4,}(?:\.\d+)?)'
-                prices = re.findall(price_pattern, response)
-                if len(prices) >= 3:
-                    try:
-                        # 按价格大小排序，取合理的价格组合
-                        prices = [float(p) for p in prices if float(p) > 1000]  # 过滤掉太小的数字
-                        prices.sort()
-                        if len(prices) >= 3:
-                            entry_price = prices[0]  # 最低价作为入场价
-                            stop_loss = prices[0] * 0.95  # 止损价略低于入场价
-                            take_profit = prices[-1]  # 最高价作为止盈价
-                    except:
-                        pass
-            
-            # 如果仍然没有找到价格，使用默认逻辑
-            if entry_price == 0:
-                # 从技术分析中提取当前价格作为入场价
-                current_price = self._extract_current_price(analysis_summary.get('technical', ''))
-                try:
-                    entry_price = float(current_price)
-                except:
-                    entry_price = 113000  # 默认价格
-            
-            # 优化盈亏比计算 - 确保至少1:2的盈亏比
-            if stop_loss == 0 and entry_price > 0:
-                if decision == "买入":
-                    stop_loss = entry_price * 0.97  # 止损为入场价的97%
-                else:  # 卖出
-                    stop_loss = entry_price * 1.03  # 止损为入场价的103%
-            
-            if take_profit == 0 and entry_price > 0:
-                if decision == "买入":
-                    # 确保盈亏比至少1:2
-                    risk = entry_price - stop_loss
-                    take_profit = entry_price + (risk * 2.5)  # 1:2.5的盈亏比
-                else:  # 卖出
-                    # 确保盈亏比至少1:2
-                    risk = stop_loss - entry_price
-                    take_profit = entry_price - (risk * 2.5)  # 1:2.5的盈亏比
+            entry_price, stop_loss, take_profit = (prices[name] for name in PRICE_FIELDS)
             
             # 提取置信度和风险评分
             confidence_score = 0.75
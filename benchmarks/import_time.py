@@ -0,0 +1,81 @@
+"""
+启动耗时基准
+用 python -X importtime 运行命令行入口，汇总最慢的导入模块与总耗时，
+可设置耗时上限（超出时以非零状态退出），用于跟踪 CLI 启动性能
+
+用法:
+    python benchmarks/import_time.py                      # 默认测量 main.py --help
+    python benchmarks/import_time.py --max-ms 1000        # 超过 1 秒时失败
+    python benchmarks/import_time.py -- --dry-run          # 测量 main.py --dry-run
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+from typing import Dict, List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def parse_importtime(stderr: str) -> List[Tuple[str, int, int]]:
+    """解析 -X importtime 输出，返回 [(模块（带层级缩进）, 自身耗时µs, 累计耗时µs)]"""
+    records = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        try:
+            self_us, cumulative_us, module = line[len("import time:"):].split("|", 2)
+            # 保留缩进（表示导入层级），去掉分隔符后的一个空格
+            records.append((module.rstrip()[1:], int(self_us), int(cumulative_us)))
+        except ValueError:
+            continue
+    return records
+
+
+def measure(cli_args: List[str], runs: int = 3) -> Dict[str, object]:
+    """运行 main.py 若干次，取总耗时最小的一次"""
+    best = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        completed = subprocess.run(
+            [sys.executable, "-X", "importtime", os.path.join(ROOT, "main.py"), *cli_args],
+            cwd=ROOT, capture_output=True, text=True, stdin=subprocess.DEVNULL
+        )
+        wall_ms = (time.perf_counter() - start) * 1000
+        if best is None or wall_ms < best["wall_ms"]:
+            best = {"wall_ms": wall_ms, "records": parse_importtime(completed.stderr), "returncode": completed.returncode}
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CLI 启动耗时基准")
+    parser.add_argument("--top", type=int, default=15, help="显示累计耗时最高的模块数量")
+    parser.add_argument("--runs", type=int, default=3, help="重复次数（取最快一次）")
+    parser.add_argument("--max-ms", type=float, default=None, help="总耗时上限（毫秒），超出时退出码为 1")
+    parser.add_argument("cli_args", nargs="*", default=None, help="传给 main.py 的参数，默认 --help")
+    args = parser.parse_args()
+
+    cli_args = args.cli_args or ["--help"]
+    result = measure(cli_args, args.runs)
+    records = result["records"]
+    # 顶层导入（没有缩进）的累计耗时之和即导入总耗时
+    import_ms = sum(cumulative for module, _, cumulative in records if not module.startswith(" ")) / 1000
+
+    print(f"命令: python main.py {' '.join(cli_args)}")
+    print(f"总耗时: {result['wall_ms']:.0f}ms，导入耗时: {import_ms:.0f}ms，导入模块数: {len(records)}")
+    print(f"累计耗时最高的 {args.top} 个模块:")
+    for module, self_us, cumulative_us in sorted(records, key=lambda record: record[2], reverse=True)[:args.top]:
+        print(f"  {cumulative_us / 1000:8.1f}ms  (自身 {self_us / 1000:6.1f}ms)  {module.strip()}")
+
+    heavy = [name for name in ("ccxt", "openai", "pandas", "aiohttp") if any(module.strip() == name for module, _, _ in records)]
+    print(f"已导入的重量级依赖: {', '.join(heavy) if heavy else '无'}")
+
+    if args.max_ms is not None and result["wall_ms"] > args.max_ms:
+        print(f"❌ 总耗时 {result['wall_ms']:.0f}ms 超过上限 {args.max_ms:.0f}ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""
+自由文本响应解析基准
+在一组响应语料上对比两种价格字段提取方式的吞吐：
+- 逐条 re.search：每个字段的候选模式按优先级依次扫描全文（原实现）
+- 预编译模式库：utils.response_parser 中合并后的单个交替式，一次扫描提取全部字段
+同时统计两种方式结果不一致的字段（通常是较短的通用标签在原实现中误匹配到其他字段的标签）
+
+语料来源（默认使用内置样例）：
+    python benchmarks/parse_responses.py                          # 内置样例语料
+    python benchmarks/parse_responses.py --from-cache              # LLM响应缓存中记录的交易员响应
+    python benchmarks/parse_responses.py --corpus responses.jsonl  # 每行一个JSON字符串或 {"response": ...}
+"""
+
+import argparse
+import json
+import os
+import random
+import re
+import sqlite3
+import sys
+import time
+from typing import Callable, Dict, List, Sequence
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from utils.response_parser import (  # noqa: E402
+    CURRENT_PRICE_PATTERNS, NUMBER, TRADE_PRICE_PATTERNS, PatternBank
+)
+
+# 内置样例：交易员自由文本响应中常见的标签写法
+_SAMPLE_TEMPLATES = (
+    "当前价格：{price} USDT\n技术面显示上升趋势，RSI为{rsi}。\n\n**交易建议：**\n- 入场价格：{entry} USDT\n"
+    "- 止损价格：{stop} USDT\n- 止盈目标：{target} USDT\n- 建议仓位：30%\n\n-最终交易建议: 买入",
+    "综合来看，建议在 {entry} USDT 附近分批建仓，设置止损位在 {stop}，目标价为 {target}。"
+    "短期阻力位 {target} 美元，支撑位 {stop} 美元。\n-最终交易建议: 买入",
+    "### 交易计划\n买入价：{entry}\n止损价：{stop}\n止盈价：{target}\n置信度：0.7\n风险评分：0.4\n"
+    "市场情绪偏多，新闻面无重大利空。\n-最终交易建议: 买入",
+    "价格：{price}\n空头动能增强，MACD死叉。\n卖出价格：{entry}\n止损价位：{stop}\n止盈价位：{target}\n-最终交易建议: 卖出",
+    "市场信号不明确，波动率较高，资金费率偏高，建议等待回调确认后再入场。\n-最终交易建议: 观望",
+)
+
+
+def sample_corpus(size: int, seed: int = 42) -> List[str]:
+    """按模板生成样例语料（固定随机种子，结果可复现）"""
+    rng = random.Random(seed)
+    corpus = []
+    for index in range(size):
+        price = rng.uniform(20, 120000)
+        entry = price * rng.uniform(0.98, 1.0)
+        values = {
+            "price": f"{price:,.2f}",
+            "entry": f"{entry:,.2f}",
+            "stop": f"{entry * 0.97:,.2f}",
+            "target": f"{entry * 1.08:,.2f}",
+            "rsi": rng.randint(20, 80),
+        }
+        filler = "分析要点：链上活跃地址增长，交易所净流出，社交热度上升。" * rng.randint(2, 20)
+        corpus.append(filler + "\n" + _SAMPLE_TEMPLATES[index % len(_SAMPLE_TEMPLATES)].format(**values))
+    return corpus
+
+
+def load_corpus_file(path: str) -> List[str]:
+    corpus = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            corpus.append(record["response"] if isinstance(record, dict) else str(record))
+    return corpus
+
+
+def load_cache_corpus(agent: str) -> List[str]:
+    """读取LLM响应缓存中某个智能体的响应"""
+    from utils.config import Config
+    path = os.path.join(ROOT, Config.CACHE_DIR, "llm_cache.sqlite3")
+    if not os.path.exists(path):
+        return []
+    conn = sqlite3.connect(path)
+    try:
+        return [row[0] for row in conn.execute("SELECT response FROM llm_cache WHERE agent = ?", (agent,))]
+    finally:
+        conn.close()
+
+
+def sequential_extract(patterns: Dict[str, Sequence[str]]) -> Callable[[str], Dict[str, str]]:
+    """原实现：每个字段按优先级逐条 re.search"""
+    expanded = {field: [pattern.replace("{n}", f"({NUMBER})") for pattern in field_patterns]
+                for field, field_patterns in patterns.items()}
+
+    def extract(text: str) -> Dict[str, str]:
+        result = {}
+        for field, field_patterns in expanded.items():
+            for pattern in field_patterns:
+                match = re.search(pattern, text)
+                if match:
+                    result[field] = match.group(1).replace(",", "")
+                    break
+        return result
+
+    return extract
+
+
+def throughput(extract: Callable[[str], Dict[str, str]], corpus: List[str], runs: int) -> float:
+    """取多次运行中最快的一次，返回每秒解析的响应数"""
+    best = float("inf")
+    for _ in range(runs):
+        start = time.perf_counter()
+        for text in corpus:
+            extract(text)
+        best = min(best, time.perf_counter() - start)
+    return len(corpus) / best if best > 0 else float("inf")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="自由文本响应解析基准")
+    parser.add_argument("--corpus", help="语料文件（JSONL）")
+    parser.add_argument("--from-cache", action="store_true", help="使用LLM响应缓存中记录的响应")
+    parser.add_argument("--agent", default="Trader", help="--from-cache 时读取的智能体名称")
+    parser.add_argument("--size", type=int, default=2000, help="内置样例语料的响应数量")
+    parser.add_argument("--runs", type=int, default=5, help="重复次数（取最快一次）")
+    args = parser.parse_args()
+
+    if args.corpus:
+        corpus, source = load_corpus_file(args.corpus), args.corpus
+    elif args.from_cache:
+        corpus, source = load_cache_corpus(args.agent), f"LLM缓存（{args.agent}）"
+    else:
+        corpus, source = sample_corpus(args.size), "内置样例"
+    if not corpus:
+        print(f"❌ 语料为空: {source}")
+        sys.exit(1)
+
+    chars = sum(len(text) for text in corpus)
+    print(f"语料: {source}，{len(corpus)} 条响应，平均 {chars / len(corpus):.0f} 字符")
+
+    for name, patterns in (("交易价格", TRADE_PRICE_PATTERNS), ("当前价格", CURRENT_PRICE_PATTERNS)):
+        sequential = sequential_extract(patterns)
+        bank = PatternBank(patterns)
+        mismatches = sum(
+            1 for text in corpus
+            for field, value in sequential(text).items()
+            if bank.extract(text).get(field) != value
+        )
+        pattern_count = sum(len(field_patterns) for field_patterns in patterns.values())
+        before = throughput(sequential, corpus, args.runs)
+        after = throughput(bank.extract, corpus, args.runs)
+        print(f"\n{name}（{len(patterns)} 个字段，{pattern_count} 个候选模式）")
+        print(f"  逐条 re.search: {before:10.0f} 条/秒  {before * chars / len(corpus) / 1e6:6.1f} M字符/秒")
+        print(f"  预编译模式库:   {after:10.0f} 条/秒  {after * chars / len(corpus) / 1e6:6.1f} M字符/秒  ({after / before:.1f}x)")
+        print(f"  结果不一致的字段: {mismatches}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,267 @@
+"""
+CoinGecko 币种ID索引模块
+由 /coins/list 全量列表构建 代码 -> 币种ID 索引，同一代码对应多个币种时按市值排名消歧，
+保存为本地JSON（带有效期），加载后在内存字典中 O(1) 查询，替代每次运行的 /search 请求
+"""
+
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+from utils.config import Config
+from utils.http_client import get_http_session, aget_json
+from utils.singleflight import get_singleflight
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+COINGECKO_BASE_URL = "https://api.coingecko.com/api/v3"
+# /coins/markets 单页最大条数
+MARKETS_PAGE_SIZE = 250
+# 下载失败后的重试间隔（秒），期间使用旧索引或回退到 /search
+RETRY_INTERVAL = 300
+
+
+def build_index(coins: List[Dict[str, Any]], ranks: Dict[str, int]) -> Dict[str, List[List[Any]]]:
+    """
+    构建索引：{代码(大写): [[币种ID, 市值排名或None], ...]}，按排名升序，无排名的排在最后
+
+    Args:
+        coins: /coins/list 响应（[{id, symbol, name}]）
+        ranks: {币种ID: 市值排名}
+    """
+    index: Dict[str, List[List[Any]]] = {}
+    for coin in coins:
+        coin_id, symbol = coin.get("id"), coin.get("symbol")
+        if coin_id and symbol:
+            index.setdefault(symbol.upper(), []).append([coin_id, ranks.get(coin_id)])
+    for candidates in index.values():
+        candidates.sort(key=lambda candidate: (candidate[1] is None, candidate[1] or 0))
+    return index
+
+
+class CoinIndex:
+    """币种ID索引（磁盘JSON + 内存字典）"""
+
+    def __init__(self, path: Optional[str] = None, ttl: Optional[float] = None, rank_pages: Optional[int] = None,
+                 base_url: str = COINGECKO_BASE_URL):
+        self.path = path or os.path.join(Config.CACHE_DIR, "coingecko_coin_index.json")
+        self.ttl = ttl if ttl is not None else Config.COIN_INDEX_TTL
+        self.rank_pages = rank_pages if rank_pages is not None else Config.COIN_INDEX_RANK_PAGES
+        self.base_url = base_url
+        self._lock = threading.Lock()
+        self._index: Optional[Dict[str, List[List[Any]]]] = None
+        self._fetched_at = 0.0
+        self._failed_at = 0.0
+        self._disk_checked = False
+        self.stats = {"hits": 0, "misses": 0, "ambiguous": 0, "disk_loads": 0, "downloads": 0}
+
+    def _count(self, name: str):
+        with self._lock:
+            self.stats[name] += 1
+
+    def _fresh(self, fetched_at: float) -> bool:
+        return time.time() - fetched_at < self.ttl
+
+    def _ready(self) -> bool:
+        with self._lock:
+            return self._index is not None and self._fresh(self._fetched_at)
+
+    def _usable(self) -> bool:
+        """有可用索引（含已过期的）：下载失败时继续使用旧索引，币种ID极少变化"""
+        with self._lock:
+            return self._index is not None
+
+    def _backing_off(self) -> bool:
+        return time.time() - self._failed_at < RETRY_INTERVAL
+
+    def load(self) -> bool:
+        """从磁盘加载索引（进程内只读取一次，过期的索引也加载，作为下载失败时的后备），返回是否未过期"""
+        with self._lock:
+            if self._disk_checked:
+                return self._index is not None and self._fresh(self._fetched_at)
+            self._disk_checked = True
+        if not os.path.exists(self.path):
+            return False
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception as e:
+            logger.warning(f"读取币种ID索引失败，将重新下载: {self.path}: {e}")
+            return False
+        if not data.get("index"):
+            return False
+
+        with self._lock:
+            if self._index is None:
+                self._index, self._fetched_at = data["index"], data.get("fetched_at", 0)
+        self._count("disk_loads")
+        return self._ready()
+
+    def _store(self, coins: List[Dict[str, Any]], ranks: Dict[str, int]):
+        """构建索引并保存（原子写入）"""
+        index = build_index(coins, ranks)
+        fetched_at = time.time()
+        with self._lock:
+            self._index, self._fetched_at = index, fetched_at
+        self._count("downloads")
+        logger.info(f"币种ID索引已更新: {len(coins)} 个币种，{len(ranks)} 个带市值排名")
+
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"fetched_at": fetched_at, "index": index}, f)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            logger.warning(f"保存币种ID索引失败: {e}")
+
+    def _markets_params(self, page: int) -> Dict[str, Any]:
+        return {"vs_currency": "usd", "order": "market_cap_desc", "per_page": MARKETS_PAGE_SIZE, "page": page}
+
+    @staticmethod
+    def _parse_ranks(pages: List[Any]) -> Dict[str, int]:
+        ranks = {}
+        for page in pages:
+            for coin in page or []:
+                if coin.get("id") and coin.get("market_cap_rank"):
+                    ranks[coin["id"]] = coin["market_cap_rank"]
+        return ranks
+
+    def _download(self) -> bool:
+        # 等待期间其他线程可能已完成下载
+        if self._ready():
+            return True
+        try:
+            session = get_http_session('Crypto-Agent/1.0')
+            response = session.get(f"{self.base_url}/coins/list")
+            if response.status_code != 200:
+                raise RuntimeError(f"/coins/list 状态码 {response.status_code}")
+            coins = response.json()
+            if not isinstance(coins, list) or not coins:
+                raise RuntimeError("/coins/list 响应为空")
+
+            pages = []
+            for page in range(1, self.rank_pages + 1):
+                markets = session.get(f"{self.base_url}/coins/markets", params=self._markets_params(page))
+                if markets.status_code != 200:
+                    break
+                pages.append(markets.json())
+                if len(pages[-1] or []) < MARKETS_PAGE_SIZE:
+                    break
+
+            self._store(coins, self._parse_ranks(pages))
+            return True
+        except Exception as e:
+            self._failed_at = time.time()
+            logger.warning(f"下载币种ID索引失败，{RETRY_INTERVAL}s 后重试（期间使用旧索引或回退到 /search）: {e}")
+            return False
+
+    async def _adownload(self) -> bool:
+        if self._ready():
+            return True
+        try:
+            status, coins = await aget_json(f"{self.base_url}/coins/list")
+            if status != 200:
+                raise RuntimeError(f"/coins/list 状态码 {status}")
+            if not isinstance(coins, list) or not coins:
+                raise RuntimeError("/coins/list 响应为空")
+
+            pages = []
+            for page in range(1, self.rank_pages + 1):
+                status, markets = await aget_json(f"{self.base_url}/coins/markets", self._markets_params(page))
+                if status != 200:
+                    break
+                pages.append(markets)
+                if len(markets or []) < MARKETS_PAGE_SIZE:
+                    break
+
+            self._store(coins, self._parse_ranks(pages))
+            return True
+        except Exception as e:
+            self._failed_at = time.time()
+            logger.warning(f"下载币种ID索引失败，{RETRY_INTERVAL}s 后重试（期间使用旧索引或回退到 /search）: {e}")
+            return False
+
+    def ensure(self) -> bool:
+        """确保索引可用（内存 -> 磁盘 -> 下载，并发下载合并为一次）；下载失败时使用已过期的旧索引"""
+        if self._ready() or self.load():
+            return True
+        if not self._backing_off():
+            get_singleflight("coin_index").do(self.path, self._download)
+        return self._usable()
+
+    async def aensure(self) -> bool:
+        """确保索引可用（异步）"""
+        if self._ready() or self.load():
+            return True
+        if not self._backing_off():
+            await get_singleflight("coin_index").ado(self.path, self._adownload)
+        return self._usable()
+
+    def lookup(self, symbol: str) -> Optional[str]:
+        """
+        查询已加载的索引：唯一候选或排名最高的候选有市值排名时返回其ID；
+        未收录或多个候选都没有排名（无法消歧）时返回 None
+        """
+        with self._lock:
+            candidates = (self._index or {}).get(symbol.upper())
+        if not candidates:
+            self._count("misses")
+            return None
+        if len(candidates) > 1 and candidates[0][1] is None:
+            self._count("ambiguous")
+            return None
+        self._count("hits")
+        return candidates[0][0]
+
+    def resolve(self, symbol: str) -> Optional[str]:
+        """代码 -> 币种ID；索引不可用或无法确定时返回 None（由调用方回退到 /search）"""
+        return self.lookup(symbol) if self.ensure() else None
+
+    async def aresolve(self, symbol: str) -> Optional[str]:
+        """代码 -> 币种ID（异步）"""
+        return self.lookup(symbol) if await self.aensure() else None
+
+
+_coin_index: Optional[CoinIndex] = None
+_coin_index_lock = threading.Lock()
+
+
+def get_coin_index() -> CoinIndex:
+    """获取进程共享的币种ID索引"""
+    global _coin_index
+    with _coin_index_lock:
+        if _coin_index is None:
+            _coin_index = CoinIndex()
+        return _coin_index
+
+
+if __name__ == "__main__":
+    # 独立测试（使用模拟数据，不访问网络）
+    import tempfile
+
+    coins = [
+        {"id": "bitcoin", "symbol": "btc", "name": "Bitcoin"},
+        {"id": "batcat", "symbol": "btc", "name": "batcat"},
+        {"id": "ethereum", "symbol": "eth", "name": "Ethereum"},
+        {"id": "foo-a", "symbol": "foo", "name": "Foo A"},
+        {"id": "foo-b", "symbol": "foo", "name": "Foo B"},
+    ]
+    ranks = {"bitcoin": 1, "ethereum": 2}
+
+    index = CoinIndex(path=os.path.join(tempfile.mkdtemp(), "index.json"), ttl=60)
+    index._store(coins, ranks)
+    print(f"BTC -> {index.lookup('BTC')}（按市值排名消歧）")
+    print(f"eth -> {index.lookup('eth')}")
+    print(f"FOO -> {index.lookup('FOO')}（多个候选均无排名，回退 /search）")
+
+    reloaded = CoinIndex(path=index.path, ttl=60)
+    print(f"新进程从磁盘加载: {reloaded.load()}，BTC -> {reloaded.lookup('BTC')}")
+
+    expired = CoinIndex(path=index.path, ttl=0)
+    expired._failed_at = time.time()
+    print(f"索引过期且下载失败时使用旧索引: {expired.resolve('ETH')}")
+    print(f"统计: {index.stats}")
+    print("测试完成！")
@@ -1,61 +1,271 @@
 """
 基本面数据提供模块
 获取CoinGecko等链上数据和基本面信息
+
+市值、成交量、供应量与涨跌幅来自 /coins/markets（每次请求最多 250 个币种，批量模式下整批预取为一份快照）；
+项目描述、分类与评分来自精简参数的 /coins/{id}，按需获取。
+各字段组按各自的有效期缓存（见 data_providers.fundamentals_cache），过期不久的数据先返回再后台刷新
 """
 
-import requests
-import time
-from typing import Dict, Any, Optional
-from utils.config import Config
+import asyncio
+import threading
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+from utils.http_client import get_http_session, aget_json
+from data_providers.coin_index import MARKETS_PAGE_SIZE, get_coin_index
+from data_providers.fundamentals_cache import MISS, STALE, get_fundamentals_cache
 from utils.logger import get_logger
 
 logger = get_logger(__name__)
 
 
+def _chunks(items: List[str], size: int) -> Iterable[List[str]]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
 class FundamentalsDataProvider:
     """基本面数据提供类"""
     
     def __init__(self):
         self.coingecko_base_url = "https://api.coingecko.com/api/v3"
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Crypto-Agent/1.0'
-        })
+        # 共享连接池会话（批量模式下所有币种复用）
+        self.session = get_http_session('Crypto-Agent/1.0')
+        # 进程共享的字段分组缓存
+        self.cache = get_fundamentals_cache()
+        self._lock = threading.Lock()
+        self.stats = {"markets_requests": 0, "details_requests": 0}
+    
+    def _count(self, name: str, amount: int = 1):
+        with self._lock:
+            self.stats[name] += amount
+    
+    def _markets_params(self, coin_ids: List[str]) -> Dict[str, Any]:
+        """/coins/markets 批量请求参数（ids 逗号分隔）"""
+        return {
+            'vs_currency': 'usd',
+            'ids': ','.join(coin_ids),
+            'per_page': MARKETS_PAGE_SIZE,
+            'price_change_percentage': '24h,7d,30d',
+            'sparkline': 'false'
+        }
+    
+    def _parse_market_row(self, row: Dict[str, Any]) -> Dict[str, Any]:
+        """解析 /coins/markets 中单个币种的条目（字段名与 _parse_coin_info 一致，空值按 0 处理）"""
+        return {
+            'id': row.get('id'),
+            'name': row.get('name'),
+            'symbol': (row.get('symbol') or '').upper(),
+            'market_cap': row.get('market_cap') or 0,
+            'market_cap_rank': row.get('market_cap_rank'),
+            'total_volume': row.get('total_volume') or 0,
+            'circulating_supply': row.get('circulating_supply') or 0,
+            'total_supply': row.get('total_supply') or 0,
+            'max_supply': row.get('max_supply') or 0,
+            'ath': row.get('ath') or 0,
+            'ath_change_percentage': row.get('ath_change_percentage') or 0,
+            'atl': row.get('atl') or 0,
+            'atl_change_percentage': row.get('atl_change_percentage') or 0,
+            'price_change_24h': row.get('price_change_percentage_24h') or 0,
+            'price_change_7d': row.get('price_change_percentage_7d_in_currency') or 0,
+            'price_change_30d': row.get('price_change_percentage_30d_in_currency') or 0
+        }
     
+    def _store_markets(self, rows: Any) -> Dict[str, Dict[str, Any]]:
+        """把 /coins/markets 响应写入缓存"""
+        parsed = {}
+        for row in rows if isinstance(rows, list) else []:
+            if row.get('id'):
+                parsed[row['id']] = self._parse_market_row(row)
+                self.cache.update(row['id'], parsed[row['id']])
+        return parsed
+    
+    def _cached_markets(self, coin_ids: List[str]) -> Tuple[Dict[str, Dict[str, Any]], List[str]]:
+        """
+        从缓存中取市场字段，返回 (可用的条目, 需同步请求的币种ID)；
+        过期不久的条目照常返回，并合并为一次后台刷新
+        """
+        found, missing, stale = {}, [], []
+        for coin_id in dict.fromkeys(coin_ids):
+            status, market = self.cache.lookup(coin_id, ("market",))
+            if status == MISS:
+                missing.append(coin_id)
+                continue
+            found[coin_id] = market
+            if status == STALE:
+                stale.append(coin_id)
+        if stale:
+            self.cache.refresh_later("markets", stale, self._fetch_markets)
+        return found, missing
+    
+    def get_markets(self, coin_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """批量获取市场字段：缓存未命中的币种按每批 250 个请求 /coins/markets，返回 {币种ID: 市场字段}"""
+        markets, missing = self._cached_markets(coin_ids)
+        markets.update(self._fetch_markets(missing))
+        return markets
+    
+    def _fetch_markets(self, coin_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """请求 /coins/markets（每批 250 个币种）并写入缓存"""
+        markets = {}
+        for chunk in _chunks(coin_ids, MARKETS_PAGE_SIZE):
+            try:
+                self._count("markets_requests")
+                response = self.session.get(f"{self.coingecko_base_url}/coins/markets", params=self._markets_params(chunk))
+                if response.status_code == 200:
+                    markets.update(self._store_markets(response.json()))
+                else:
+                    logger.error(f"批量获取市场数据失败: {response.status_code}")
+            except Exception as e:
+                logger.error(f"批量获取市场数据异常: {e}")
+        return markets
+    
+    async def aget_markets(self, coin_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """批量获取市场字段（异步）"""
+        markets, missing = self._cached_markets(coin_ids)
+        for chunk in _chunks(missing, MARKETS_PAGE_SIZE):
+            try:
+                self._count("markets_requests")
+                status, data = await aget_json(f"{self.coingecko_base_url}/coins/markets", self._markets_params(chunk))
+                if status == 200:
+                    markets.update(self._store_markets(data))
+                else:
+                    logger.error(f"批量获取市场数据失败: {status}")
+            except Exception as e:
+                logger.error(f"批量获取市场数据异常: {e}")
+        return markets
+    
+    def prefetch(self, symbols: List[str]) -> int:
+        """
+        批量模式开始前为整批币种预取市场字段（只查本地索引，无法确定ID的币种在分析时单独处理）
+        
+        Returns:
+            已获取市场数据的币种数量
+        """
+        index = get_coin_index()
+        coin_ids = [coin_id for coin_id in (index.resolve(symbol) for symbol in symbols) if coin_id]
+        before = self.stats["markets_requests"]
+        markets = self.get_markets(coin_ids)
+        logger.info(f"基本面市场快照: {len(markets)}/{len(symbols)} 个币种，"
+                    f"{self.stats['markets_requests'] - before} 次 /coins/markets 请求")
+        return len(markets)
+    
+    async def aprefetch(self, symbols: List[str]) -> int:
+        """批量预取市场快照（异步）"""
+        index = get_coin_index()
+        coin_ids = [coin_id for coin_id in [await index.aresolve(symbol) for symbol in symbols] if coin_id]
+        before = self.stats["markets_requests"]
+        markets = await self.aget_markets(coin_ids)
+        logger.info(f"基本面市场快照: {len(markets)}/{len(symbols)} 个币种，"
+                    f"{self.stats['markets_requests'] - before} 次 /coins/markets 请求")
+        return len(markets)
+    
+    def _details_params(self) -> Dict[str, Any]:
+        """/coins/{id} 精简请求参数：不要本地化文本、交易所行情、市场数据与走势图"""
+        return {
+            'localization': 'false',
+            'tickers': 'false',
+            'market_data': 'false',
+            'community_data': 'false',
+            'developer_data': 'false',
+            'sparkline': 'false'
+        }
+    
+    def _parse_coin_details(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """解析 /coins/{id} 中的项目字段（描述、分类、评分、链接）"""
+        return {
+            'community_score': data.get('community_score', 0),
+            'developer_score': data.get('developer_score', 0),
+            'liquidity_score': data.get('liquidity_score', 0),
+            'public_interest_score': data.get('public_interest_score', 0),
+            'trust_score': data.get('trust_score', 0),
+            'description': data.get('description', {}).get('en', ''),
+            'categories': data.get('categories', []),
+            'links': data.get('links', {})
+        }
+    
+    def _cached_details(self, coin_id: str) -> Optional[Dict[str, Any]]:
+        """缓存中的评分与项目资料；过期不久时照常返回并后台刷新，需要同步请求时返回 None"""
+        status, details = self.cache.lookup(coin_id, ("scores", "profile"))
+        if status == MISS:
+            return None
+        if status == STALE:
+            self.cache.refresh_later("details", [coin_id], self._refresh_details)
+        return details
+    
+    def _store_details(self, coin_id: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        details = self._parse_coin_details(data)
+        self.cache.update(coin_id, details)
+        return details
+    
+    def _refresh_details(self, coin_ids: List[str]):
+        for coin_id in coin_ids:
+            self._fetch_details(coin_id)
+    
+    def get_coin_details(self, coin_id: str) -> Dict[str, Any]:
+        """获取评分与项目资料（按字段组有效期缓存），失败时返回空字典且不缓存"""
+        cached = self._cached_details(coin_id)
+        if cached is not None:
+            return cached
+        return self._fetch_details(coin_id)
+    
+    def _fetch_details(self, coin_id: str) -> Dict[str, Any]:
+        try:
+            self._count("details_requests")
+            response = self.session.get(f"{self.coingecko_base_url}/coins/{coin_id}", params=self._details_params())
+            if response.status_code == 200:
+                return self._store_details(coin_id, response.json())
+            logger.error(f"获取项目信息失败: {response.status_code}")
+        except Exception as e:
+            logger.error(f"获取项目信息异常: {e}")
+        return {}
+    
+    async def aget_coin_details(self, coin_id: str) -> Dict[str, Any]:
+        """获取项目字段（异步）"""
+        cached = self._cached_details(coin_id)
+        if cached is not None:
+            return cached
+        try:
+            self._count("details_requests")
+            status, data = await aget_json(f"{self.coingecko_base_url}/coins/{coin_id}", self._details_params())
+            if status == 200:
+                return self._store_details(coin_id, data)
+            logger.error(f"获取项目信息失败: {status}")
+        except Exception as e:
+            logger.error(f"获取项目信息异常: {e}")
+        return {}
+    
+    def _parse_coin_info(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """解析 /coins/{id} 完整响应（含 market_data）"""
+        return {
+            'id': data.get('id'),
+            'name': data.get('name'),
+            'symbol': data.get('symbol', '').upper(),
+            'market_cap': data.get('market_data', {}).get('market_cap', {}).get('usd', 0),
+            'market_cap_rank': data.get('market_cap_rank'),
+            'total_volume': data.get('market_data', {}).get('total_volume', {}).get('usd', 0),
+            'circulating_supply': data.get('market_data', {}).get('circulating_supply', 0),
+            'total_supply': data.get('market_data', {}).get('total_supply', 0),
+            'max_supply': data.get('market_data', {}).get('max_supply', 0),
+            'ath': data.get('market_data', {}).get('ath', {}).get('usd', 0),
+            'ath_change_percentage': data.get('market_data', {}).get('ath_change_percentage', {}).get('usd', 0),
+            'atl': data.get('market_data', {}).get('atl', {}).get('usd', 0),
+            'atl_change_percentage': data.get('market_data', {}).get('atl_change_percentage', {}).get('usd', 0),
+            'price_change_24h': data.get('market_data', {}).get('price_change_percentage_24h', 0),
+            'price_change_7d': data.get('market_data', {}).get('price_change_percentage_7d', 0),
+            'price_change_30d': data.get('market_data', {}).get('price_change_percentage_30d', 0),
+            **self._parse_coin_details(data)
+        }
+
     def get_coin_info(self, coin_id: str) -> Dict[str, Any]:
-        """获取币种基本信息"""
+        """获取币种基本信息（完整文档，/coins/markets 未收录该币种时使用）"""
         try:
             url = f"{self.coingecko_base_url}/coins/{coin_id}"
             response = self.session.get(url)
             
             if response.status_code == 200:
                 data = response.json()
-                return {
-                    'id': data.get('id'),
-                    'name': data.get('name'),
-                    'symbol': data.get('symbol', '').upper(),
-                    'market_cap': data.get('market_data', {}).get('market_cap', {}).get('usd', 0),
-                    'market_cap_rank': data.get('market_cap_rank'),
-                    'total_volume': data.get('market_data', {}).get('total_volume', {}).get('usd', 0),
-                    'circulating_supply': data.get('market_data', {}).get('circulating_supply', 0),
-                    'total_supply': data.get('market_data', {}).get('total_supply', 0),
-                    'max_supply': data.get('market_data', {}).get('max_supply', 0),
-                    'ath': data.get('market_data', {}).get('ath', {}).get('usd', 0),
-                    'ath_change_percentage': data.get('market_data', {}).get('ath_change_percentage', {}).get('usd', 0),
-                    'atl': data.get('market_data', {}).get('atl', {}).get('usd', 0),
-                    'atl_change_percentage': data.get('market_data', {}).get('atl_change_percentage', {}).get('usd', 0),
-                    'price_change_24h': data.get('market_data', {}).get('price_change_percentage_24h', 0),
-                    'price_change_7d': data.get('market_data', {}).get('price_change_percentage_7d', 0),
-                    'price_change_30d': data.get('market_data', {}).get('price_change_percentage_30d', 0),
-                    'community_score': data.get('community_score', 0),
-                    'developer_score': data.get('developer_score', 0),
-                    'liquidity_score': data.get('liquidity_score', 0),
-                    'public_interest_score': data.get('public_interest_score', 0),
-                    'trust_score': data.get('trust_score', 0),
-                    'description': data.get('description', {}).get('en', ''),
-                    'categories': data.get('categories', []),
-                    'links': data.get('links', {})
-                }
+                coin_info = self._parse_coin_info(data)
+                self.cache.update(coin_id, coin_info)
+                return coin_info
             else:
                 logger.error(f"获取币种信息失败: {response.status_code}")
                 return {}
@@ -64,24 +274,32 @@ class FundamentalsDataProvider:
             logger.error(f"获取币种信息异常: {e}")
             return {}
     
+    def _market_chart_params(self) -> Dict[str, Any]:
+        """市场走势请求参数"""
+        return {
+            'vs_currency': 'usd',
+            'days': '30'
+        }
+    
+    def _parse_market_chart(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """解析 /market_chart 响应"""
+        return {
+            'prices': data.get('prices', []),
+            'market_caps': data.get('market_caps', []),
+            'total_volumes': data.get('total_volumes', [])
+        }
+    
     def get_market_data(self, coin_id: str) -> Dict[str, Any]:
         """获取市场数据"""
         try:
             url = f"{self.coingecko_base_url}/coins/{coin_id}/market_chart"
-            params = {
-                'vs_currency': 'usd',
-                'days': '30'
-            }
+            params = self._market_chart_params()
             
             response = self.session.get(url, params=params)
             
             if response.status_code == 200:
                 data = response.json()
-                return {
-                    'prices': data.get('prices', []),
-                    'market_caps': data.get('market_caps', []),
-                    'total_volumes': data.get('total_volumes', [])
-                }
+                return self._parse_market_chart(data)
             else:
                 logger.error(f"获取市场数据失败: {response.status_code}")
                 return {}
@@ -90,6 +308,16 @@ class FundamentalsDataProvider:
             logger.error(f"获取市场数据异常: {e}")
             return {}
     
+    def _pick_search_result(self, data: Dict[str, Any]) -> Optional[str]:
+        """从 /search 响应中选取币种ID"""
+        coins = data.get('coins', [])
+        
+        if coins:
+            # 返回第一个匹配的币种ID
+            return coins[0].get('id')
+        
+        return None
+    
     def search_coin_id(self, symbol: str) -> Optional[str]:
         """搜索币种ID"""
         try:
@@ -100,11 +328,7 @@ class FundamentalsDataProvider:
             
             if response.status_code == 200:
                 data = response.json()
-                coins = data.get('coins', [])
-                
-                if coins:
-                    # 返回第一个匹配的币种ID
-                    return coins[0].get('id')
+                return self._pick_search_result(data)
             
             return None
             
@@ -112,41 +336,145 @@ class FundamentalsDataProvider:
             logger.error(f"搜索币种ID异常: {e}")
             return None
     
-    def get_fundamentals_data(self, symbol: str) -> Dict[str, Any]:
-        """获取完整的基本面数据"""
+    def resolve_coin_id(self, symbol: str) -> Optional[str]:
+        """币种ID：优先查本地索引（按市值排名消歧），索引不可用、未收录或无法消歧时回退 /search"""
+        return get_coin_index().resolve(symbol) or self.search_coin_id(symbol)
+    
+    async def aresolve_coin_id(self, symbol: str) -> Optional[str]:
+        """币种ID（异步）"""
+        return await get_coin_index().aresolve(symbol) or await self.asearch_coin_id(symbol)
+    
+    def get_fundamentals_data(self, symbol: str, include_chart: bool = False) -> Dict[str, Any]:
+        """
+        获取完整的基本面数据
+        
+        Args:
+            symbol: 币种代码（如 BTC）
+            include_chart: 是否同时获取30天市值/成交量走势（market_data），分析师不使用，默认不请求
+        """
         try:
-            # 搜索币种ID
-            coin_id = self.search_coin_id(symbol)
+            # 查询币种ID
+            coin_id = self.resolve_coin_id(symbol)
             
             if not coin_id:
                 logger.error(f"未找到币种 {symbol} 的ID")
                 return {}
             
-            # 获取币种信息
-            coin_info = self.get_coin_info(coin_id)
+            # 市场字段优先取快照（批量模式已预取），项目字段按需获取
+            market = self.get_markets([coin_id]).get(coin_id)
+            if market:
+                coin_info = {**market, **self.get_coin_details(coin_id)}
+            else:
+                coin_info = self.get_coin_info(coin_id)
             
             if not coin_info:
                 return {}
             
-            # 获取市场数据
-            market_data = self.get_market_data(coin_id)
-            
-            # 合并数据
-            fundamentals_data = {
-                'symbol': symbol,
-                'coin_info': coin_info,
-                'market_data': market_data,
-                'analysis_summary': {
-                    'market_cap_rank': coin_info.get('market_cap_rank', 'N/A'),
-                    'market_cap': coin_info.get('market_cap', 0),
-                    'volume_24h': coin_info.get('total_volume', 0),
-                    'circulating_supply': coin_info.get('circulating_supply', 0),
-                    'price_change_24h': coin_info.get('price_change_24h', 0),
-                    'community_score': coin_info.get('community_score', 0),
-                    'developer_score': coin_info.get('developer_score', 0),
-                    'trust_score': coin_info.get('trust_score', 0)
-                }
+            market_data = self.get_market_data(coin_id) if include_chart else {}
+            
+            fundamentals_data = self._build_fundamentals_data(symbol, coin_info, market_data)
+            
+            logger.info(f"成功获取 {symbol} 基本面数据")
+            return fundamentals_data
+            
+        except Exception as e:
+            logger.error(f"获取基本面数据失败: {e}")
+            return {}
+    
+    def _build_fundamentals_data(self, symbol: str, coin_info: Dict[str, Any], market_data: Dict[str, Any]) -> Dict[str, Any]:
+        """合并币种信息与市场数据"""
+        return {
+            'symbol': symbol,
+            'coin_info': coin_info,
+            'market_data': market_data,
+            'analysis_summary': {
+                'market_cap_rank': coin_info.get('market_cap_rank', 'N/A'),
+                'market_cap': coin_info.get('market_cap', 0),
+                'volume_24h': coin_info.get('total_volume', 0),
+                'circulating_supply': coin_info.get('circulating_supply', 0),
+                'price_change_24h': coin_info.get('price_change_24h', 0),
+                'community_score': coin_info.get('community_score', 0),
+                'developer_score': coin_info.get('developer_score', 0),
+                'trust_score': coin_info.get('trust_score', 0)
             }
+        }
+    
+    async def aget_coin_info(self, coin_id: str) -> Dict[str, Any]:
+        """获取币种基本信息（异步）"""
+        try:
+            status, data = await aget_json(f"{self.coingecko_base_url}/coins/{coin_id}")
+            
+            if status == 200:
+                coin_info = self._parse_coin_info(data)
+                self.cache.update(coin_id, coin_info)
+                return coin_info
+            else:
+                logger.error(f"获取币种信息失败: {status}")
+                return {}
+                
+        except Exception as e:
+            logger.error(f"获取币种信息异常: {e}")
+            return {}
+    
+    async def aget_market_data(self, coin_id: str) -> Dict[str, Any]:
+        """获取市场数据（异步）"""
+        try:
+            url = f"{self.coingecko_base_url}/coins/{coin_id}/market_chart"
+            status, data = await aget_json(url, self._market_chart_params())
+            
+            if status == 200:
+                return self._parse_market_chart(data)
+            else:
+                logger.error(f"获取市场数据失败: {status}")
+                return {}
+                
+        except Exception as e:
+            logger.error(f"获取市场数据异常: {e}")
+            return {}
+    
+    async def asearch_coin_id(self, symbol: str) -> Optional[str]:
+        """搜索币种ID（异步）"""
+        try:
+            status, data = await aget_json(f"{self.coingecko_base_url}/search", {'query': symbol})
+            
+            if status == 200:
+                return self._pick_search_result(data)
+            
+            return None
+            
+        except Exception as e:
+            logger.error(f"搜索币种ID异常: {e}")
+            return None
+    
+    async def _aget_coin_info(self, coin_id: str) -> Dict[str, Any]:
+        """市场字段与项目字段并发获取；/coins/markets 未收录时使用完整文档"""
+        markets, details = await asyncio.gather(self.aget_markets([coin_id]), self.aget_coin_details(coin_id))
+        market = markets.get(coin_id)
+        if market:
+            return {**market, **details}
+        return await self.aget_coin_info(coin_id)
+    
+    async def _aget_chart(self, coin_id: str, include_chart: bool) -> Dict[str, Any]:
+        return await self.aget_market_data(coin_id) if include_chart else {}
+    
+    async def aget_fundamentals_data(self, symbol: str, include_chart: bool = False) -> Dict[str, Any]:
+        """获取完整的基本面数据（异步，市场字段、项目字段与可选的市场走势并发获取）"""
+        try:
+            coin_id = await self.aresolve_coin_id(symbol)
+            
+            if not coin_id:
+                logger.error(f"未找到币种 {symbol} 的ID")
+                return {}
+            
+            coin_info, market_data = await asyncio.gather(
+                self._aget_coin_info(coin_id),
+                self._aget_chart(coin_id, include_chart)
+            )
+            
+            if not coin_info:
+                return {}
+            
+            fundamentals_data = self._build_fundamentals_data(symbol, coin_info, market_data)
             
             logger.info(f"成功获取 {symbol} 基本面数据")
             return fundamentals_data
@@ -178,4 +506,5 @@ if __name__ == "__main__":
         print(f"开发者评分: {analysis.get('developer_score', 0)}")
         print(f"信任评分: {analysis.get('trust_score', 0)}")
     else:
-        print("获取基本面数据失败") 
\ No newline at end of file
+        print("获取基本面数据失败")
+    print(f"请求统计: {provider.stats}") 
\ No newline at end of file
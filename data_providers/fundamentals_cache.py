@@ -0,0 +1,270 @@
+"""
+基本面字段分组缓存模块
+基本面字段的变化频率差异很大：市值、成交量、涨跌幅每分钟都在变，项目描述、分类、链接几乎不变。
+字段按组设置有效期，每个币种保存为一个紧凑的 __slots__ 记录：
+- 未过期：直接返回
+- 已过期但未超过 有效期×FUNDAMENTALS_STALE_FACTOR：先返回旧值，同时在后台刷新（stale-while-revalidate）
+- 更旧或没有记录：由调用方同步请求
+各组数据持久化到本地SQLite，新进程直接复用变化慢的字段，只需重新请求变化快的市场字段
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from utils.config import Config
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# 字段分组（字段名与 coin_info 一致）；同一数据源的各组一起请求、一起写入
+FIELD_GROUPS: Dict[str, Tuple[str, ...]] = {
+    # /coins/markets：每次刷新都会带回供应量与历史高低点，因此与市值放在同一组
+    "market": (
+        "id", "name", "symbol", "market_cap", "market_cap_rank", "total_volume",
+        "circulating_supply", "total_supply", "max_supply",
+        "ath", "ath_change_percentage", "atl", "atl_change_percentage",
+        "price_change_24h", "price_change_7d", "price_change_30d",
+    ),
+    # /coins/{id}：评分按天变化
+    "scores": ("community_score", "developer_score", "liquidity_score", "public_interest_score", "trust_score"),
+    # /coins/{id}：项目资料几乎不变
+    "profile": ("description", "categories", "links"),
+}
+
+# 各组的数据源
+GROUP_SOURCES: Dict[str, str] = {"market": "markets", "scores": "details", "profile": "details"}
+
+_FIELD_DEFAULTS: Dict[str, Any] = {
+    "id": None, "name": None, "symbol": "", "market_cap_rank": None,
+    "description": "", "categories": None, "links": None,
+}
+_MUTABLE_DEFAULTS = {"categories": list, "links": dict}
+
+FRESH, STALE, MISS = "fresh", "stale", "miss"
+
+
+def group_ttls() -> Dict[str, float]:
+    """各组有效期（秒）"""
+    return {
+        "market": Config.FUNDAMENTALS_MARKETS_TTL,
+        "scores": Config.FUNDAMENTALS_DETAILS_TTL,
+        "profile": Config.FUNDAMENTALS_PROFILE_TTL,
+    }
+
+
+class FundamentalsRecord:
+    """单个币种的基本面记录（每个字段一个槽位，另有每组的获取时间）"""
+
+    __slots__ = tuple(field for fields in FIELD_GROUPS.values() for field in fields) + \
+        tuple(f"{group}_at" for group in FIELD_GROUPS)
+
+    def __init__(self, coin_id: str):
+        for fields in FIELD_GROUPS.values():
+            for field in fields:
+                factory = _MUTABLE_DEFAULTS.get(field)
+                setattr(self, field, factory() if factory else _FIELD_DEFAULTS.get(field, 0))
+        for group in FIELD_GROUPS:
+            setattr(self, f"{group}_at", 0.0)
+        self.id = coin_id
+
+    def fetched_at(self, group: str) -> float:
+        return getattr(self, f"{group}_at")
+
+    def set_group(self, group: str, values: Dict[str, Any], fetched_at: float):
+        for field in FIELD_GROUPS[group]:
+            setattr(self, field, values[field])
+        setattr(self, f"{group}_at", fetched_at)
+
+    def group_values(self, *groups: str) -> Dict[str, Any]:
+        """指定组的字段字典"""
+        return {field: getattr(self, field) for group in groups for field in FIELD_GROUPS[group]}
+
+    def to_dict(self) -> Dict[str, Any]:
+        """完整的 coin_info 字典"""
+        return self.group_values(*FIELD_GROUPS)
+
+
+class FundamentalsCache:
+    """基本面字段分组缓存（内存记录 + SQLite持久化 + 后台刷新）"""
+
+    def __init__(self, path: Optional[str] = None, ttls: Optional[Dict[str, float]] = None,
+                 stale_factor: Optional[float] = None):
+        self.path = path or os.path.join(Config.CACHE_DIR, "fundamentals.sqlite3")
+        self.ttls = ttls or group_ttls()
+        self.stale_factor = max(1.0, stale_factor if stale_factor is not None else Config.FUNDAMENTALS_STALE_FACTOR)
+        self._lock = threading.Lock()
+        self._conn = self._connect()
+        self._records: Dict[str, FundamentalsRecord] = {}
+        # 正在后台刷新的 (数据源, 币种ID)
+        self._refreshing = set()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self.stats = {FRESH: 0, STALE: 0, MISS: 0, "disk_loads": 0, "writes": 0, "background_refreshes": 0}
+
+    def _connect(self) -> sqlite3.Connection:
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS fundamentals_cache (
+                coin_id TEXT NOT NULL,
+                field_group TEXT NOT NULL,
+                fetched_at REAL NOT NULL,
+                data TEXT NOT NULL,
+                PRIMARY KEY (coin_id, field_group)
+            )
+        """)
+        conn.commit()
+        return conn
+
+    def _record(self, coin_id: str) -> FundamentalsRecord:
+        """内存记录；进程内首次访问时从磁盘加载（调用方持有锁）"""
+        record = self._records.get(coin_id)
+        if record is not None:
+            return record
+
+        record = FundamentalsRecord(coin_id)
+        rows = self._conn.execute(
+            "SELECT field_group, fetched_at, data FROM fundamentals_cache WHERE coin_id = ?", (coin_id,)
+        ).fetchall()
+        for group, fetched_at, data in rows:
+            if group not in FIELD_GROUPS:
+                continue
+            try:
+                record.set_group(group, json.loads(data), fetched_at)
+            except (KeyError, ValueError) as e:
+                logger.warning(f"忽略损坏的基本面缓存 {coin_id}/{group}: {e}")
+        if rows:
+            self.stats["disk_loads"] += 1
+        self._records[coin_id] = record
+        return record
+
+    def _status(self, record: FundamentalsRecord, group: str, now: float) -> str:
+        age = now - record.fetched_at(group)
+        ttl = self.ttls[group]
+        if age < ttl:
+            return FRESH
+        if age < ttl * self.stale_factor:
+            return STALE
+        return MISS
+
+    def lookup(self, coin_id: str, groups: Tuple[str, ...]) -> Tuple[str, Dict[str, Any]]:
+        """
+        查询指定组
+
+        Returns:
+            (状态, 字段字典)：状态取各组中最差的一个（fresh / stale / miss），miss 时字段字典为空
+        """
+        now = time.time()
+        with self._lock:
+            record = self._record(coin_id)
+            statuses = {self._status(record, group, now) for group in groups}
+            status = MISS if MISS in statuses else STALE if STALE in statuses else FRESH
+            self.stats[status] += 1
+            return status, (record.group_values(*groups) if status != MISS else {})
+
+    def update(self, coin_id: str, values: Dict[str, Any]):
+        """写入字段（只写入字段齐全的组），同时持久化"""
+        fetched_at = time.time()
+        groups = [group for group, fields in FIELD_GROUPS.items() if all(field in values for field in fields)]
+        if not groups:
+            return
+        with self._lock:
+            record = self._record(coin_id)
+            for group in groups:
+                record.set_group(group, values, fetched_at)
+            try:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO fundamentals_cache (coin_id, field_group, fetched_at, data) VALUES (?, ?, ?, ?)",
+                    [(coin_id, group, fetched_at, json.dumps(record.group_values(group), ensure_ascii=False))
+                     for group in groups]
+                )
+                self._conn.commit()
+                self.stats["writes"] += 1
+            except sqlite3.Error as e:
+                logger.warning(f"保存基本面缓存失败: {e}")
+
+    def record(self, coin_id: str) -> Dict[str, Any]:
+        """当前缓存的完整 coin_info（不检查有效期）"""
+        with self._lock:
+            return self._record(coin_id).to_dict()
+
+    def refresh_later(self, source: str, coin_ids: List[str], fetch: Callable[[List[str]], Any]):
+        """在后台线程中刷新过期数据（同一数据源的同一币种同时只刷新一次），fetch 负责请求并写回缓存"""
+        with self._lock:
+            pending = [coin_id for coin_id in dict.fromkeys(coin_ids) if (source, coin_id) not in self._refreshing]
+            if not pending:
+                return
+            self._refreshing.update((source, coin_id) for coin_id in pending)
+            self.stats["background_refreshes"] += 1
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="fundamentals-refresh")
+            executor = self._executor
+
+        def run():
+            try:
+                fetch(pending)
+            except Exception as e:
+                logger.warning(f"后台刷新基本面数据失败（{source}）: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing.difference_update((source, coin_id) for coin_id in pending)
+
+        executor.submit(run)
+
+    def wait_refreshes(self):
+        """等待已提交的后台刷新完成（用于测试与退出前）"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+
+_fundamentals_cache: Optional[FundamentalsCache] = None
+_fundamentals_cache_lock = threading.Lock()
+
+
+def get_fundamentals_cache() -> FundamentalsCache:
+    """获取进程共享的基本面缓存"""
+    global _fundamentals_cache
+    with _fundamentals_cache_lock:
+        if _fundamentals_cache is None:
+            _fundamentals_cache = FundamentalsCache()
+        return _fundamentals_cache
+
+
+if __name__ == "__main__":
+    # 独立测试（使用模拟数据，不访问网络）
+    import sys
+    import tempfile
+
+    path = os.path.join(tempfile.mkdtemp(), "fundamentals.sqlite3")
+    cache = FundamentalsCache(path=path, ttls={"market": 60, "scores": 86400, "profile": 604800}, stale_factor=2)
+    market = {field: 1.0 for field in FIELD_GROUPS["market"]}
+    market.update({"id": "bitcoin", "name": "Bitcoin", "symbol": "BTC", "market_cap_rank": 1})
+    details = {"community_score": 80, "developer_score": 90, "liquidity_score": 70, "public_interest_score": 10,
+               "trust_score": 0, "description": "Bitcoin ...", "categories": ["Layer 1"], "links": {}}
+
+    print(f"空缓存: {cache.lookup('bitcoin', ('market',))[0]}")
+    cache.update("bitcoin", {**market, **details})
+    print(f"写入后: {cache.lookup('bitcoin', ('market', 'profile'))[0]}")
+
+    reloaded = FundamentalsCache(path=path, ttls={"market": 0.001, "scores": 86400, "profile": 604800}, stale_factor=1)
+    time.sleep(0.01)
+    print(f"新进程: 项目资料 {reloaded.lookup('bitcoin', ('profile',))[0]}，市场字段 {reloaded.lookup('bitcoin', ('market',))[0]}")
+
+    refreshed = []
+    stale = FundamentalsCache(path=path, ttls={"market": 0.001, "scores": 86400, "profile": 604800}, stale_factor=1e9)
+    time.sleep(0.01)
+    status, values = stale.lookup("bitcoin", ("market",))
+    stale.refresh_later("markets", ["bitcoin"], refreshed.extend)
+    stale.wait_refreshes()
+    print(f"过期但在宽限期内: {status}，返回旧值 market_cap={values['market_cap']}，后台刷新 {refreshed}")
+    print(f"单条记录大小: {sys.getsizeof(reloaded._records['bitcoin'])} 字节（__slots__）")
+    print(f"统计: {cache.stats}")
+    print("测试完成！")
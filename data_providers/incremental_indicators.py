@@ -0,0 +1,419 @@
+"""
+增量技术指标模块
+为流式K线更新维护指标状态：每根新K线以 O(1) 时间更新 RSI、EMA/MACD、布林带与ATR，
+状态可序列化为JSON，进程重启后从上次位置继续；结果与 indicators 模块的批量计算一致
+"""
+
+import json
+import math
+import os
+import threading
+from collections import deque
+from typing import Any, Dict, Optional
+
+NAN = float("nan")
+
+
+class EMAState:
+    """指数移动平均（与 pandas ewm(span=..., adjust=...).mean() 一致）"""
+
+    def __init__(self, span: Optional[float] = None, alpha: Optional[float] = None, adjust: bool = True):
+        self.span = span
+        self.alpha = alpha if alpha is not None else 2.0 / (span + 1.0)
+        self.adjust = adjust
+        self.numerator = 0.0
+        self.denominator = 0.0
+        self.value = NAN
+
+    def update(self, x: float) -> float:
+        decay = 1.0 - self.alpha
+        if self.adjust:
+            self.numerator = x + decay * self.numerator
+            self.denominator = 1.0 + decay * self.denominator
+            self.value = self.numerator / self.denominator
+        else:
+            self.value = x if math.isnan(self.value) else self.alpha * x + decay * self.value
+        return self.value
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "span": self.span,
+            "alpha": self.alpha,
+            "adjust": self.adjust,
+            "numerator": self.numerator,
+            "denominator": self.denominator,
+            "value": self.value
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "EMAState":
+        state = cls(span=data["span"], alpha=data["alpha"], adjust=data["adjust"])
+        state.numerator = data["numerator"]
+        state.denominator = data["denominator"]
+        state.value = data["value"]
+        return state
+
+
+class RollingWindow:
+    """固定长度滑动窗口，维护窗口内的和与平方和（每满一窗重新精确求和，避免累积误差）"""
+
+    def __init__(self, period: int):
+        self.period = period
+        self.values = deque(maxlen=period)
+        self.total = 0.0
+        self.total_sq = 0.0
+        self._since_resync = 0
+
+    def push(self, x: float):
+        if len(self.values) == self.period:
+            old = self.values[0]
+            self.total -= old
+            self.total_sq -= old * old
+        self.values.append(x)
+        self.total += x
+        self.total_sq += x * x
+
+        self._since_resync += 1
+        if self._since_resync >= self.period:
+            self.total = math.fsum(self.values)
+            self.total_sq = math.fsum(v * v for v in self.values)
+            self._since_resync = 0
+
+    @property
+    def full(self) -> bool:
+        return len(self.values) == self.period
+
+    def mean(self) -> float:
+        return self.total / self.period if self.full else NAN
+
+    def std(self, ddof: int = 1) -> float:
+        """样本标准差（默认 ddof=1，与 pandas rolling().std() 一致）"""
+        if not self.full or self.period <= ddof:
+            return NAN
+        variance = (self.total_sq - self.total * self.total / self.period) / (self.period - ddof)
+        return math.sqrt(max(variance, 0.0))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"period": self.period, "values": list(self.values)}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "RollingWindow":
+        window = cls(data["period"])
+        window.values.extend(data["values"])
+        window.total = math.fsum(window.values)
+        window.total_sq = math.fsum(v * v for v in window.values)
+        return window
+
+
+class WilderState:
+    """Wilder 平滑：前 period 个值取均值，之后 y = (y·(period-1) + x) / period"""
+
+    def __init__(self, period: int):
+        self.period = period
+        self.count = 0
+        self.warmup_sum = 0.0
+        self.value = NAN
+
+    def update(self, x: float) -> float:
+        if self.count < self.period:
+            self.count += 1
+            self.warmup_sum += x
+            if self.count == self.period:
+                self.value = self.warmup_sum / self.period
+        else:
+            self.value = (self.value * (self.period - 1) + x) / self.period
+        return self.value
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"period": self.period, "count": self.count, "warmup_sum": self.warmup_sum, "value": self.value}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "WilderState":
+        state = cls(data["period"])
+        state.count = data["count"]
+        state.warmup_sum = data["warmup_sum"]
+        state.value = data["value"]
+        return state
+
+
+class RSIState:
+    """
+    相对强弱指标
+
+    method="sma" 与 MarketDataProvider 的批量实现一致（首个差分记为0）；method="wilder" 为 Wilder 平滑
+    """
+
+    def __init__(self, period: int = 14, method: str = "sma"):
+        self.period = period
+        self.method = method
+        self.prev_close: Optional[float] = None
+        if method == "wilder":
+            self.gains, self.losses = WilderState(period), WilderState(period)
+        else:
+            self.gains, self.losses = RollingWindow(period), RollingWindow(period)
+        self.value = NAN
+
+    def update(self, close: float) -> float:
+        first = self.prev_close is None
+        delta = 0.0 if first else close - self.prev_close
+        self.prev_close = close
+        gain, loss = max(delta, 0.0), max(-delta, 0.0)
+
+        if self.method == "wilder":
+            if first:
+                return self.value
+            avg_gain, avg_loss = self.gains.update(gain), self.losses.update(loss)
+        else:
+            self.gains.push(gain)
+            self.losses.push(loss)
+            avg_gain, avg_loss = self.gains.mean(), self.losses.mean()
+
+        if math.isnan(avg_gain) or math.isnan(avg_loss) or (avg_gain == 0 and avg_loss == 0):
+            self.value = NAN
+        elif avg_loss == 0:
+            self.value = 100.0
+        else:
+            self.value = 100.0 - 100.0 / (1.0 + avg_gain / avg_loss)
+        return self.value
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "period": self.period,
+            "method": self.method,
+            "prev_close": self.prev_close,
+            "gains": self.gains.to_dict(),
+            "losses": self.losses.to_dict(),
+            "value": self.value
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "RSIState":
+        state = cls(data["period"], data["method"])
+        smoother = WilderState if state.method == "wilder" else RollingWindow
+        state.prev_close = data["prev_close"]
+        state.gains = smoother.from_dict(data["gains"])
+        state.losses = smoother.from_dict(data["losses"])
+        state.value = data["value"]
+        return state
+
+
+class MACDState:
+    """MACD（EMA 采用 pandas 默认的 adjust=True）"""
+
+    def __init__(self, fast: int = 12, slow: int = 26, signal: int = 9):
+        self.fast = EMAState(span=fast)
+        self.slow = EMAState(span=slow)
+        self.signal = EMAState(span=signal)
+
+    def update(self, close: float) -> Dict[str, float]:
+        macd_line = self.fast.update(close) - self.slow.update(close)
+        signal_line = self.signal.update(macd_line)
+        return {'macd': macd_line, 'signal': signal_line, 'histogram': macd_line - signal_line}
+
+    @property
+    def value(self) -> Dict[str, float]:
+        macd_line = self.fast.value - self.slow.value
+        return {'macd': macd_line, 'signal': self.signal.value, 'histogram': macd_line - self.signal.value}
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"fast": self.fast.to_dict(), "slow": self.slow.to_dict(), "signal": self.signal.to_dict()}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "MACDState":
+        state = cls.__new__(cls)
+        state.fast = EMAState.from_dict(data["fast"])
+        state.slow = EMAState.from_dict(data["slow"])
+        state.signal = EMAState.from_dict(data["signal"])
+        return state
+
+
+class BollingerState:
+    """布林带"""
+
+    def __init__(self, period: int = 20, std_dev: float = 2):
+        self.std_dev = std_dev
+        self.window = RollingWindow(period)
+
+    def update(self, close: float) -> Dict[str, float]:
+        self.window.push(close)
+        return self.value
+
+    @property
+    def value(self) -> Dict[str, float]:
+        middle, std = self.window.mean(), self.window.std()
+        return {'upper': middle + std * self.std_dev, 'middle': middle, 'lower': middle - std * self.std_dev}
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"std_dev": self.std_dev, "window": self.window.to_dict()}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "BollingerState":
+        state = cls(data["window"]["period"], data["std_dev"])
+        state.window = RollingWindow.from_dict(data["window"])
+        return state
+
+
+class ATRState:
+    """平均真实波幅（Wilder 平滑；首根K线的真实波幅为 high - low）"""
+
+    def __init__(self, period: int = 14):
+        self.prev_close: Optional[float] = None
+        self.smoother = WilderState(period)
+
+    def update(self, high: float, low: float, close: float) -> float:
+        true_range = high - low
+        if self.prev_close is not None:
+            true_range = max(true_range, abs(high - self.prev_close), abs(low - self.prev_close))
+        self.prev_close = close
+        return self.smoother.update(true_range)
+
+    @property
+    def value(self) -> float:
+        return self.smoother.value
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"prev_close": self.prev_close, "smoother": self.smoother.to_dict()}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ATRState":
+        state = cls(data["smoother"]["period"])
+        state.prev_close = data["prev_close"]
+        state.smoother = WilderState.from_dict(data["smoother"])
+        return state
+
+
+class IndicatorSet:
+    """
+    单个 (交易对, 周期) 的全部增量指标
+
+    同一时间戳的K线重复推送时（最后一根K线尚未收盘）回滚到该K线之前的状态再重新计算，
+    早于最后时间戳的K线忽略
+    """
+
+    def __init__(self, rsi_period: int = 14, rsi_method: str = "sma", macd_params=(12, 26, 9),
+                 bb_period: int = 20, bb_std: float = 2, atr_period: int = 14):
+        self.rsi = RSIState(rsi_period, rsi_method)
+        self.macd = MACDState(*macd_params)
+        self.bollinger = BollingerState(bb_period, bb_std)
+        self.atr = ATRState(atr_period)
+        self.last_timestamp: Optional[int] = None
+        self.count = 0
+        # 最后一根K线之前的状态，用于重放未收盘K线
+        self._checkpoint: Optional[Dict[str, Any]] = None
+
+    def _states(self) -> Dict[str, Any]:
+        return {
+            "rsi": self.rsi.to_dict(),
+            "macd": self.macd.to_dict(),
+            "bollinger": self.bollinger.to_dict(),
+            "atr": self.atr.to_dict()
+        }
+
+    def _restore(self, states: Dict[str, Any]):
+        self.rsi = RSIState.from_dict(states["rsi"])
+        self.macd = MACDState.from_dict(states["macd"])
+        self.bollinger = BollingerState.from_dict(states["bollinger"])
+        self.atr = ATRState.from_dict(states["atr"])
+
+    def update(self, timestamp: int, high: float, low: float, close: float) -> Dict[str, Any]:
+        """推送一根K线并返回最新指标"""
+        timestamp, high, low, close = int(timestamp), float(high), float(low), float(close)
+        if self.last_timestamp is not None and timestamp < self.last_timestamp:
+            return self.latest()
+
+        if timestamp == self.last_timestamp and self._checkpoint is not None:
+            self._restore(self._checkpoint)
+        else:
+            self._checkpoint = self._states()
+            self.last_timestamp = timestamp
+            self.count += 1
+
+        self.rsi.update(close)
+        self.macd.update(close)
+        self.bollinger.update(close)
+        self.atr.update(high, low, close)
+        return self.latest()
+
+    def latest(self) -> Dict[str, Any]:
+        """最新指标，键与 indicators.compute_indicators(latest=True) 的默认输出一致"""
+        return {
+            'rsi': self.rsi.value,
+            'macd': self.macd.value,
+            'bollinger_bands': self.bollinger.value,
+            'atr': self.atr.value,
+            f'ema_{self.macd.fast.span}': self.macd.fast.value,
+            f'ema_{self.macd.slow.span}': self.macd.slow.value,
+            f'sma_{self.bollinger.window.period}': self.bollinger.window.mean()
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "last_timestamp": self.last_timestamp,
+            "count": self.count,
+            "states": self._states(),
+            "checkpoint": self._checkpoint
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "IndicatorSet":
+        indicator_set = cls()
+        indicator_set._restore(data["states"])
+        indicator_set.last_timestamp = data["last_timestamp"]
+        indicator_set.count = data["count"]
+        indicator_set._checkpoint = data["checkpoint"]
+        return indicator_set
+
+    def save(self, path: str):
+        """原子写入JSON文件（先写临时文件再替换）"""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> Optional["IndicatorSet"]:
+        """读取JSON文件，不存在时返回 None"""
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return cls.from_dict(json.load(f))
+
+
+if __name__ == "__main__":
+    # 独立测试：与批量计算对比，并测试序列化与未收盘K线的重放
+    import tempfile
+    import time
+    import numpy as np
+    from data_providers import indicators
+
+    rng = np.random.default_rng(1)
+    closes = 100 + np.cumsum(rng.normal(0, 1, 300))
+    highs = closes + rng.uniform(0, 1, closes.shape)
+    lows = closes - rng.uniform(0, 1, closes.shape)
+    batch = indicators.compute_indicators(closes, highs, lows, latest=True)
+
+    live = IndicatorSet()
+    for t in range(200):
+        live.update(t, highs[t], lows[t], closes[t])
+
+    # 模拟重启：序列化后继续推送剩余K线
+    path = os.path.join(tempfile.mkdtemp(), "BTC_USDT", "1h.json")
+    live.save(path)
+    live = IndicatorSet.load(path)
+    live.update(200, highs[200] + 5, lows[200], closes[200] + 3)  # 未收盘K线，随后被覆盖
+    start = time.perf_counter()
+    for t in range(200, 300):
+        result = live.update(t, highs[t], lows[t], closes[t])
+    elapsed = time.perf_counter() - start
+
+    print(f"RSI: 增量 {result['rsi']:.6f} / 批量 {batch['rsi']:.6f}")
+    print(f"MACD 一致: {np.allclose(list(result['macd'].values()), list(batch['macd'].values()))}")
+    print(f"布林带 一致: {np.allclose(list(result['bollinger_bands'].values()), list(batch['bollinger_bands'].values()))}")
+    print(f"ATR 一致: {np.isclose(result['atr'], batch['atr'])}")
+    wilder = RSIState(14, "wilder")
+    for close in closes:
+        wilder.update(close)
+    print(f"Wilder RSI 一致: {np.isclose(wilder.value, indicators.rsi(closes, 14, 'wilder')[-1])}")
+    print(f"每根K线更新耗时 {elapsed / 100 * 1e6:.1f}µs")
+    print("测试完成！")
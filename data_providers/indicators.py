@@ -0,0 +1,223 @@
+"""
+技术指标计算模块
+基于 NumPy 的向量化指标引擎：输入单个币种的一维序列（时间）或多个币种的二维数组（币种 × 时间），
+沿时间轴一次性计算全部币种的指标，可返回完整序列或最新值
+"""
+
+from typing import Any, Dict, Optional
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# OHLCV 数组最后一维的列顺序
+OPEN, HIGH, LOW, CLOSE, VOLUME = range(5)
+
+
+def _as_float_array(values) -> np.ndarray:
+    return np.asarray(values, dtype=np.float64)
+
+
+def sma(values, period: int) -> np.ndarray:
+    """简单移动平均（前 period-1 个值为 NaN，与 pandas rolling().mean() 一致）"""
+    x = _as_float_array(values)
+    result = np.full(x.shape, np.nan)
+    if x.shape[-1] < period:
+        return result
+    result[..., period - 1:] = sliding_window_view(x, period, axis=-1).mean(axis=-1)
+    return result
+
+
+def rolling_std(values, period: int, ddof: int = 1) -> np.ndarray:
+    """滚动标准差（默认样本标准差，与 pandas rolling().std() 一致）"""
+    x = _as_float_array(values)
+    result = np.full(x.shape, np.nan)
+    if x.shape[-1] < period:
+        return result
+    result[..., period - 1:] = sliding_window_view(x, period, axis=-1).std(axis=-1, ddof=ddof)
+    return result
+
+
+def ema(values, span: Optional[float] = None, alpha: Optional[float] = None, adjust: bool = True) -> np.ndarray:
+    """
+    指数移动平均（与 pandas ewm(span=..., adjust=...).mean() 一致）
+
+    沿时间轴递推，每一步同时处理全部币种
+    """
+    x = _as_float_array(values)
+    if alpha is None:
+        alpha = 2.0 / (span + 1.0)
+    decay = 1.0 - alpha
+    result = np.empty_like(x)
+    if x.shape[-1] == 0:
+        return result
+
+    if adjust:
+        # y_t = Σ decay^i · x_{t-i} / Σ decay^i
+        numerator = x[..., 0].copy()
+        denominator = np.ones(x.shape[:-1])
+        result[..., 0] = numerator
+        for t in range(1, x.shape[-1]):
+            numerator = x[..., t] + decay * numerator
+            denominator = 1.0 + decay * denominator
+            result[..., t] = numerator / denominator
+    else:
+        result[..., 0] = x[..., 0]
+        for t in range(1, x.shape[-1]):
+            result[..., t] = alpha * x[..., t] + decay * result[..., t - 1]
+    return result
+
+
+def wilder_smooth(values, period: int) -> np.ndarray:
+    """Wilder 平滑：首值为前 period 个值的均值，之后 y_t = (y_{t-1}·(period-1) + x_t) / period"""
+    x = _as_float_array(values)
+    result = np.full(x.shape, np.nan)
+    if x.shape[-1] < period:
+        return result
+    result[..., period - 1] = x[..., :period].mean(axis=-1)
+    for t in range(period, x.shape[-1]):
+        result[..., t] = (result[..., t - 1] * (period - 1) + x[..., t]) / period
+    return result
+
+
+def rsi(close, period: int = 14, method: str = "sma") -> np.ndarray:
+    """
+    相对强弱指标
+
+    method="sma" 与 MarketDataProvider 原有实现一致（涨跌幅的简单移动平均，首个差分记为0）；
+    method="wilder" 为 Wilder 平滑的标准RSI
+    """
+    x = _as_float_array(close)
+    delta = np.zeros(x.shape)
+    delta[..., 1:] = np.diff(x, axis=-1)
+    gain = np.where(delta > 0, delta, 0.0)
+    loss = np.where(delta < 0, -delta, 0.0)
+
+    if method == "wilder":
+        # 首个差分不存在，从第二个值开始平滑
+        avg_gain = np.full(x.shape, np.nan)
+        avg_loss = np.full(x.shape, np.nan)
+        avg_gain[..., 1:] = wilder_smooth(gain[..., 1:], period)
+        avg_loss[..., 1:] = wilder_smooth(loss[..., 1:], period)
+    else:
+        avg_gain = sma(gain, period)
+        avg_loss = sma(loss, period)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return 100.0 - 100.0 / (1.0 + avg_gain / avg_loss)
+
+
+def macd(close, fast: int = 12, slow: int = 26, signal: int = 9) -> Dict[str, np.ndarray]:
+    """MACD（EMA 采用 pandas 默认的 adjust=True）"""
+    macd_line = ema(close, span=fast) - ema(close, span=slow)
+    signal_line = ema(macd_line, span=signal)
+    return {
+        'macd': macd_line,
+        'signal': signal_line,
+        'histogram': macd_line - signal_line
+    }
+
+
+def bollinger_bands(close, period: int = 20, std_dev: float = 2) -> Dict[str, np.ndarray]:
+    """布林带"""
+    middle = sma(close, period)
+    std = rolling_std(close, period)
+    return {
+        'upper': middle + std * std_dev,
+        'middle': middle,
+        'lower': middle - std * std_dev
+    }
+
+
+def true_range(high, low, close) -> np.ndarray:
+    """真实波幅（首根K线为 high - low）"""
+    high, low, close = _as_float_array(high), _as_float_array(low), _as_float_array(close)
+    prev_close = np.empty_like(close)
+    prev_close[..., 0] = np.nan
+    prev_close[..., 1:] = close[..., :-1]
+    with np.errstate(invalid="ignore"):
+        ranges = np.stack([high - low, np.abs(high - prev_close), np.abs(low - prev_close)])
+    return np.nanmax(ranges, axis=0)
+
+
+def atr(high, low, close, period: int = 14) -> np.ndarray:
+    """平均真实波幅（Wilder 平滑）"""
+    return wilder_smooth(true_range(high, low, close), period)
+
+
+def _latest(series: Any) -> Any:
+    """取最新值：一维输入返回 float，二维输入返回各币种最新值数组"""
+    if isinstance(series, dict):
+        return {key: _latest(value) for key, value in series.items()}
+    last = series[..., -1]
+    return float(last) if np.ndim(last) == 0 else last
+
+
+def compute_indicators(close, high=None, low=None, latest: bool = False, rsi_period: int = 14, rsi_method: str = "sma",
+                       macd_params=(12, 26, 9), bb_period: int = 20, bb_std: float = 2,
+                       atr_period: int = 14, ema_spans=(12, 26), sma_periods=(20,)) -> Dict[str, Any]:
+    """
+    一次计算全部指标
+
+    Args:
+        close: 收盘价（时间 或 币种 × 时间）
+        high / low: 最高价、最低价（与 close 同形状；提供时计算ATR）
+        latest: True 时只返回最新值，否则返回完整序列
+
+    Returns:
+        {'rsi', 'macd': {...}, 'bollinger_bands': {...}, 'atr', 'ema_<span>', 'sma_<period>'}
+    """
+    close = _as_float_array(close)
+    results: Dict[str, Any] = {
+        'rsi': rsi(close, rsi_period, rsi_method),
+        'macd': macd(close, *macd_params),
+        'bollinger_bands': bollinger_bands(close, bb_period, bb_std)
+    }
+    if high is not None and low is not None:
+        results['atr'] = atr(high, low, close, atr_period)
+    for span in ema_spans:
+        results[f'ema_{span}'] = ema(close, span=span)
+    for period in sma_periods:
+        results[f'sma_{period}'] = sma(close, period)
+
+    return _latest(results) if latest else results
+
+
+def compute_indicators_from_ohlcv(ohlcv, latest: bool = False, **kwargs) -> Dict[str, Any]:
+    """
+    从 OHLCV 数组计算全部指标
+
+    Args:
+        ohlcv: 时间 × 5 或 币种 × 时间 × 5 的数组，列顺序 open/high/low/close/volume
+        latest / kwargs: 同 compute_indicators
+    """
+    columns = np.moveaxis(_as_float_array(ohlcv), -1, 0)
+    return compute_indicators(columns[CLOSE], columns[HIGH], columns[LOW], latest=latest, **kwargs)
+
+
+if __name__ == "__main__":
+    # 独立测试：与 pandas 实现对比，并测试批量计算耗时
+    import time
+    import pandas as pd
+
+    rng = np.random.default_rng(0)
+    closes = 100 + np.cumsum(rng.normal(0, 1, size=(500, 200)), axis=1)
+    highs = closes + rng.uniform(0, 1, closes.shape)
+    lows = closes - rng.uniform(0, 1, closes.shape)
+    ohlcv = np.stack([closes, highs, lows, closes, np.ones_like(closes)], axis=-1)
+
+    series = pd.Series(closes[0])
+    delta = series.diff()
+    pandas_rsi = 100 - 100 / (1 + delta.where(delta > 0, 0).rolling(14).mean() / (-delta.where(delta < 0, 0)).rolling(14).mean())
+    pandas_macd = series.ewm(span=12).mean() - series.ewm(span=26).mean()
+    pandas_upper = series.rolling(20).mean() + series.rolling(20).std() * 2
+
+    single = compute_indicators_from_ohlcv(ohlcv[0])
+    print(f"RSI 一致: {np.allclose(single['rsi'], pandas_rsi, equal_nan=True)}")
+    print(f"MACD 一致: {np.allclose(single['macd']['macd'], pandas_macd)}")
+    print(f"布林上轨 一致: {np.allclose(single['bollinger_bands']['upper'], pandas_upper, equal_nan=True)}")
+
+    start = time.perf_counter()
+    batch = compute_indicators_from_ohlcv(ohlcv, latest=True)
+    elapsed = time.perf_counter() - start
+    print(f"500个币种 × 200根K线 一次计算耗时 {elapsed * 1000:.1f}ms，RSI形状 {batch['rsi'].shape}")
+    print(f"批量与单币种一致: {np.isclose(batch['rsi'][0], single['rsi'][-1])}")
+    print("测试完成！")
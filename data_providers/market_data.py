@@ -3,11 +3,16 @@
 使用CCXT获取K线和技术指标数据
 """
 
-import ccxt
+import asyncio
+import threading
 import pandas as pd
 import numpy as np
 from typing import Dict, List, Optional, Tuple
 from utils.config import Config
+from data_providers.ohlcv_store import OHLCVStore
+from data_providers import indicators
+from data_providers.incremental_indicators import IndicatorSet
+from data_providers.markets_cache import get_markets_cache
 from utils.logger import get_logger
 
 logger = get_logger(__name__)
@@ -19,9 +24,17 @@ class MarketDataProvider:
     def __init__(self):
         self.exchange = None
         self._init_exchange()
+        # K线本地存储：有历史数据时只增量请求最新K线
+        self.ohlcv_store = OHLCVStore(self.exchange) if Config.OHLCV_STORE_ENABLED else None
+        # 增量指标状态：(交易对, 周期) -> IndicatorSet，随K线存储一起持久化
+        self._indicator_sets: Dict[Tuple[str, str], IndicatorSet] = {}
+        self._indicator_lock = threading.Lock()
     
     def _init_exchange(self):
-        """初始化交易所连接"""
+        """初始化交易所连接（市场信息在首次使用交易对时从本地缓存加载，见 _ensure_markets）"""
+        # ccxt 导入较慢，只在创建交易所实例时导入
+        import ccxt
+        
         try:
             exchange_config = Config.get_exchange_config()
             exchange_name = exchange_config.pop("exchange")
@@ -29,20 +42,27 @@ class MarketDataProvider:
             # 创建交易所实例
             exchange_class = getattr(ccxt, exchange_name)
             self.exchange = exchange_class(exchange_config)
-            
-            # 加载市场信息
-            self.exchange.load_markets()
             logger.info(f"成功初始化交易所: {exchange_name}")
             
         except Exception as e:
             logger.error(f"初始化交易所失败: {e}")
             # 使用公共API模式
             self.exchange = ccxt.binance()
-            self.exchange.load_markets()
+    
+    def _ensure_markets(self):
+        """加载市场信息：优先使用本地缓存，过期或不存在时下载一次"""
+        get_markets_cache().ensure_markets(self.exchange)
     
     def get_ohlcv(self, symbol: str, timeframe: str = "1h", limit: int = 100) -> pd.DataFrame:
         """获取K线数据"""
         try:
+            self._ensure_markets()
+            
+            if self.ohlcv_store is not None:
+                df = self.ohlcv_store.get_ohlcv(symbol, timeframe, limit)
+                logger.info(f"成功获取 {symbol} {timeframe} K线数据，共 {len(df)} 条")
+                return df
+            
             # 获取OHLCV数据
             ohlcv = self.exchange.fetch_ohlcv(symbol, timeframe, limit=limit)
             
@@ -61,12 +81,7 @@ class MarketDataProvider:
     def calculate_rsi(self, df: pd.DataFrame, period: int = 14) -> float:
         """计算RSI指标"""
         try:
-            delta = df['close'].diff()
-            gain = (delta.where(delta > 0, 0)).rolling(window=period).mean()
-            loss = (-delta.where(delta < 0, 0)).rolling(window=period).mean()
-            rs = gain / loss
-            rsi = 100 - (100 / (1 + rs))
-            return rsi.iloc[-1]
+            return float(indicators.rsi(df['close'].to_numpy(), period)[-1])
         except Exception as e:
             logger.error(f"计算RSI失败: {e}")
             return 50.0
@@ -74,17 +89,7 @@ class MarketDataProvider:
     def calculate_macd(self, df: pd.DataFrame, fast: int = 12, slow: int = 26, signal: int = 9) -> Dict[str, float]:
         """计算MACD指标"""
         try:
-            ema_fast = df['close'].ewm(span=fast).mean()
-            ema_slow = df['close'].ewm(span=slow).mean()
-            macd_line = ema_fast - ema_slow
-            signal_line = macd_line.ewm(span=signal).mean()
-            histogram = macd_line - signal_line
-            
-            return {
-                'macd': macd_line.iloc[-1],
-                'signal': signal_line.iloc[-1],
-                'histogram': histogram.iloc[-1]
-            }
+            return {key: float(series[-1]) for key, series in indicators.macd(df['close'].to_numpy(), fast, slow, signal).items()}
         except Exception as e:
             logger.error(f"计算MACD失败: {e}")
             return {'macd': 0, 'signal': 0, 'histogram': 0}
@@ -92,21 +97,61 @@ class MarketDataProvider:
     def calculate_bollinger_bands(self, df: pd.DataFrame, period: int = 20, std_dev: int = 2) -> Dict[str, float]:
         """计算布林带"""
         try:
-            sma = df['close'].rolling(window=period).mean()
-            std = df['close'].rolling(window=period).std()
-            
-            upper_band = sma + (std * std_dev)
-            lower_band = sma - (std * std_dev)
-            
-            return {
-                'upper': upper_band.iloc[-1],
-                'middle': sma.iloc[-1],
-                'lower': lower_band.iloc[-1]
-            }
+            bands = indicators.bollinger_bands(df['close'].to_numpy(), period, std_dev)
+            return {key: float(series[-1]) for key, series in bands.items()}
         except Exception as e:
             logger.error(f"计算布林带失败: {e}")
             return {'upper': 0, 'middle': 0, 'lower': 0}
     
+    def calculate_indicators(self, df: pd.DataFrame) -> Dict[str, any]:
+        """一次计算全部技术指标的最新值（RSI、MACD、布林带、ATR、EMA、SMA）"""
+        try:
+            return indicators.compute_indicators(
+                df['close'].to_numpy(), df['high'].to_numpy(), df['low'].to_numpy(), latest=True
+            )
+        except Exception as e:
+            logger.error(f"计算技术指标失败: {e}")
+            return {
+                'rsi': 50.0,
+                'macd': {'macd': 0, 'signal': 0, 'histogram': 0},
+                'bollinger_bands': {'upper': 0, 'middle': 0, 'lower': 0},
+                'atr': 0
+            }
+    
+    def _indicator_state_path(self, symbol: str, timeframe: str) -> str:
+        """增量指标状态文件路径：与K线文件同目录，<周期>.indicators.json"""
+        return self.ohlcv_store.path(symbol, timeframe)[:-len(".npz")] + ".indicators.json"
+    
+    def get_streaming_indicators(self, symbol: str, timeframe: str, df: pd.DataFrame) -> Dict[str, any]:
+        """
+        增量更新技术指标：只推送上次更新之后（含未收盘的最后一根）的K线，
+        本地没有状态或状态与K线窗口衔接不上时用整个窗口重建；失败时回退到批量计算
+        """
+        try:
+            timestamps = df.index.values.astype("datetime64[ms]").astype(np.int64)
+            key = (symbol, timeframe)
+            path = self._indicator_state_path(symbol, timeframe)
+            with self._indicator_lock:
+                indicator_set = self._indicator_sets.get(key)
+                if indicator_set is None:
+                    indicator_set = IndicatorSet.load(path)
+                
+                if indicator_set is None or indicator_set.last_timestamp is None or indicator_set.last_timestamp < timestamps[0]:
+                    indicator_set, start = IndicatorSet(), 0
+                else:
+                    start = int(np.searchsorted(timestamps, indicator_set.last_timestamp))
+                
+                for timestamp, high, low, close in zip(timestamps[start:], df['high'].to_numpy()[start:],
+                                                       df['low'].to_numpy()[start:], df['close'].to_numpy()[start:]):
+                    indicator_set.update(timestamp, high, low, close)
+                
+                self._indicator_sets[key] = indicator_set
+                indicator_set.save(path)
+                return indicator_set.latest()
+        except Exception as e:
+            logger.warning(f"增量计算 {symbol} {timeframe} 技术指标失败，改用批量计算: {e}")
+            return self.calculate_indicators(df)
+    
     def get_support_resistance(self, df: pd.DataFrame) -> Dict[str, float]:
         """获取支撑阻力位"""
         try:
@@ -145,10 +190,11 @@ class MarketDataProvider:
             if df.empty:
                 return {}
             
-            # 计算技术指标
-            rsi = self.calculate_rsi(df)
-            macd = self.calculate_macd(df)
-            bb = self.calculate_bollinger_bands(df)
+            # 计算技术指标：启用K线存储时增量更新，否则一次向量化计算全部指标
+            if self.ohlcv_store is not None:
+                latest = self.get_streaming_indicators(symbol, timeframe, df)
+            else:
+                latest = self.calculate_indicators(df)
             sr = self.get_support_resistance(df)
             
             # 计算趋势
@@ -171,9 +217,10 @@ class MarketDataProvider:
                 'volume_24h': df['volume'].iloc[-1],
                 'trend': trend,
                 'technical_indicators': {
-                    'rsi': rsi,
-                    'macd': macd,
-                    'bollinger_bands': bb
+                    'rsi': latest['rsi'],
+                    'macd': latest['macd'],
+                    'bollinger_bands': latest['bollinger_bands'],
+                    'atr': latest['atr']
                 },
                 'support_resistance': sr,
                 'ohlcv_data': df.tail(10).to_dict('records')  # 最近10条数据
@@ -182,6 +229,10 @@ class MarketDataProvider:
         except Exception as e:
             logger.error(f"获取市场数据失败: {e}")
             return {}
+    
+    async def aget_market_data(self, symbol: str, timeframe: str = "1h", limit: int = 100) -> Dict[str, any]:
+        """获取完整的市场数据（异步；ccxt 同步客户端在线程中执行，不阻塞事件循环）"""
+        return await asyncio.to_thread(self.get_market_data, symbol, timeframe, limit)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,168 @@
+"""
+交易所市场信息缓存模块
+将 ccxt load_markets 下载的市场与币种信息按交易所保存为本地JSON（带有效期），
+同一进程内的多个交易所实例共享一份内存副本，首次使用交易对时才加载
+"""
+
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+from utils.config import Config
+from utils.singleflight import get_singleflight
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class MarketsCache:
+    """市场信息磁盘缓存"""
+
+    def __init__(self, root: Optional[str] = None, ttl: Optional[float] = None):
+        self.root = root or os.path.join(Config.CACHE_DIR, "markets")
+        self.ttl = ttl if ttl is not None else Config.MARKETS_CACHE_TTL
+        self._lock = threading.Lock()
+        # 交易所ID -> (市场, 币种, 获取时间)
+        self._memory: Dict[str, Tuple[Dict[str, Any], Optional[Dict[str, Any]], float]] = {}
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "downloads": 0}
+
+    def path(self, exchange_id: str) -> str:
+        """缓存文件路径：<root>/<交易所>.json"""
+        return os.path.join(self.root, f"{exchange_id}.json")
+
+    def _count(self, name: str):
+        with self._lock:
+            self.stats[name] += 1
+
+    def _fresh(self, fetched_at: float) -> bool:
+        return time.time() - fetched_at < self.ttl
+
+    def load(self, exchange_id: str) -> Optional[Tuple[Dict[str, Any], Optional[Dict[str, Any]]]]:
+        """读取未过期的市场信息（先查内存再查磁盘），没有时返回 None"""
+        with self._lock:
+            entry = self._memory.get(exchange_id)
+        if entry is not None and self._fresh(entry[2]):
+            self._count("memory_hits")
+            return entry[0], entry[1]
+
+        path = self.path(exchange_id)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception as e:
+            logger.warning(f"读取市场信息缓存失败，将重新下载: {path}: {e}")
+            return None
+        if not data.get("markets") or not self._fresh(data.get("fetched_at", 0)):
+            return None
+
+        with self._lock:
+            self._memory[exchange_id] = (data["markets"], data.get("currencies"), data["fetched_at"])
+        self._count("disk_hits")
+        return data["markets"], data.get("currencies")
+
+    def save(self, exchange_id: str, markets: Dict[str, Any], currencies: Optional[Dict[str, Any]] = None):
+        """保存市场信息（原子写入）"""
+        fetched_at = time.time()
+        with self._lock:
+            self._memory[exchange_id] = (markets, currencies, fetched_at)
+
+        path = self.path(exchange_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"fetched_at": fetched_at, "markets": markets, "currencies": currencies}, f)
+        os.replace(tmp_path, path)
+
+    def ensure_markets(self, exchange) -> Dict[str, Any]:
+        """
+        确保交易所实例已加载市场信息：已加载时直接返回，缓存有效时用 set_markets 填充，
+        否则下载一次并写入缓存（同一交易所的并发下载合并为一次）
+        """
+        if exchange.markets:
+            return exchange.markets
+
+        exchange_id = getattr(exchange, "id", "exchange")
+        cached = self.load(exchange_id)
+        if cached is None:
+            cached = get_singleflight("markets").do(exchange_id, lambda: self._download(exchange))
+
+        markets, currencies = cached
+        if markets and not exchange.markets:
+            exchange.set_markets(markets, currencies)
+        return exchange.markets
+
+    def _download(self, exchange) -> Tuple[Dict[str, Any], Optional[Dict[str, Any]]]:
+        # 等待期间其他线程可能已写入缓存
+        cached = self.load(exchange.id)
+        if cached is not None:
+            return cached
+
+        start = time.perf_counter()
+        exchange.load_markets()
+        self._count("downloads")
+        markets, currencies = exchange.markets or {}, exchange.currencies or None
+        logger.info(f"下载 {exchange.id} 市场信息 {len(markets)} 个，耗时 {time.perf_counter() - start:.2f}s")
+        if markets:
+            try:
+                self.save(exchange.id, markets, currencies)
+            except Exception as e:
+                logger.warning(f"保存市场信息缓存失败: {e}")
+        return markets, currencies
+
+
+_markets_cache: Optional[MarketsCache] = None
+_markets_cache_lock = threading.Lock()
+
+
+def get_markets_cache() -> MarketsCache:
+    """获取进程共享的市场信息缓存"""
+    global _markets_cache
+    with _markets_cache_lock:
+        if _markets_cache is None:
+            _markets_cache = MarketsCache()
+        return _markets_cache
+
+
+if __name__ == "__main__":
+    # 独立测试（使用模拟交易所，不访问网络）
+    import tempfile
+
+    class FakeExchange:
+        id = "fake"
+
+        def __init__(self):
+            self.markets = None
+            self.currencies = None
+            self.downloads = 0
+
+        def load_markets(self):
+            time.sleep(0.2)
+            self.downloads += 1
+            self.set_markets({"BTC/USDT": {"symbol": "BTC/USDT", "base": "BTC", "quote": "USDT"}},
+                             {"BTC": {"code": "BTC"}, "USDT": {"code": "USDT"}})
+
+        def set_markets(self, markets, currencies=None):
+            self.markets, self.currencies = markets, currencies
+
+    root = tempfile.mkdtemp()
+    cache = MarketsCache(root=root, ttl=60)
+
+    first = FakeExchange()
+    start = time.perf_counter()
+    cache.ensure_markets(first)
+    print(f"冷启动: 下载 {first.downloads} 次，耗时 {(time.perf_counter() - start) * 1000:.0f}ms")
+
+    second = FakeExchange()
+    cache.ensure_markets(second)
+    print(f"同进程第二个实例: 下载 {second.downloads} 次")
+
+    # 新进程：只有磁盘缓存
+    third = FakeExchange()
+    start = time.perf_counter()
+    MarketsCache(root=root, ttl=60).ensure_markets(third)
+    print(f"磁盘缓存热启动: 下载 {third.downloads} 次，耗时 {(time.perf_counter() - start) * 1000:.1f}ms")
+    print(f"统计: {cache.stats}")
+    print("测试完成！")
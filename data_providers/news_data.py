@@ -1,12 +1,21 @@
 """
 新闻数据提供模块
 获取CryptoPanic等新闻数据
+
+启用新闻本地存储（NEWS_STORE_ENABLED）时按游标增量拉取并去重入库，分析时查询本地时间窗口（见 data_providers.news_store）；
+否则实时请求：币种新闻与市场整体新闻互不依赖，并发请求（超时由 HTTP_TIMEOUT 约束），
+市场整体新闻与币种无关，在 NEWS_GENERAL_TTL 内由所有币种共享，批量模式每轮开始时只获取一次
 """
 
-import requests
 import time
-from typing import Dict, Any, List, Optional
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Tuple
 from utils.config import Config
+from utils.http_client import get_http_session, aget_json
+from utils.singleflight import get_singleflight
+from data_providers.news_store import NewsStore
 from utils.logger import get_logger
 
 logger = get_logger(__name__)
@@ -17,21 +26,85 @@ class NewsDataProvider:
     
     def __init__(self):
         self.cryptopanic_base_url = "https://cryptopanic.com/api/v1"
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Crypto-Agent/1.0'
-        })
+        # 共享连接池会话（批量模式下所有币种复用）
+        self.session = get_http_session('Crypto-Agent/1.0')
+        self.general_news_ttl = Config.NEWS_GENERAL_TTL
+        self._lock = threading.Lock()
+        # 共享的市场整体新闻：(获取时间, 条数, 新闻列表)
+        self._general_news: Optional[Tuple[float, int, List[Dict[str, Any]]]] = None
+        # 新闻本地存储：增量拉取，分析时只查询本地
+        self.news_store = NewsStore(self._fetch_posts_page) if Config.NEWS_STORE_ENABLED else None
+    
+    def _fetch_posts_page(self, params: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
+        """请求一页最新新闻（按发布时间从新到旧，用于增量入库），失败时返回 None"""
+        try:
+            url = f"{self.cryptopanic_base_url}/posts/"
+            response = self.session.get(url, params={'public': 'true', **params})
+            
+            if response.status_code == 200:
+                return self._parse_posts(response.json().get('results', []))
+            
+            logger.error(f"拉取新闻失败: {response.status_code}")
+            return None
+            
+        except Exception as e:
+            logger.error(f"拉取新闻异常: {e}")
+            return None
+    
+    def prefetch(self, coin_symbols: List[str]):
+        """批量模式每轮开始时调用：增量拉取整批币种（每 50 个币种一个请求）与市场整体新闻；未启用本地存储时刷新共享的市场整体新闻"""
+        if self.news_store is not None:
+            inserted = self.news_store.poll(coin_symbols) + self.news_store.poll()
+            logger.info(f"新闻增量拉取: {len(coin_symbols)} 个币种，新增 {inserted} 条，本地共 {len(self.news_store)} 条")
+        else:
+            self.get_shared_general_news(limit=10, refresh=True)
+    
+    async def aprefetch(self, coin_symbols: List[str]):
+        """批量预取（异步）"""
+        if self.news_store is not None:
+            await asyncio.to_thread(self.prefetch, coin_symbols)
+        else:
+            await self.aget_shared_general_news(limit=10, refresh=True)
+    
+    def _coin_news_params(self, coin_symbol: str, limit: int) -> Dict[str, Any]:
+        """币种新闻请求参数"""
+        return {
+            'currencies': coin_symbol,
+            'filter': 'hot',
+            'public': 'true',
+            'limit': limit
+        }
+    
+    def _general_news_params(self, limit: int) -> Dict[str, Any]:
+        """一般新闻请求参数"""
+        return {
+            'filter': 'hot',
+            'public': 'true',
+            'limit': limit
+        }
+    
+    def _parse_posts(self, posts: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """解析CryptoPanic帖子列表"""
+        news_list = []
+        for post in posts:
+            news_item = {
+                'id': post.get('id'),
+                'title': post.get('title'),
+                'url': post.get('url'),
+                'published_at': post.get('published_at'),
+                'currencies': [curr.get('code') for curr in post.get('currencies', [])],
+                'source': post.get('source', {}).get('title', 'Unknown'),
+                'votes': post.get('votes', {}),
+                'metadata': post.get('metadata', {})
+            }
+            news_list.append(news_item)
+        return news_list
     
     def get_news_by_coin(self, coin_symbol: str, limit: int = 20) -> List[Dict[str, Any]]:
         """获取特定币种的新闻"""
         try:
             url = f"{self.cryptopanic_base_url}/posts/"
-            params = {
-                'currencies': coin_symbol,
-                'filter': 'hot',
-                'public': 'true',
-                'limit': limit
-            }
+            params = self._coin_news_params(coin_symbol, limit)
             
             response = self.session.get(url, params=params)
             
@@ -39,19 +112,7 @@ class NewsDataProvider:
                 data = response.json()
                 posts = data.get('results', [])
                 
-                news_list = []
-                for post in posts:
-                    news_item = {
-                        'id': post.get('id'),
-                        'title': post.get('title'),
-                        'url': post.get('url'),
-                        'published_at': post.get('published_at'),
-                        'currencies': [curr.get('code') for curr in post.get('currencies', [])],
-                        'source': post.get('source', {}).get('title', 'Unknown'),
-                        'votes': post.get('votes', {}),
-                        'metadata': post.get('metadata', {})
-                    }
-                    news_list.append(news_item)
+                news_list = self._parse_posts(posts)
                 
                 logger.info(f"成功获取 {coin_symbol} 相关新闻 {len(news_list)} 条")
                 return news_list
@@ -67,11 +128,7 @@ class NewsDataProvider:
         """获取一般加密货币新闻"""
         try:
             url = f"{self.cryptopanic_base_url}/posts/"
-            params = {
-                'filter': 'hot',
-                'public': 'true',
-                'limit': limit
-            }
+            params = self._general_news_params(limit)
             
             response = self.session.get(url, params=params)
             
@@ -79,19 +136,7 @@ class NewsDataProvider:
                 data = response.json()
                 posts = data.get('results', [])
                 
-                news_list = []
-                for post in posts:
-                    news_item = {
-                        'id': post.get('id'),
-                        'title': post.get('title'),
-                        'url': post.get('url'),
-                        'published_at': post.get('published_at'),
-                        'currencies': [curr.get('code') for curr in post.get('currencies', [])],
-                        'source': post.get('source', {}).get('title', 'Unknown'),
-                        'votes': post.get('votes', {}),
-                        'metadata': post.get('metadata', {})
-                    }
-                    news_list.append(news_item)
+                news_list = self._parse_posts(posts)
                 
                 logger.info(f"成功获取一般加密货币新闻 {len(news_list)} 条")
                 return news_list
@@ -103,6 +148,48 @@ class NewsDataProvider:
             logger.error(f"获取一般新闻异常: {e}")
             return []
     
+    def _cached_general_news(self, limit: int) -> Optional[List[Dict[str, Any]]]:
+        with self._lock:
+            cached = self._general_news
+        if cached is not None and time.time() - cached[0] < self.general_news_ttl and cached[1] >= limit:
+            return cached[2][:limit]
+        return None
+    
+    def _store_general_news(self, limit: int, news_list: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        # 请求失败（空列表）不缓存，下一个币种会重试
+        if news_list:
+            with self._lock:
+                self._general_news = (time.time(), limit, news_list)
+        return news_list
+    
+    def get_shared_general_news(self, limit: int = 10, refresh: bool = False) -> List[Dict[str, Any]]:
+        """
+        获取各币种共享的市场整体新闻（NEWS_GENERAL_TTL 内复用，并发的获取合并为一次请求）
+        
+        Args:
+            limit: 新闻条数
+            refresh: 忽略已缓存的新闻重新获取（批量模式每轮开始时使用）
+        """
+        cached = None if refresh else self._cached_general_news(limit)
+        if cached is not None:
+            return cached
+        news_list = get_singleflight("general_news").do(
+            str(limit), lambda: self._store_general_news(limit, self.get_general_crypto_news(limit))
+        )
+        return news_list[:limit]
+    
+    async def aget_shared_general_news(self, limit: int = 10, refresh: bool = False) -> List[Dict[str, Any]]:
+        """获取共享的市场整体新闻（异步）"""
+        cached = None if refresh else self._cached_general_news(limit)
+        if cached is not None:
+            return cached
+        
+        async def fetch() -> List[Dict[str, Any]]:
+            return self._store_general_news(limit, await self.aget_general_crypto_news(limit))
+        
+        news_list = await get_singleflight("general_news").ado(str(limit), fetch)
+        return news_list[:limit]
+    
     def analyze_news_sentiment(self, news_list: List[Dict[str, Any]]) -> Dict[str, Any]:
         """分析新闻情绪"""
         try:
@@ -169,37 +256,119 @@ class NewsDataProvider:
                 'total_count': 0
             }
     
+    def _get_stored_news_data(self, coin_symbol: str) -> Dict[str, Any]:
+        """从本地存储查询时间窗口内的新闻（从未拉取过的订阅先同步拉取首页，到期的在后台增量更新）"""
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix="news") as executor:
+            coin_ready = executor.submit(self.news_store.ensure, coin_symbol)
+            self.news_store.ensure()
+            coin_ready.result()
+        
+        since = time.time() - Config.NEWS_WINDOW_HOURS * 3600
+        coin_news = self.news_store.query(coin_symbol, since=since, limit=15)
+        general_news = self.news_store.query(since=since, limit=10)
+        return self._build_news_data(coin_symbol, coin_news, general_news)
+    
     def get_news_data(self, coin_symbol: str) -> Dict[str, Any]:
-        """获取完整的新闻数据"""
+        """获取完整的新闻数据（启用本地存储时查询本地，否则币种新闻与市场整体新闻并发获取）"""
         try:
-            # 获取币种相关新闻
-            coin_news = self.get_news_by_coin(coin_symbol, limit=15)
-            
-            # 获取一般加密货币新闻
-            general_news = self.get_general_crypto_news(limit=10)
-            
-            # 分析币种新闻情绪
-            coin_sentiment = self.analyze_news_sentiment(coin_news)
-            
-            # 分析一般新闻情绪
-            general_sentiment = self.analyze_news_sentiment(general_news)
-            
-            # 合并数据
-            news_data = {
-                'symbol': coin_symbol,
-                'coin_news': coin_news,
-                'general_news': general_news,
-                'coin_sentiment': coin_sentiment,
-                'general_sentiment': general_sentiment,
-                'analysis_summary': {
-                    'total_coin_news': len(coin_news),
-                    'total_general_news': len(general_news),
-                    'coin_sentiment_score': coin_sentiment.get('sentiment_score', 0),
-                    'general_sentiment_score': general_sentiment.get('sentiment_score', 0),
-                    'overall_sentiment': (coin_sentiment.get('sentiment_score', 0) + 
-                                        general_sentiment.get('sentiment_score', 0)) / 2
-                }
+            if self.news_store is not None:
+                news_data = self._get_stored_news_data(coin_symbol)
+                logger.info(f"成功获取 {coin_symbol} 新闻数据（本地存储）")
+                return news_data
+            
+            with ThreadPoolExecutor(max_workers=1, thread_name_prefix="news") as executor:
+                # 币种相关新闻在后台线程中请求
+                coin_future = executor.submit(self.get_news_by_coin, coin_symbol, 15)
+                
+                # 市场整体新闻（各币种共享，通常已缓存）
+                general_news = self.get_shared_general_news(limit=10)
+                
+                coin_news = coin_future.result()
+            
+            news_data = self._build_news_data(coin_symbol, coin_news, general_news)
+            
+            logger.info(f"成功获取 {coin_symbol} 新闻数据")
+            return news_data
+            
+        except Exception as e:
+            logger.error(f"获取新闻数据失败: {e}")
+            return {}
+    
+    def _build_news_data(self, coin_symbol: str, coin_news: List[Dict[str, Any]], general_news: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """合并新闻与情绪分析结果"""
+        # 分析币种新闻情绪
+        coin_sentiment = self.analyze_news_sentiment(coin_news)
+        
+        # 分析一般新闻情绪
+        general_sentiment = self.analyze_news_sentiment(general_news)
+        
+        # 合并数据
+        return {
+            'symbol': coin_symbol,
+            'coin_news': coin_news,
+            'general_news': general_news,
+            'coin_sentiment': coin_sentiment,
+            'general_sentiment': general_sentiment,
+            'analysis_summary': {
+                'total_coin_news': len(coin_news),
+                'total_general_news': len(general_news),
+                'coin_sentiment_score': coin_sentiment.get('sentiment_score', 0),
+                'general_sentiment_score': general_sentiment.get('sentiment_score', 0),
+                'overall_sentiment': (coin_sentiment.get('sentiment_score', 0) +
+                                      general_sentiment.get('sentiment_score', 0)) / 2
             }
+        }
+    
+    async def aget_news_by_coin(self, coin_symbol: str, limit: int = 20) -> List[Dict[str, Any]]:
+        """获取特定币种的新闻（异步）"""
+        try:
+            url = f"{self.cryptopanic_base_url}/posts/"
+            status, data = await aget_json(url, self._coin_news_params(coin_symbol, limit))
+            
+            if status == 200:
+                news_list = self._parse_posts(data.get('results', []))
+                logger.info(f"成功获取 {coin_symbol} 相关新闻 {len(news_list)} 条")
+                return news_list
+            else:
+                logger.error(f"获取新闻失败: {status}")
+                return []
+                
+        except Exception as e:
+            logger.error(f"获取新闻异常: {e}")
+            return []
+    
+    async def aget_general_crypto_news(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """获取一般加密货币新闻（异步）"""
+        try:
+            url = f"{self.cryptopanic_base_url}/posts/"
+            status, data = await aget_json(url, self._general_news_params(limit))
+            
+            if status == 200:
+                news_list = self._parse_posts(data.get('results', []))
+                logger.info(f"成功获取一般加密货币新闻 {len(news_list)} 条")
+                return news_list
+            else:
+                logger.error(f"获取一般新闻失败: {status}")
+                return []
+                
+        except Exception as e:
+            logger.error(f"获取一般新闻异常: {e}")
+            return []
+    
+    async def aget_news_data(self, coin_symbol: str) -> Dict[str, Any]:
+        """获取完整的新闻数据（异步，币种新闻与共享的市场整体新闻并发获取；启用本地存储时在线程中查询本地）"""
+        try:
+            if self.news_store is not None:
+                news_data = await asyncio.to_thread(self._get_stored_news_data, coin_symbol)
+                logger.info(f"成功获取 {coin_symbol} 新闻数据（本地存储）")
+                return news_data
+            
+            coin_news, general_news = await asyncio.gather(
+                self.aget_news_by_coin(coin_symbol, limit=15),
+                self.aget_shared_general_news(limit=10)
+            )
+            
+            news_data = self._build_news_data(coin_symbol, coin_news, general_news)
             
             logger.info(f"成功获取 {coin_symbol} 新闻数据")
             return news_data
@@ -0,0 +1,386 @@
+"""
+新闻本地存储模块
+按 (发布时间, 帖子ID) 游标增量拉取 CryptoPanic 新闻，按帖子ID去重后写入本地SQLite（按币种与时间建索引）；
+游标只在向后翻页确实到达上次位置后才前移，翻页中断（请求失败或达到页数上限）时记录续拉进度，下次从中断的页继续，
+不会跳过未拉取的新闻。分析时只查询本地时间窗口内的新闻：已尝试拉取过的订阅（包括失败的）到期后在后台增量更新，
+新闻接口的延迟与故障不影响分析，历史新闻持续积累，可用于趋势分析
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from utils.config import Config
+from utils.singleflight import get_singleflight
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# 市场整体新闻（不按币种过滤）的订阅名
+GENERAL_FEED = "*"
+# 单次请求合并的币种数量（currencies 参数逗号分隔）
+CURRENCIES_PER_REQUEST = 50
+
+
+def parse_published_at(value: Optional[str]) -> Optional[float]:
+    """ISO 8601 发布时间 -> 时间戳（秒），无法解析时返回 None"""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return None
+
+
+class NewsStore:
+    """新闻本地存储（SQLite）"""
+
+    def __init__(self, fetch_page: Callable[[Dict[str, Any]], Optional[List[Dict[str, Any]]]],
+                 path: Optional[str] = None, poll_interval: Optional[float] = None, max_pages: Optional[int] = None):
+        """
+        Args:
+            fetch_page: 请求一页新闻，参数为查询参数（currencies、page），返回解析后的新闻列表，失败时返回 None
+            path: SQLite 文件路径
+            poll_interval: 同一订阅两次增量拉取的最小间隔（秒）
+            max_pages: 单次增量拉取的最大页数（首次拉取只取一页）
+        """
+        self.fetch_page = fetch_page
+        self.path = path or os.path.join(Config.CACHE_DIR, "news.sqlite3")
+        self.poll_interval = poll_interval if poll_interval is not None else Config.NEWS_POLL_INTERVAL
+        self.max_pages = max(1, max_pages if max_pages is not None else Config.NEWS_MAX_PAGES)
+        self._lock = threading.Lock()
+        self._conn = self._connect()
+        # 正在后台拉取的订阅
+        self._polling = set()
+        self.stats = {"polls": 0, "pages": 0, "inserted": 0, "duplicates": 0, "background_polls": 0}
+
+    def _connect(self) -> sqlite3.Connection:
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS news_posts (
+                id INTEGER PRIMARY KEY,
+                published_ts REAL NOT NULL,
+                item TEXT NOT NULL
+            )
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS news_post_currencies (
+                currency TEXT NOT NULL,
+                published_ts REAL NOT NULL,
+                post_id INTEGER NOT NULL,
+                PRIMARY KEY (currency, published_ts, post_id)
+            )
+        """)
+        # 订阅状态：position 为已完整拉取到的最新位置（从未成功拉取时为空），
+        # walk_* 为未完成的翻页（合并请求的币种、下一页页码、本次翻页看到的最新位置）
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS news_feeds (
+                feed TEXT PRIMARY KEY,
+                published_ts REAL,
+                post_id INTEGER,
+                polled_at REAL NOT NULL,
+                walk_key TEXT,
+                walk_page INTEGER,
+                walk_ts REAL,
+                walk_id INTEGER
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_news_posts_published ON news_posts (published_ts)")
+        conn.commit()
+        return conn
+
+    def _count(self, name: str, amount: int = 1):
+        with self._lock:
+            self.stats[name] += amount
+
+    def ingest(self, news_list: List[Dict[str, Any]]) -> int:
+        """写入新闻（按帖子ID去重，已存在的忽略），返回新增数量"""
+        rows, currency_rows = [], []
+        for item in news_list:
+            if item.get("id") is None:
+                continue
+            published_ts = parse_published_at(item.get("published_at")) or time.time()
+            rows.append((item["id"], published_ts, json.dumps(item, ensure_ascii=False)))
+            currency_rows.extend((code.upper(), published_ts, item["id"]) for code in item.get("currencies") or [] if code)
+        if not rows:
+            return 0
+
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.executemany("INSERT OR IGNORE INTO news_posts (id, published_ts, item) VALUES (?, ?, ?)", rows)
+            inserted = self._conn.total_changes - before
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO news_post_currencies (currency, published_ts, post_id) VALUES (?, ?, ?)",
+                currency_rows
+            )
+            self._conn.commit()
+            self.stats["inserted"] += inserted
+            self.stats["duplicates"] += len(rows) - inserted
+        return inserted
+
+    def feed_state(self, feed: str) -> Optional[Dict[str, Any]]:
+        """
+        订阅状态，从未尝试拉取时返回 None
+
+        Returns:
+            {"position": (发布时间, 帖子ID) 或 None（从未成功拉取）, "polled_at": 上次尝试时间,
+             "walk_key": 未完成翻页的合并币种（无则为 None）, "walk_page": 续拉页码, "walk_newest": 该翻页看到的最新位置}
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT published_ts, post_id, polled_at, walk_key, walk_page, walk_ts, walk_id FROM news_feeds WHERE feed = ?",
+                (feed,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            "position": (row[0], row[1]) if row[0] is not None else None,
+            "polled_at": row[2],
+            "walk_key": row[3],
+            "walk_page": row[4],
+            "walk_newest": (row[5], row[6]) if row[5] is not None else (0.0, 0),
+        }
+
+    def _ensure_rows(self, feeds: List[str], polled_at: float):
+        """（调用方持有锁）为订阅建立状态行并更新尝试时间"""
+        self._conn.executemany("INSERT OR IGNORE INTO news_feeds (feed, polled_at) VALUES (?, ?)",
+                               [(feed, polled_at) for feed in feeds])
+        self._conn.executemany("UPDATE news_feeds SET polled_at = ? WHERE feed = ?", [(polled_at, feed) for feed in feeds])
+
+    def _save_cursors(self, feeds: List[str], newest: Tuple[float, int]):
+        """翻页已到达上次位置：游标前移到 newest（不后退），清除续拉进度"""
+        with self._lock:
+            self._ensure_rows(feeds, time.time())
+            for feed in feeds:
+                row = self._conn.execute("SELECT published_ts, post_id FROM news_feeds WHERE feed = ?", (feed,)).fetchone()
+                position = max(newest, tuple(row)) if row[0] is not None else newest
+                self._conn.execute(
+                    "UPDATE news_feeds SET published_ts = ?, post_id = ?, walk_key = NULL, walk_page = NULL, "
+                    "walk_ts = NULL, walk_id = NULL WHERE feed = ?",
+                    (position[0], position[1], feed)
+                )
+            self._conn.commit()
+
+    def _save_walk(self, feeds: List[str], walk_key: str, next_page: int, newest: Tuple[float, int]):
+        """翻页中断：游标不动，记录下次续拉的页码（新帖子只会把旧帖子推向更后的页，从该页继续不会漏拉）"""
+        with self._lock:
+            self._ensure_rows(feeds, time.time())
+            self._conn.executemany(
+                "UPDATE news_feeds SET walk_key = ?, walk_page = ?, walk_ts = ?, walk_id = ? WHERE feed = ?",
+                [(walk_key, next_page, newest[0], newest[1], feed) for feed in feeds]
+            )
+            self._conn.commit()
+
+    def _mark_attempt(self, feeds: List[str]):
+        """首次拉取失败：记录尝试时间（位置为空），拉取间隔内不再同步重试"""
+        with self._lock:
+            self._ensure_rows(feeds, time.time())
+            self._conn.commit()
+
+    @staticmethod
+    def _params(feeds: List[str], page: int) -> Dict[str, Any]:
+        params: Dict[str, Any] = {} if feeds == [GENERAL_FEED] else {"currencies": ",".join(feeds)}
+        return {**params, "page": page}
+
+    @staticmethod
+    def _positions(news_list: List[Dict[str, Any]]) -> List[Tuple[float, int]]:
+        return [(parse_published_at(item.get("published_at")) or 0.0, item.get("id") or 0) for item in news_list]
+
+    def _poll_initial(self, feeds: List[str]) -> int:
+        """从未成功拉取过的订阅：只取第一页作为起点（不回补更早的历史）"""
+        self._count("polls")
+        news_list = self.fetch_page(self._params(feeds, 1))
+        if news_list is None:
+            self._mark_attempt(feeds)
+            return 0
+        self._count("pages")
+        inserted = self.ingest(news_list)
+        self._save_cursors(feeds, max(self._positions(news_list), default=(0.0, 0)))
+        return inserted
+
+    def _walk(self, feeds: List[str], start_page: int = 1, newest: Tuple[float, int] = (0.0, 0)) -> int:
+        """
+        增量翻页（已有游标的订阅，合并为一个请求序列）：从 start_page 向后翻页，直到遇到所有订阅游标中最旧的位置
+        或到达末页时游标才前移；请求失败或达到 NEWS_MAX_PAGES 时记录续拉进度，返回新增数量
+        """
+        states = [self.feed_state(feed) for feed in feeds]
+        floor = min(state["position"] for state in states)
+        walk_key = ",".join(feeds)
+        inserted = 0
+        self._count("polls")
+
+        for page in range(start_page, start_page + self.max_pages):
+            news_list = self.fetch_page(self._params(feeds, page))
+            if news_list is None:
+                self._save_walk(feeds, walk_key, page, newest)
+                return inserted
+            self._count("pages")
+            inserted += self.ingest(news_list)
+            positions = self._positions(news_list)
+            newest = max([newest] + positions)
+            if not news_list or min(positions) <= floor:
+                self._save_cursors(feeds, newest)
+                return inserted
+
+        self._save_walk(feeds, walk_key, start_page + self.max_pages, newest)
+        return inserted
+
+    def _resume(self, walk_key: str) -> int:
+        """继续未完成的翻页（使用中断时相同的合并币种，页码才有效）"""
+        feeds = walk_key.split(",")
+        states = [self.feed_state(feed) for feed in feeds]
+        if any(state is None or state["walk_key"] != walk_key or state["position"] is None for state in states):
+            # 状态已被其他拉取更新
+            return 0
+        return self._walk(feeds, states[0]["walk_page"], states[0]["walk_newest"])
+
+    def poll(self, currencies: Optional[List[str]] = None) -> int:
+        """
+        增量拉取（同步）
+
+        从未成功拉取的订阅、已有游标的订阅与有未完成翻页的订阅分开请求：前两类每 CURRENCIES_PER_REQUEST 个币种
+        合并为一个请求，未完成的翻页按中断时的合并币种继续
+
+        Args:
+            currencies: 币种代码列表；为空时拉取市场整体新闻
+
+        Returns:
+            新增新闻数量
+        """
+        feeds = list(dict.fromkeys(code.upper() for code in currencies)) if currencies else [GENERAL_FEED]
+        initial, current, walks = [], [], []
+        for feed in feeds:
+            state = self.feed_state(feed)
+            if state is None or state["position"] is None:
+                initial.append(feed)
+            elif state["walk_key"]:
+                walks.append(state["walk_key"])
+            else:
+                current.append(feed)
+
+        # 并发的同一组拉取合并为一次
+        flight = get_singleflight("news_poll")
+        inserted = 0
+        for walk_key in dict.fromkeys(walks):
+            inserted += flight.do(f"resume:{walk_key}", lambda walk_key=walk_key: self._resume(walk_key))
+        for start in range(0, len(initial), CURRENCIES_PER_REQUEST):
+            chunk = initial[start:start + CURRENCIES_PER_REQUEST]
+            inserted += flight.do(f"initial:{','.join(chunk)}", lambda chunk=chunk: self._poll_initial(chunk))
+        for start in range(0, len(current), CURRENCIES_PER_REQUEST):
+            chunk = current[start:start + CURRENCIES_PER_REQUEST]
+            inserted += flight.do(f"walk:{','.join(chunk)}", lambda chunk=chunk: self._walk(chunk))
+        return inserted
+
+    def poll_later(self, feeds: List[str]):
+        """在后台线程中增量拉取（同一订阅同时只拉取一次）"""
+        with self._lock:
+            pending = [feed for feed in feeds if feed not in self._polling]
+            self._polling.update(pending)
+        if not pending:
+            return
+        self._count("background_polls")
+
+        def run():
+            try:
+                self.poll(None if pending == [GENERAL_FEED] else pending)
+            except Exception as e:
+                logger.warning(f"后台拉取新闻失败: {e}")
+            finally:
+                with self._lock:
+                    self._polling.difference_update(pending)
+
+        threading.Thread(target=run, name="news-poll", daemon=True).start()
+
+    def ensure(self, currency: Optional[str] = None):
+        """
+        确保订阅可查询：从未尝试拉取过时同步拉取一次（首页）；之后（包括首次拉取失败后）只在超过拉取间隔时
+        在后台拉取，分析始终直接查询本地
+        """
+        feed = currency.upper() if currency else GENERAL_FEED
+        state = self.feed_state(feed)
+        if state is None:
+            self.poll([feed] if currency else None)
+        elif time.time() - state["polled_at"] >= self.poll_interval:
+            self.poll_later([feed])
+
+    def query(self, currency: Optional[str] = None, since: Optional[float] = None, limit: int = 20) -> List[Dict[str, Any]]:
+        """
+        查询本地新闻，按发布时间从新到旧
+
+        Args:
+            currency: 币种代码；为空时查询全部新闻
+            since: 起始时间戳（秒），为空时不限
+            limit: 最大条数
+        """
+        since = since if since is not None else 0.0
+        with self._lock:
+            if currency:
+                rows = self._conn.execute(
+                    "SELECT p.item FROM news_post_currencies c JOIN news_posts p ON p.id = c.post_id "
+                    "WHERE c.currency = ? AND c.published_ts >= ? ORDER BY c.published_ts DESC, c.post_id DESC LIMIT ?",
+                    (currency.upper(), since, limit)
+                ).fetchall()
+            else:
+                rows = self._conn.execute(
+                    "SELECT item FROM news_posts WHERE published_ts >= ? ORDER BY published_ts DESC, id DESC LIMIT ?",
+                    (since, limit)
+                ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM news_posts").fetchone()[0]
+
+
+if __name__ == "__main__":
+    # 独立测试（使用模拟数据，不访问网络）
+    import tempfile
+    from datetime import timezone
+
+    def make_post(post_id: int) -> Dict[str, Any]:
+        return {"id": post_id, "title": f"News {post_id}", "currencies": ["BTC"],
+                "published_at": datetime.fromtimestamp(1735689600 + post_id * 60, timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")}
+
+    feed = [make_post(post_id) for post_id in range(100, 106)]
+    failing_pages = set()
+    requests_made = []
+
+    def fake_fetch(params):
+        requests_made.append(params["page"])
+        if params["page"] in failing_pages:
+            return None
+        newest_first = sorted(feed, key=lambda item: item["id"], reverse=True)
+        return newest_first[(params["page"] - 1) * 3:params["page"] * 3]
+
+    store = NewsStore(fake_fetch, path=os.path.join(tempfile.mkdtemp(), "news.sqlite3"), poll_interval=0, max_pages=5)
+    print(f"首次拉取: 新增 {store.poll(['BTC'])} 条（只取首页），游标 {store.feed_state('BTC')['position'][1]}")
+
+    feed.extend(make_post(post_id) for post_id in range(106, 114))
+    failing_pages.add(2)
+    requests_made.clear()
+    print(f"第2页失败: 新增 {store.poll(['BTC'])} 条，请求页 {requests_made}，"
+          f"游标仍为 {store.feed_state('BTC')['position'][1]}，下次从第 {store.feed_state('BTC')['walk_page']} 页继续")
+
+    failing_pages.clear()
+    requests_made.clear()
+    print(f"续拉: 新增 {store.poll(['BTC'])} 条，请求页 {requests_made}，游标 {store.feed_state('BTC')['position'][1]}")
+    stored = sorted(item["id"] for item in store.query("BTC", limit=100))
+    print(f"本地新闻连续无缺口: {stored == list(range(stored[0], 114))}（{stored[0]}~{stored[-1]}）")
+
+    feed.extend(make_post(post_id) for post_id in range(114, 124))
+    limited = NewsStore(fake_fetch, path=store.path, poll_interval=0, max_pages=2)
+    print(f"达到页数上限: 新增 {limited.poll(['BTC'])} 条，游标仍为 {limited.feed_state('BTC')['position'][1]}，"
+          f"续拉后新增 {limited.poll(['BTC'])} 条，游标 {limited.feed_state('BTC')['position'][1]}")
+
+    offline = NewsStore(lambda params: None, path=os.path.join(tempfile.mkdtemp(), "news.sqlite3"), poll_interval=60)
+    offline.ensure("ETH")
+    offline.ensure("ETH")
+    print(f"首次拉取失败后拉取间隔内不再同步重试: 请求 {offline.stats['polls']} 次")
+    print("测试完成！")
@@ -0,0 +1,201 @@
+"""
+OHLCV本地存储模块
+按 (交易所, 交易对, 周期) 将K线保存为列式 npz 文件，增量获取最新K线并修补缺口
+"""
+
+import os
+import threading
+import time
+from typing import Dict, Optional, Tuple
+import numpy as np
+import pandas as pd
+from utils.config import Config
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class OHLCVStore:
+    """本地K线存储"""
+
+    # 单次请求的最大K线数量（多数交易所上限为 500~1000）
+    FETCH_LIMIT = 1000
+
+    def __init__(self, exchange, root: Optional[str] = None, max_candles: Optional[int] = None):
+        self.exchange = exchange
+        self.exchange_id = getattr(exchange, "id", "exchange")
+        self.root = root or os.path.join(Config.CACHE_DIR, "ohlcv")
+        self.max_candles = max_candles or Config.OHLCV_STORE_MAX_CANDLES
+        self._locks: Dict[Tuple[str, str], threading.Lock] = {}
+        self._locks_lock = threading.Lock()
+        # 已尝试修补过的缺口 (交易对, 周期, 缺口起点)
+        self._attempted_gaps = set()
+        self.stats = {"full_fetches": 0, "incremental_fetches": 0, "gap_repairs": 0, "candles_fetched": 0}
+
+    def _count(self, name: str, amount: int = 1):
+        with self._locks_lock:
+            self.stats[name] += amount
+
+    def _lock_for(self, symbol: str, timeframe: str) -> threading.Lock:
+        with self._locks_lock:
+            return self._locks.setdefault((symbol, timeframe), threading.Lock())
+
+    def path(self, symbol: str, timeframe: str) -> str:
+        """存储文件路径：<root>/<交易所>/<交易对>/<周期>.npz"""
+        safe_symbol = symbol.replace("/", "_").replace(":", "_")
+        return os.path.join(self.root, self.exchange_id, safe_symbol, f"{timeframe}.npz")
+
+    def load(self, symbol: str, timeframe: str) -> Tuple[np.ndarray, np.ndarray]:
+        """读取本地K线，返回 (时间戳[int64 毫秒], OHLCV[float64, n×5])"""
+        path = self.path(symbol, timeframe)
+        if not os.path.exists(path):
+            return np.empty(0, dtype=np.int64), np.empty((0, 5), dtype=np.float64)
+
+        try:
+            with np.load(path) as data:
+                return data["timestamp"], data["ohlcv"]
+        except Exception as e:
+            logger.warning(f"读取本地K线失败，将重新下载: {path}: {e}")
+            return np.empty(0, dtype=np.int64), np.empty((0, 5), dtype=np.float64)
+
+    def save(self, symbol: str, timeframe: str, timestamps: np.ndarray, ohlcv: np.ndarray):
+        """原子写入本地K线（先写临时文件再替换）"""
+        path = self.path(symbol, timeframe)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, timestamp=timestamps, ohlcv=ohlcv)
+        os.replace(tmp_path, path)
+
+    def _timeframe_ms(self, timeframe: str) -> int:
+        return int(self.exchange.parse_timeframe(timeframe) * 1000)
+
+    def _fetch(self, symbol: str, timeframe: str, since: Optional[int], limit: int) -> Tuple[np.ndarray, np.ndarray]:
+        """请求交易所K线并转换为数组"""
+        rows = self.exchange.fetch_ohlcv(symbol, timeframe, since=since, limit=limit)
+        self._count("candles_fetched", len(rows))
+        if not rows:
+            return np.empty(0, dtype=np.int64), np.empty((0, 5), dtype=np.float64)
+
+        data = np.asarray(rows, dtype=np.float64)
+        return data[:, 0].astype(np.int64), data[:, 1:6]
+
+    @staticmethod
+    def _merge(timestamps: np.ndarray, ohlcv: np.ndarray,
+               new_timestamps: np.ndarray, new_ohlcv: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """合并K线：按时间排序，相同时间戳以新数据为准（最后一根K线可能尚未收盘）"""
+        if len(new_timestamps) == 0:
+            return timestamps, ohlcv
+
+        all_timestamps = np.concatenate([timestamps, new_timestamps])
+        all_ohlcv = np.concatenate([ohlcv, new_ohlcv])
+        # 倒序后取首次出现的位置，即保留后加入的数据
+        reversed_timestamps = all_timestamps[::-1]
+        _, first_index = np.unique(reversed_timestamps, return_index=True)
+        keep = len(all_timestamps) - 1 - first_index
+        return all_timestamps[keep], all_ohlcv[keep]
+
+    def _fetch_forward(self, symbol: str, timeframe: str, since: int, timeframe_ms: int,
+                       timestamps: np.ndarray, ohlcv: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """从 since 开始向后分页获取，直到当前时间"""
+        now = self.exchange.milliseconds() if hasattr(self.exchange, "milliseconds") else int(time.time() * 1000)
+        while True:
+            new_timestamps, new_ohlcv = self._fetch(symbol, timeframe, since, self.FETCH_LIMIT)
+            timestamps, ohlcv = self._merge(timestamps, ohlcv, new_timestamps, new_ohlcv)
+            if len(new_timestamps) < self.FETCH_LIMIT or new_timestamps[-1] + timeframe_ms > now:
+                return timestamps, ohlcv
+            since = int(new_timestamps[-1]) + timeframe_ms
+
+    def _repair_gaps(self, symbol: str, timeframe: str, timeframe_ms: int, window: int,
+                     timestamps: np.ndarray, ohlcv: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """补齐最近 window 根K线内的缺口（同一进程内每个缺口只尝试一次，交易所本身缺失的数据不会反复请求）"""
+        recent = timestamps[-window:]
+        gaps = np.nonzero(np.diff(recent) > timeframe_ms)[0]
+        for index in gaps:
+            gap_start = int(recent[index]) + timeframe_ms
+            if (symbol, timeframe, gap_start) in self._attempted_gaps:
+                continue
+            self._attempted_gaps.add((symbol, timeframe, gap_start))
+            missing = int((recent[index + 1] - recent[index]) // timeframe_ms) - 1
+            new_timestamps, new_ohlcv = self._fetch(symbol, timeframe, gap_start, min(missing, self.FETCH_LIMIT))
+            timestamps, ohlcv = self._merge(timestamps, ohlcv, new_timestamps, new_ohlcv)
+            self._count("gap_repairs")
+            logger.info(f"修补 {symbol} {timeframe} K线缺口: {missing} 根，获取 {len(new_timestamps)} 根")
+        return timestamps, ohlcv
+
+    def update(self, symbol: str, timeframe: str, limit: int) -> Tuple[np.ndarray, np.ndarray]:
+        """同步本地K线至最新：有历史时只请求最后一根之后的K线，否则全量获取 limit 根"""
+        with self._lock_for(symbol, timeframe):
+            timestamps, ohlcv = self.load(symbol, timeframe)
+            timeframe_ms = self._timeframe_ms(timeframe)
+            now = int(time.time() * 1000)
+
+            if len(timestamps) and now - timestamps[-1] <= limit * timeframe_ms:
+                # 从最后一根（可能未收盘）K线开始增量获取
+                timestamps, ohlcv = self._fetch_forward(symbol, timeframe, int(timestamps[-1]), timeframe_ms, timestamps, ohlcv)
+                self._count("incremental_fetches")
+            else:
+                new_timestamps, new_ohlcv = self._fetch(symbol, timeframe, None, limit)
+                timestamps, ohlcv = self._merge(timestamps, ohlcv, new_timestamps, new_ohlcv)
+                self._count("full_fetches")
+
+            timestamps, ohlcv = self._repair_gaps(symbol, timeframe, timeframe_ms, limit, timestamps, ohlcv)
+
+            keep = max(self.max_candles, limit)
+            timestamps, ohlcv = timestamps[-keep:], ohlcv[-keep:]
+            self.save(symbol, timeframe, timestamps, ohlcv)
+            return timestamps, ohlcv
+
+    def get_ohlcv(self, symbol: str, timeframe: str = "1h", limit: int = 100) -> pd.DataFrame:
+        """获取最近 limit 根K线（与 MarketDataProvider.get_ohlcv 返回格式一致）；交易所请求失败时返回本地已有数据"""
+        try:
+            timestamps, ohlcv = self.update(symbol, timeframe, limit)
+        except Exception as e:
+            timestamps, ohlcv = self.load(symbol, timeframe)
+            if not len(timestamps):
+                raise
+            logger.warning(f"更新 {symbol} {timeframe} K线失败，使用本地数据: {e}")
+        df = pd.DataFrame(ohlcv[-limit:], columns=['open', 'high', 'low', 'close', 'volume'])
+        df.insert(0, 'timestamp', pd.to_datetime(timestamps[-limit:], unit='ms'))
+        df.set_index('timestamp', inplace=True)
+        return df
+
+
+if __name__ == "__main__":
+    # 独立测试（使用模拟交易所，不访问网络）
+    import tempfile
+    import ccxt
+
+    class FakeExchange:
+        id = "fake"
+        parse_timeframe = staticmethod(ccxt.Exchange.parse_timeframe)
+
+        def __init__(self):
+            self.requests = []
+
+        def milliseconds(self):
+            return int(time.time() * 1000)
+
+        def fetch_ohlcv(self, symbol, timeframe, since=None, limit=100):
+            self.requests.append((since, limit))
+            step = 3600 * 1000
+            end = self.milliseconds() // step * step
+            start = since if since is not None else end - (limit - 1) * step
+            return [[t, 100.0, 101.0, 99.0, 100.5, 10.0] for t in range(start, end + 1, step)][:limit]
+
+    exchange = FakeExchange()
+    store = OHLCVStore(exchange, root=tempfile.mkdtemp(), max_candles=500)
+
+    df = store.get_ohlcv("BTC/USDT", "1h", 100)
+    print(f"首次获取: {len(df)} 根，请求 {exchange.requests[-1]}")
+
+    df = store.get_ohlcv("BTC/USDT", "1h", 100)
+    print(f"增量获取: {len(df)} 根，请求 since={exchange.requests[-1][0]}（= 最后一根时间戳）")
+
+    # 人为制造缺口
+    timestamps, ohlcv = store.load("BTC/USDT", "1h")
+    store.save("BTC/USDT", "1h", np.delete(timestamps, [50, 51, 52]), np.delete(ohlcv, [50, 51, 52], axis=0))
+    df = store.get_ohlcv("BTC/USDT", "1h", 100)
+    print(f"修补缺口后: {len(df)} 根，时间连续: {bool((df.index.to_series().diff().dropna() == pd.Timedelta('1h')).all())}")
+    print(f"统计: {store.stats}")
+    print("测试完成！")
@@ -3,10 +3,11 @@
 获取Reddit等社交媒体情绪数据
 """
 
-import requests
 import time
+import asyncio
 from typing import Dict, Any, List, Optional
 from utils.config import Config
+from utils.http_client import get_http_session, aget_json
 from utils.logger import get_logger
 
 logger = get_logger(__name__)
@@ -17,45 +18,62 @@ class SocialDataProvider:
     
     def __init__(self):
         self.reddit_base_url = "https://www.reddit.com"
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Crypto-Agent/1.0 (by /u/crypto_agent_bot)'
-        })
+        self.user_agent = 'Crypto-Agent/1.0 (by /u/crypto_agent_bot)'
+        # 共享连接池会话（批量模式下所有币种复用）
+        self.session = get_http_session(self.user_agent)
+    
+    # 加密货币相关subreddit
+    crypto_subreddits = [
+        'cryptocurrency',
+        'bitcoin',
+        'cryptomarkets',
+        'altcoin',
+        'cryptotrading'
+    ]
+    
+    def _reddit_search_params(self, coin_symbol: str, limit: int) -> Dict[str, Any]:
+        """Reddit搜索请求参数"""
+        return {
+            'q': coin_symbol,
+            'restrict_sr': 'true',
+            'sort': 'hot',
+            't': 'day',
+            'limit': limit
+        }
+    
+    def _parse_reddit_posts(self, data: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """解析Reddit搜索结果"""
+        posts = data.get('data', {}).get('children', [])
+        
+        reddit_posts = []
+        for post in posts:
+            post_data = post.get('data', {})
+            reddit_post = {
+                'id': post_data.get('id'),
+                'title': post_data.get('title'),
+                'url': f"https://reddit.com{post_data.get('permalink', '')}",
+                'score': post_data.get('score', 0),
+                'upvote_ratio': post_data.get('upvote_ratio', 0),
+                'num_comments': post_data.get('num_comments', 0),
+                'created_utc': post_data.get('created_utc'),
+                'subreddit': post_data.get('subreddit'),
+                'author': post_data.get('author'),
+                'selftext': post_data.get('selftext', '')[:500]  # 限制长度
+            }
+            reddit_posts.append(reddit_post)
+        return reddit_posts
     
     def get_reddit_posts(self, subreddit: str, coin_symbol: str, limit: int = 20) -> List[Dict[str, Any]]:
         """获取Reddit帖子"""
         try:
             url = f"{self.reddit_base_url}/r/{subreddit}/search.json"
-            params = {
-                'q': coin_symbol,
-                'restrict_sr': 'true',
-                'sort': 'hot',
-                't': 'day',
-                'limit': limit
-            }
+            params = self._reddit_search_params(coin_symbol, limit)
             
             response = self.session.get(url, params=params)
             
             if response.status_code == 200:
                 data = response.json()
-                posts = data.get('data', {}).get('children', [])
-                
-                reddit_posts = []
-                for post in posts:
-                    post_data = post.get('data', {})
-                    reddit_post = {
-                        'id': post_data.get('id'),
-                        'title': post_data.get('title'),
-                        'url': f"https://reddit.com{post_data.get('permalink', '')}",
-                        'score': post_data.get('score', 0),
-                        'upvote_ratio': post_data.get('upvote_ratio', 0),
-                        'num_comments': post_data.get('num_comments', 0),
-                        'created_utc': post_data.get('created_utc'),
-                        'subreddit': post_data.get('subreddit'),
-                        'author': post_data.get('author'),
-                        'selftext': post_data.get('selftext', '')[:500]  # 限制长度
-                    }
-                    reddit_posts.append(reddit_post)
+                reddit_posts = self._parse_reddit_posts(data)
                 
                 logger.info(f"成功获取 r/{subreddit} 中 {coin_symbol} 相关帖子 {len(reddit_posts)} 条")
                 return reddit_posts
@@ -69,16 +87,8 @@ class SocialDataProvider:
     
     def get_crypto_subreddits_posts(self, coin_symbol: str) -> List[Dict[str, Any]]:
         """获取多个加密货币相关subreddit的帖子"""
-        crypto_subreddits = [
-            'cryptocurrency',
-            'bitcoin',
-            'cryptomarkets',
-            'altcoin',
-            'cryptotrading'
-        ]
-        
         all_posts = []
-        for subreddit in crypto_subreddits:
+        for subreddit in self.crypto_subreddits:
             try:
                 posts = self.get_reddit_posts(subreddit, coin_symbol, limit=10)
                 all_posts.extend(posts)
@@ -178,28 +188,73 @@ class SocialDataProvider:
             # 获取Reddit帖子
             reddit_posts = self.get_crypto_subreddits_posts(coin_symbol)
             
-            # 分析社交情绪
-            sentiment_analysis = self.analyze_social_sentiment(reddit_posts)
-            
-            # 计算热度指标
-            total_score = sum(post.get('score', 0) for post in reddit_posts)
-            total_comments = sum(post.get('num_comments', 0) for post in reddit_posts)
-            
-            # 合并数据
-            social_data = {
-                'symbol': coin_symbol,
-                'reddit_posts': reddit_posts,
-                'sentiment_analysis': sentiment_analysis,
-                'analysis_summary': {
-                    'total_posts': len(reddit_posts),
-                    'total_score': total_score,
-                    'total_comments': total_comments,
-                    'sentiment_score': sentiment_analysis.get('sentiment_score', 0),
-                    'avg_score': sentiment_analysis.get('avg_score', 0),
-                    'avg_upvote_ratio': sentiment_analysis.get('avg_upvote_ratio', 0),
-                    'engagement_rate': total_comments / len(reddit_posts) if reddit_posts else 0
-                }
+            social_data = self._build_social_data(coin_symbol, reddit_posts)
+            
+            logger.info(f"成功获取 {coin_symbol} 社交数据")
+            return social_data
+            
+        except Exception as e:
+            logger.error(f"获取社交数据失败: {e}")
+            return {}
+    
+    def _build_social_data(self, coin_symbol: str, reddit_posts: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """合并帖子、情绪与热度指标"""
+        # 分析社交情绪
+        sentiment_analysis = self.analyze_social_sentiment(reddit_posts)
+        
+        # 计算热度指标
+        total_score = sum(post.get('score', 0) for post in reddit_posts)
+        total_comments = sum(post.get('num_comments', 0) for post in reddit_posts)
+        
+        # 合并数据
+        return {
+            'symbol': coin_symbol,
+            'reddit_posts': reddit_posts,
+            'sentiment_analysis': sentiment_analysis,
+            'analysis_summary': {
+                'total_posts': len(reddit_posts),
+                'total_score': total_score,
+                'total_comments': total_comments,
+                'sentiment_score': sentiment_analysis.get('sentiment_score', 0),
+                'avg_score': sentiment_analysis.get('avg_score', 0),
+                'avg_upvote_ratio': sentiment_analysis.get('avg_upvote_ratio', 0),
+                'engagement_rate': total_comments / len(reddit_posts) if reddit_posts else 0
             }
+        }
+    
+    async def aget_reddit_posts(self, subreddit: str, coin_symbol: str, limit: int = 20) -> List[Dict[str, Any]]:
+        """获取Reddit帖子（异步）"""
+        try:
+            url = f"{self.reddit_base_url}/r/{subreddit}/search.json"
+            status, data = await aget_json(url, self._reddit_search_params(coin_symbol, limit), user_agent=self.user_agent)
+            
+            if status == 200:
+                reddit_posts = self._parse_reddit_posts(data)
+                logger.info(f"成功获取 r/{subreddit} 中 {coin_symbol} 相关帖子 {len(reddit_posts)} 条")
+                return reddit_posts
+            else:
+                logger.error(f"获取Reddit帖子失败: {status}")
+                return []
+                
+        except Exception as e:
+            logger.error(f"获取Reddit帖子异常: {e}")
+            return []
+    
+    async def aget_crypto_subreddits_posts(self, coin_symbol: str) -> List[Dict[str, Any]]:
+        """获取多个加密货币相关subreddit的帖子（异步，保持请求间隔，不阻塞事件循环）"""
+        all_posts = []
+        for index, subreddit in enumerate(self.crypto_subreddits):
+            if index:
+                await asyncio.sleep(1)  # 避免请求过快
+            all_posts.extend(await self.aget_reddit_posts(subreddit, coin_symbol, limit=10))
+        
+        return all_posts
+    
+    async def aget_social_data(self, coin_symbol: str) -> Dict[str, Any]:
+        """获取完整的社交数据（异步）"""
+        try:
+            reddit_posts = await self.aget_crypto_subreddits_posts(coin_symbol)
+            social_data = self._build_social_data(coin_symbol, reddit_posts)
             
             logger.info(f"成功获取 {coin_symbol} 社交数据")
             return social_data
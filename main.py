@@ -1,55 +1,150 @@
 """
 AI加密货币多智能体专家系统 - 主入口
 串联所有智能体完成完整的加密货币分析流程
+智能体模块及其依赖（ccxt、openai、pandas 等）在首次使用时才导入，--help 与 --dry-run 无需加载
 """
 
 import sys
 import os
 import json
-import pandas as pd
-from typing import Dict, Any
+import time
+import asyncio
+import argparse
+import importlib
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Any, AsyncIterator, Iterator, List, Optional
 from utils.state import AgentState
 from utils.config import Config
 from utils.logger import get_logger
-
-# 导入智能体
-from agents.analysts.market_analyst import MarketAnalyst
-from agents.analysts.fundamentals_analyst import FundamentalsAnalyst
-from agents.analysts.news_analyst import NewsAnalyst
-from agents.analysts.social_media_analyst import SocialMediaAnalyst
-from agents.researchers.bull_researcher import BullResearcher
-from agents.researchers.bear_researcher import BearResearcher
-from agents.managers.research_manager import ResearchManager
-from agents.managers.risk_manager import RiskManager
-from agents.trader.trader import Trader
+from utils.scheduler import DAGScheduler
+from utils.llm_gateway import get_llm_gateway
+from utils.llm_cache import get_llm_cache
+from utils.singleflight import get_singleflight_stats
 
 logger = get_logger(__name__)
 
+# 流水线智能体（名称, 模块, 类名）；模块在首次使用时才导入，执行顺序由各智能体的 reads / writes 声明推导
+PIPELINE_AGENTS = [
+    ("Market Analyst", "agents.analysts.market_analyst", "MarketAnalyst"),
+    ("Fundamentals Analyst", "agents.analysts.fundamentals_analyst", "FundamentalsAnalyst"),
+    ("News Analyst", "agents.analysts.news_analyst", "NewsAnalyst"),
+    ("Social Media Analyst", "agents.analysts.social_media_analyst", "SocialMediaAnalyst"),
+    ("Bull Researcher", "agents.researchers.bull_researcher", "BullResearcher"),
+    ("Bear Researcher", "agents.researchers.bear_researcher", "BearResearcher"),
+    ("Research Manager", "agents.managers.research_manager", "ResearchManager"),
+    ("Trader", "agents.trader.trader", "Trader"),
+    ("Risk Manager", "agents.managers.risk_manager", "RiskManager")
+]
+PIPELINE_AGENT_NAMES = [name for name, _, _ in PIPELINE_AGENTS]
+
+
+def load_agent_class(name: str) -> type:
+    """按名称导入流水线智能体类"""
+    for agent_name, module_path, class_name in PIPELINE_AGENTS:
+        if agent_name == name:
+            return getattr(importlib.import_module(module_path), class_name)
+    raise KeyError(f"未知的智能体: {name}")
+
+
+def pipeline_stage_names(only: Optional[str] = None) -> List[str]:
+    """
+    需要执行的流水线节点（保持 PIPELINE_AGENTS 顺序）
+    
+    Args:
+        only: 只运行该节点及其上游依赖；为空时运行全部节点
+    """
+    if only is None:
+        return list(PIPELINE_AGENT_NAMES)
+    required = build_pipeline_scheduler().upstream(only)
+    return [name for name in PIPELINE_AGENT_NAMES if name in required]
+
+
+def build_pipeline_scheduler(agents: Optional[List[Any]] = None, names: Optional[List[str]] = None) -> DAGScheduler:
+    """
+    构建流水线调度器
+    
+    Args:
+        agents: 智能体实例列表；为空时使用 PIPELINE_AGENTS 中的类（只导入不实例化），仅用于 dry-run 规划
+        names: 使用类规划时只包含这些节点，默认全部
+    """
+    scheduler = DAGScheduler(max_workers=Config.PIPELINE_MAX_WORKERS)
+    
+    if agents is None:
+        for name in names or PIPELINE_AGENT_NAMES:
+            scheduler.add_agent(load_agent_class(name), name)
+    else:
+        for agent in agents:
+            scheduler.add_agent(agent)
+    
+    scheduler.build_graph()
+    return scheduler
+
 
 class CryptoAgentSystem:
     """加密货币多智能体专家系统"""
     
-    def __init__(self):
-        self.analysts = [
-            MarketAnalyst("Market Analyst"),
-            FundamentalsAnalyst("Fundamentals Analyst"),
-            NewsAnalyst("News Analyst"),
-            SocialMediaAnalyst("Social Media Analyst")
-        ]
-        
-        self.researchers = [
-            BullResearcher("Bull Researcher"),
-            BearResearcher("Bear Researcher")
-        ]
+    def __init__(self, only: Optional[str] = None):
+        """
+        Args:
+            only: 只运行该节点及其上游依赖（如 "Market Analyst"），默认运行完整流水线
+        """
+        self.only = only
+        self.stage_names = pipeline_stage_names(only)
         
-        self.managers = [
-            ResearchManager("Research Manager")
-        ]
+        # 智能体在首次使用时创建（名称 -> 实例）
+        self._agents: Dict[str, Any] = {}
+        self._agents_lock = threading.Lock()
         
-        self.trader = Trader("Trader")
-        self.risk_manager = RiskManager("Risk Manager")
+        # 批量结果文件写入锁
+        self._batch_output_lock = threading.Lock()
+    
+    def get_agent(self, name: str) -> Any:
+        """获取智能体，首次使用时导入模块并创建实例（批量模式下各线程共享同一实例）"""
+        with self._agents_lock:
+            agent = self._agents.get(name)
+            if agent is None:
+                agent = load_agent_class(name)(name)
+                self._agents[name] = agent
+            return agent
     
-    def run_analysis(self, symbol: str) -> Dict[str, Any]:
+    @property
+    def analysts(self) -> List[Any]:
+        return [self.get_agent(name) for name in PIPELINE_AGENT_NAMES[:4]]
+    
+    @property
+    def researchers(self) -> List[Any]:
+        return [self.get_agent("Bull Researcher"), self.get_agent("Bear Researcher")]
+    
+    @property
+    def managers(self) -> List[Any]:
+        return [self.get_agent("Research Manager")]
+    
+    @property
+    def trader(self) -> Any:
+        return self.get_agent("Trader")
+    
+    @property
+    def risk_manager(self) -> Any:
+        return self.get_agent("Risk Manager")
+    
+    @property
+    def loaded_agent_names(self) -> List[str]:
+        """已创建的智能体名称"""
+        with self._agents_lock:
+            return sorted(self._agents)
+    
+    @property
+    def agents(self) -> List[Any]:
+        """流水线中需要执行的全部智能体"""
+        return [self.get_agent(name) for name in self.stage_names]
+    
+    def build_scheduler(self) -> DAGScheduler:
+        """根据智能体的读写声明构建调度图"""
+        return build_pipeline_scheduler(self.agents)
+    
+    def run_analysis(self, symbol: str, save: bool = True) -> Dict[str, Any]:
         """运行完整的分析流程"""
         try:
             logger.info(f"开始分析 {symbol}")
@@ -57,61 +152,191 @@ class CryptoAgentSystem:
             # 创建初始状态
             state = AgentState(symbol)
             
-            # 阶段1：分析师团队并行分析
-            logger.info("=== 阶段1：分析师团队分析 ===")
-            for analyst in self.analysts:
-                try:
-                    logger.info(f"执行 {analyst.name} 分析")
-                    state = analyst.process(state)
-                except Exception as e:
-                    logger.error(f"{analyst.name} 分析失败: {e}")
+            # 按依赖图执行：分析师并行 → 看涨/看跌研究员并行 → 研究经理 → 交易员 → 风险经理
+            scheduler = self.build_scheduler()
+            logger.info(f"关键路径: {' → '.join(scheduler.plan()['critical_path'])}")
+            state = scheduler.run(state)
             
-            # 阶段2：研究员辩论
-            logger.info("=== 阶段2：研究员辩论 ===")
-            for researcher in self.researchers:
-                try:
-                    logger.info(f"执行 {researcher.name} 分析")
-                    state = researcher.process(state)
-                except Exception as e:
-                    logger.error(f"{researcher.name} 分析失败: {e}")
+            # 生成最终输出
+            final_output = self._generate_final_output(state)
             
-            # 阶段3：交易员决策
-            logger.info("=== 阶段3：交易员决策 ===")
-            try:
-                logger.info(f"执行 {self.trader.name} 决策")
-                state = self.trader.process(state)
-            except Exception as e:
-                logger.error(f"{self.trader.name} 决策失败: {e}")
+            # 保存结果
+            if save:
+                self._save_results(final_output)
             
-            # 阶段4：风险管理
-            logger.info("=== 阶段4：风险管理 ===")
-            try:
-                logger.info(f"执行 {self.risk_manager.name} 风险评估")
-                state = self.risk_manager.process(state)
-            except Exception as e:
-                logger.error(f"{self.risk_manager.name} 风险评估失败: {e}")
+            logger.info(f"分析完成: {symbol}")
+            return final_output
             
-            # 阶段5：管理层决策
-            logger.info("=== 阶段5：管理层决策 ===")
-            for manager in self.managers:
-                try:
-                    logger.info(f"执行 {manager.name} 决策")
-                    state = manager.process(state)
-                except Exception as e:
-                    logger.error(f"{manager.name} 决策失败: {e}")
+        except Exception as e:
+            logger.error(f"分析流程失败: {e}")
+            return {"symbol": symbol, "error": str(e)}
+    
+    async def arun_analysis(self, symbol: str, save: bool = True) -> Dict[str, Any]:
+        """运行完整的分析流程（异步，所有智能体在当前事件循环中执行 aprocess）"""
+        try:
+            logger.info(f"开始分析 {symbol}")
+            
+            state = AgentState(symbol)
+            
+            scheduler = self.build_scheduler()
+            logger.info(f"关键路径: {' → '.join(scheduler.plan()['critical_path'])}")
+            state = await scheduler.arun(state)
             
-            # 生成最终输出
             final_output = self._generate_final_output(state)
             
-            # 保存结果
-            self._save_results(final_output)
+            if save:
+                self._save_results(final_output)
             
             logger.info(f"分析完成: {symbol}")
             return final_output
             
         except Exception as e:
             logger.error(f"分析流程失败: {e}")
-            return {"error": str(e)}
+            return {"symbol": symbol, "error": str(e)}
+    
+    def _normalize_symbols(self, symbols: List[str]) -> List[str]:
+        """去除空白与重复币种，保持原有顺序"""
+        return list(dict.fromkeys(symbol.strip() for symbol in symbols if symbol and symbol.strip()))
+    
+    def prefetch_batch(self, symbols: List[str]):
+        """批量分析开始前，让实现了 prefetch(symbols) 的智能体一次性获取整批数据（失败不影响逐个币种的分析）"""
+        for agent in self.agents:
+            prefetch = getattr(agent, "prefetch", None)
+            if prefetch is None or not symbols:
+                continue
+            try:
+                prefetch(symbols)
+            except Exception as e:
+                logger.warning(f"{agent.name} 批量预取失败，将逐个币种获取: {e}")
+    
+    async def aprefetch_batch(self, symbols: List[str]):
+        """批量预取（异步，调用智能体的 aprefetch）"""
+        for agent in self.agents:
+            aprefetch = getattr(agent, "aprefetch", None)
+            if aprefetch is None or not symbols:
+                continue
+            try:
+                await aprefetch(symbols)
+            except Exception as e:
+                logger.warning(f"{agent.name} 批量预取失败，将逐个币种获取: {e}")
+    
+    def iter_batch(self, symbols: List[str], max_concurrency: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """
+        并发分析多个币种，按完成顺序逐个产出结果
+        
+        所有币种共享同一组智能体、数据提供模块和客户端；
+        在途的LLM与HTTP请求数分别受 MAX_INFLIGHT_LLM / MAX_INFLIGHT_HTTP 约束
+        """
+        symbols = self._normalize_symbols(symbols)
+        self.prefetch_batch(symbols)
+        max_workers = max(1, min(max_concurrency or Config.BATCH_MAX_CONCURRENCY, len(symbols) or 1))
+        
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="batch") as executor:
+            futures = {executor.submit(self.run_analysis, symbol, False): symbol for symbol in symbols}
+            for future in as_completed(futures):
+                symbol = futures[future]
+                try:
+                    yield future.result()
+                except Exception as e:
+                    logger.error(f"{symbol} 批量分析失败: {e}")
+                    yield {"symbol": symbol, "error": str(e)}
+    
+    async def aiter_batch(self, symbols: List[str], max_concurrency: Optional[int] = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        并发分析多个币种（异步），按完成顺序逐个产出结果
+        
+        单个事件循环驱动所有币种流水线，不需要为每个币种占用线程
+        """
+        symbols = self._normalize_symbols(symbols)
+        await self.aprefetch_batch(symbols)
+        semaphore = asyncio.Semaphore(max(1, max_concurrency or Config.BATCH_MAX_CONCURRENCY))
+        
+        async def analyze(symbol: str) -> Dict[str, Any]:
+            async with semaphore:
+                try:
+                    return await self.arun_analysis(symbol, False)
+                except Exception as e:
+                    logger.error(f"{symbol} 批量分析失败: {e}")
+                    return {"symbol": symbol, "error": str(e)}
+        
+        for next_result in asyncio.as_completed([analyze(symbol) for symbol in symbols]):
+            yield await next_result
+    
+    def run_batch(self, symbols: List[str], max_concurrency: Optional[int] = None, on_result=None) -> List[Dict[str, Any]]:
+        """
+        批量分析多个币种
+        
+        Args:
+            symbols: 币种列表
+            max_concurrency: 同时分析的币种数量上限，默认 BATCH_MAX_CONCURRENCY
+            on_result: 每个币种完成时的回调，用于流式输出
+            
+        Returns:
+            按完成顺序排列的结果列表
+        """
+        logger.info(f"开始批量分析 {len(symbols)} 个币种，并发上限 {max_concurrency or Config.BATCH_MAX_CONCURRENCY}")
+        batch_start = time.perf_counter()
+        output_file = os.path.join(Config.OUTPUT_DIR, "batch_results.jsonl")
+        results = []
+        
+        for result in self.iter_batch(symbols, max_concurrency):
+            results.append(result)
+            self._append_batch_result(result, output_file)
+            if on_result:
+                on_result(result)
+        
+        self._log_batch_throughput(results, batch_start)
+        return results
+    
+    async def arun_batch(self, symbols: List[str], max_concurrency: Optional[int] = None, on_result=None) -> List[Dict[str, Any]]:
+        """批量分析多个币种（异步），参数与返回值同 run_batch"""
+        logger.info(f"开始异步批量分析 {len(symbols)} 个币种，并发上限 {max_concurrency or Config.BATCH_MAX_CONCURRENCY}")
+        batch_start = time.perf_counter()
+        output_file = os.path.join(Config.OUTPUT_DIR, "batch_results.jsonl")
+        results = []
+        
+        async for result in self.aiter_batch(symbols, max_concurrency):
+            results.append(result)
+            self._append_batch_result(result, output_file)
+            if on_result:
+                on_result(result)
+        
+        self._log_batch_throughput(results, batch_start)
+        return results
+    
+    def _log_batch_throughput(self, results: List[Dict[str, Any]], batch_start: float):
+        """记录批量分析耗时与吞吐"""
+        elapsed = time.perf_counter() - batch_start
+        throughput = len(results) / elapsed * 60 if elapsed else 0.0
+        logger.info(f"批量分析完成: {len(results)} 个币种，耗时 {elapsed:.1f}s，吞吐 {throughput:.1f} 币种/分钟")
+        
+        llm_stats = get_llm_gateway().stats()
+        if llm_stats:
+            total_tokens = sum(stats["total_tokens"] for stats in llm_stats.values())
+            total_retries = sum(stats["retries"] for stats in llm_stats.values())
+            slowest = max(llm_stats, key=lambda agent: llm_stats[agent]["avg_latency"])
+            logger.info(f"LLM统计: 共 {total_tokens} tokens，重试 {total_retries} 次，"
+                        f"平均延迟最高的是 {slowest}（{llm_stats[slowest]['avg_latency']:.2f}s）")
+        
+        llm_cache = get_llm_cache()
+        if llm_cache is not None:
+            cache_stats = llm_cache.stats()
+            logger.info(f"LLM缓存: 命中 {cache_stats['hits']}，未命中 {cache_stats['misses']}，"
+                        f"命中率 {cache_stats['hit_rate']:.0%}，条目 {cache_stats['entries']}")
+        
+        for name, flight_stats in get_singleflight_stats().items():
+            if flight_stats["saved"]:
+                logger.info(f"请求合并[{name}]: 实际执行 {flight_stats['executed']} 次，节省 {flight_stats['saved']} 次")
+    
+    def _append_batch_result(self, result: Dict[str, Any], output_file: str):
+        """以JSON Lines格式追加单个币种的批量结果"""
+        try:
+            with self._batch_output_lock:
+                os.makedirs(os.path.dirname(output_file) or ".", exist_ok=True)
+                with open(output_file, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(result, ensure_ascii=False, default=str) + "\n")
+        except Exception as e:
+            logger.error(f"保存批量结果失败: {e}")
     
     def _generate_final_output(self, state: AgentState) -> Dict[str, Any]:
         """生成最终输出"""
@@ -148,12 +373,15 @@ class CryptoAgentSystem:
             # 构建分析摘要
             analysis_reports = state.analysis_reports or {}
             analysis_summary = {
-                "fundamental": analysis_reports.get("fundamental", {}).get("summary", "基于基本面分析"),
-                "technical": analysis_reports.get("technical", {}).get("summary", "基于技术分析"),
-                "news": analysis_reports.get("news", {}).get("summary", "基于新闻分析"),
-                "social": analysis_reports.get("social", {}).get("summary", "基于社交分析")
+                "fundamental": (analysis_reports.get("fundamental") or {}).get("summary", "基于基本面分析"),
+                "technical": (analysis_reports.get("technical") or {}).get("summary", "基于技术分析"),
+                "news": (analysis_reports.get("news") or {}).get("summary", "基于新闻分析"),
+                "social": (analysis_reports.get("social") or {}).get("summary", "基于社交分析")
             }
             
+            if state._shared_context is not None:
+                state.telemetry["shared_context"] = state.shared_context.summary()
+            
             # 生成最终输出
             final_output = {
                 "symbol": state.symbol,
@@ -168,7 +396,8 @@ class CryptoAgentSystem:
                 "research_consensus": consensus_text,
                 "trading_decision": trading_decision.get("analysis", ""),
                 "risk_decision": final_risk_decision.get("analysis", ""),
-                "timestamp": str(pd.Timestamp.now())
+                "telemetry": state.telemetry,
+                "timestamp": str(datetime.now())
             }
             
             return final_output
@@ -196,19 +425,101 @@ class CryptoAgentSystem:
             logger.error(f"保存结果失败: {e}")
 
 
-def main():
+def load_symbols_file(path: str) -> List[str]:
+    """读取币种列表文件（每行一个币种，支持 # 注释与逗号分隔）"""
+    symbols = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.split('#', 1)[0]
+            symbols.extend(part.strip() for part in line.split(',') if part.strip())
+    return symbols
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="AI加密货币多智能体专家系统")
+    parser.add_argument("symbol", nargs="?", help="要分析的币种，如 BTC/USDT（不提供时交互输入）")
+    parser.add_argument("--dry-run", action="store_true", help="只打印调度图、关键路径和预期并行度，不执行分析")
+    parser.add_argument("--symbols-file", help="批量模式：币种列表文件（每行一个币种）")
+    parser.add_argument("--max-concurrency", type=int, default=None, help="批量模式同时分析的币种数量")
+    parser.add_argument("--async", dest="use_async", action="store_true", help="使用异步流水线（单事件循环驱动全部智能体与请求）")
+    parser.add_argument("--only", choices=PIPELINE_AGENT_NAMES, metavar="NODE",
+                        help=f"只运行指定节点及其上游依赖，可选: {', '.join(PIPELINE_AGENT_NAMES)}")
+    parser.add_argument("--serve", action="store_true", help="常驻服务模式：保持预热的系统，通过本地HTTP接口提供分析")
+    parser.add_argument("--host", default=None, help="服务模式监听地址，默认 SERVER_HOST")
+    parser.add_argument("--port", type=int, default=None, help="服务模式监听端口，默认 SERVER_PORT")
+    return parser.parse_args(argv)
+
+
+def run_async(coro):
+    """在新事件循环中执行协程，结束后关闭该循环上的共享HTTP会话与LLM客户端"""
+    from utils.http_client import close_async_http_sessions
+    
+    async def runner():
+        try:
+            return await coro
+        finally:
+            await close_async_http_sessions()
+            await get_llm_gateway().aclose()
+    
+    return asyncio.run(runner())
+
+
+def run_batch_cli(system: CryptoAgentSystem, symbols: List[str], max_concurrency: Optional[int] = None, use_async: bool = False):
+    """批量模式命令行输出"""
+    if not symbols:
+        print("❌ 币种列表为空")
+        return
+    
+    print(f"\n🚀 开始批量分析 {len(symbols)} 个币种...")
+    
+    def print_result(result: Dict[str, Any]):
+        if "error" in result:
+            print(f"❌ {result.get('symbol', 'Unknown')}: {result['error']}")
+        else:
+            print(f"✅ {result.get('symbol')}: 趋势 {result.get('trend')}，"
+                  f"置信度 {result.get('confidence_score', 0):.2f}，风险等级 {result.get('risk_level')}")
+    
+    start = time.perf_counter()
+    if use_async:
+        results = run_async(system.arun_batch(symbols, max_concurrency=max_concurrency, on_result=print_result))
+    else:
+        results = system.run_batch(symbols, max_concurrency=max_concurrency, on_result=print_result)
+    elapsed = time.perf_counter() - start
+    
+    print(f"\n📊 批量分析完成: {len(results)} 个币种，耗时 {elapsed:.1f}s，"
+          f"吞吐 {len(results) / elapsed * 60 if elapsed else 0:.1f} 币种/分钟")
+    print(f"详细结果已保存到 {os.path.join(Config.OUTPUT_DIR, 'batch_results.jsonl')}")
+
+
+def main(argv: Optional[List[str]] = None):
     """主函数"""
+    args = parse_args(argv)
+    
     try:
+        if args.dry_run:
+            print(build_pipeline_scheduler(names=pipeline_stage_names(args.only)).format_plan())
+            return
+        
         # 验证配置
         if not Config.validate_config():
             print("❌ 配置验证失败，请检查 .env 文件")
             return
         
         # 创建系统实例
-        system = CryptoAgentSystem()
+        system = CryptoAgentSystem(only=args.only)
+        
+        if args.serve:
+            from server import serve
+            serve(system, args.host, args.port)
+            return
+        
+        if args.symbols_file:
+            run_batch_cli(system, load_symbols_file(args.symbols_file), args.max_concurrency, args.use_async)
+            return
         
         # 获取用户输入
-        symbol = input("请输入要分析的币种（如 BTC/USDT）: ").strip()
+        symbol = args.symbol or input("请输入要分析的币种（如 BTC/USDT）: ").strip()
         
         if not symbol:
             symbol = "BTC/USDT"  # 默认值
@@ -216,7 +527,10 @@ def main():
         print(f"\n🚀 开始分析 {symbol}...")
         
         # 运行分析
-        results = system.run_analysis(symbol)
+        if args.use_async:
+            results = run_async(system.arun_analysis(symbol))
+        else:
+            results = system.run_analysis(symbol)
         
         # 显示结果
         print(f"\n📊 分析结果:")
@@ -0,0 +1,350 @@
+"""
+常驻服务模式
+在进程内保持一个预热的 CryptoAgentSystem（交易所连接、市场信息、HTTP连接池、LLM客户端、缓存与增量指标状态），
+通过本地HTTP接口提供分析服务；请求进入有界队列，由固定数量的工作线程执行，队列已满时返回 503
+
+接口:
+    POST /analyze   {"symbol": "BTC/USDT"}                 同步返回分析结果（超时返回 202 与任务ID）
+    POST /batch     {"symbols": [...], "max_concurrency": 8} 返回 202 与任务ID
+    GET  /jobs/<id>                                         查询任务状态与结果
+    GET  /status                                            队列、工作线程、延迟与缓存统计
+"""
+
+import json
+import math
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Optional, Tuple
+from utils.config import Config
+from utils.llm_cache import get_llm_cache
+from utils.llm_gateway import get_llm_gateway
+from utils.singleflight import get_singleflight_stats
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+def _positive_number(data: Dict[str, Any], key: str, default: float) -> Tuple[Optional[float], Optional[str]]:
+    """读取正数参数（缺省时取 default），返回 (值, 错误信息)"""
+    value = data.get(key)
+    if value is None:
+        return default, None
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value) or value <= 0:
+        return None, f"{key} 必须是正数"
+    return float(value), None
+
+
+def _positive_int(data: Dict[str, Any], key: str) -> Tuple[Optional[int], Optional[str]]:
+    """读取可选的正整数参数，返回 (值, 错误信息)"""
+    value = data.get(key)
+    if value is None:
+        return None, None
+    if isinstance(value, bool) or not isinstance(value, int) or value <= 0:
+        return None, f"{key} 必须是正整数"
+    return value, None
+
+
+class Job:
+    """排队执行的分析任务"""
+
+    def __init__(self, kind: str, func: Callable[[], Any]):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.func = func
+        self.status = "queued"
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.submitted_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.done = threading.Event()
+
+    def to_dict(self, include_result: bool = True) -> Dict[str, Any]:
+        data = {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "queue_wait": (self.started_at or time.time()) - self.submitted_at,
+            "run_time": (self.finished_at or time.time()) - self.started_at if self.started_at else 0.0
+        }
+        if self.error is not None:
+            data["error"] = self.error
+        if include_result and self.status == "done":
+            data["result"] = self.result
+        return data
+
+
+class AnalysisService:
+    """有界队列 + 固定工作线程，共享同一个预热的 CryptoAgentSystem"""
+
+    def __init__(self, system: Any, workers: Optional[int] = None, max_queue: Optional[int] = None, max_jobs: int = 256):
+        self.system = system
+        self.workers = max(1, workers or Config.SERVER_WORKERS)
+        self.queue: "queue.Queue[Job]" = queue.Queue(maxsize=max(1, max_queue or Config.SERVER_MAX_QUEUE))
+        self.max_jobs = max_jobs
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._threads = []
+        self._busy = 0
+        self.started_at = time.time()
+        self.stats = {"accepted": 0, "rejected": 0, "completed": 0, "failed": 0, "total_latency": 0.0, "max_latency": 0.0}
+
+    def start(self):
+        """预热智能体并启动工作线程"""
+        warm_start = time.perf_counter()
+        agents = self.system.agents
+        logger.info(f"已预热 {len(agents)} 个智能体，耗时 {time.perf_counter() - warm_start:.2f}s")
+
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"server-worker-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, kind: str, func: Callable[[], Any]) -> Optional[Job]:
+        """提交任务；队列已满时返回 None（由调用方返回 503）"""
+        job = Job(kind, func)
+        try:
+            self.queue.put_nowait(job)
+        except queue.Full:
+            with self._lock:
+                self.stats["rejected"] += 1
+            return None
+
+        with self._lock:
+            self.stats["accepted"] += 1
+            self._jobs[job.id] = job
+            # 只保留最近的任务记录
+            while len(self._jobs) > self.max_jobs:
+                self._jobs.popitem(last=False)
+        return job
+
+    def get_job(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _worker(self):
+        while True:
+            job = self.queue.get()
+            with self._lock:
+                self._busy += 1
+            job.status = "running"
+            job.started_at = time.time()
+            try:
+                job.result = job.func()
+                job.status = "done"
+            except Exception as e:
+                logger.error(f"任务 {job.id} 执行失败: {e}")
+                job.error = str(e)
+                job.status = "failed"
+            finally:
+                job.finished_at = time.time()
+                latency = job.finished_at - job.submitted_at
+                with self._lock:
+                    self._busy -= 1
+                    self.stats["completed" if job.status == "done" else "failed"] += 1
+                    self.stats["total_latency"] += latency
+                    self.stats["max_latency"] = max(self.stats["max_latency"], latency)
+                job.done.set()
+                self.queue.task_done()
+
+    def retry_after(self) -> int:
+        """建议的重试等待秒数：按平均任务耗时估算排空当前队列所需时间"""
+        with self._lock:
+            finished = self.stats["completed"] + self.stats["failed"]
+            avg_latency = self.stats["total_latency"] / finished if finished else 1.0
+        return max(1, math.ceil(avg_latency * self.queue.qsize() / self.workers))
+
+    def status(self) -> Dict[str, Any]:
+        """服务状态"""
+        with self._lock:
+            stats = dict(self.stats)
+            busy = self._busy
+        finished = stats["completed"] + stats["failed"]
+        stats["avg_latency"] = stats.pop("total_latency") / finished if finished else 0.0
+
+        llm_cache = get_llm_cache()
+        return {
+            "uptime": time.time() - self.started_at,
+            "workers": self.workers,
+            "busy_workers": busy,
+            "queue_depth": self.queue.qsize(),
+            "queue_capacity": self.queue.maxsize,
+            "jobs": stats,
+            "agents_loaded": self.system.loaded_agent_names,
+            "llm": get_llm_gateway().stats(),
+            "llm_cache": llm_cache.stats() if llm_cache is not None else None,
+            "singleflight": get_singleflight_stats()
+        }
+
+
+class AnalysisRequestHandler(BaseHTTPRequestHandler):
+    """JSON HTTP 接口"""
+
+    service: AnalysisService = None
+    server_version = "CryptoAgent/1.0"
+
+    def log_message(self, format, *args):
+        logger.debug(f"{self.address_string()} {format % args}")
+
+    def _send_json(self, status: int, payload: Any, headers: Optional[Dict[str, str]] = None):
+        body = json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            data = json.loads(self.rfile.read(length) or b"{}")
+        except (ValueError, json.JSONDecodeError) as e:
+            return None, f"请求体不是有效的JSON: {e}"
+        if not isinstance(data, dict):
+            return None, "请求体必须是JSON对象"
+        return data, None
+
+    def _reject_busy(self):
+        """队列已满：返回 503，建议客户端按 Retry-After 重试"""
+        self._send_json(503, {"error": "服务繁忙，队列已满"}, {"Retry-After": str(self.service.retry_after())})
+
+    def do_GET(self):
+        if self.path == "/status":
+            self._send_json(200, self.service.status())
+        elif self.path.startswith("/jobs/"):
+            job = self.service.get_job(self.path[len("/jobs/"):])
+            if job is None:
+                self._send_json(404, {"error": "任务不存在"})
+            else:
+                self._send_json(200, job.to_dict())
+        else:
+            self._send_json(404, {"error": f"未知接口: {self.path}"})
+
+    def do_POST(self):
+        data, error = self._read_json()
+        if error:
+            self._send_json(400, {"error": error})
+            return
+
+        system = self.service.system
+        if self.path == "/analyze":
+            symbol = str(data.get("symbol") or "").strip()
+            if not symbol:
+                self._send_json(400, {"error": "缺少 symbol"})
+                return
+            timeout, error = _positive_number(data, "timeout", Config.SERVER_REQUEST_TIMEOUT)
+            if error:
+                self._send_json(400, {"error": error})
+                return
+
+            job = self.service.submit("analyze", lambda: system.run_analysis(symbol, save=False))
+            if job is None:
+                self._reject_busy()
+                return
+            if job.done.wait(timeout):
+                self._send_json(200 if job.status == "done" else 500, job.to_dict())
+            else:
+                # 超时后任务继续执行，客户端可通过 /jobs/<id> 查询
+                self._send_json(202, job.to_dict(include_result=False))
+
+        elif self.path == "/batch":
+            symbols = data.get("symbols") or []
+            if not isinstance(symbols, list) or not symbols:
+                self._send_json(400, {"error": "symbols 必须是非空列表"})
+                return
+
+            max_concurrency, error = _positive_int(data, "max_concurrency")
+            if error:
+                self._send_json(400, {"error": error})
+                return
+
+            job = self.service.submit("batch", lambda: list(system.iter_batch([str(s) for s in symbols], max_concurrency)))
+            if job is None:
+                self._reject_busy()
+                return
+            self._send_json(202, job.to_dict(include_result=False))
+
+        else:
+            self._send_json(404, {"error": f"未知接口: {self.path}"})
+
+
+def create_server(system: Any, host: Optional[str] = None, port: Optional[int] = None,
+                  workers: Optional[int] = None, max_queue: Optional[int] = None) -> ThreadingHTTPServer:
+    """创建（未启动的）HTTP服务，工作线程已就绪"""
+    service = AnalysisService(system, workers=workers, max_queue=max_queue)
+    service.start()
+    handler = type("BoundAnalysisRequestHandler", (AnalysisRequestHandler,), {"service": service})
+    server = ThreadingHTTPServer((host or Config.SERVER_HOST, port if port is not None else Config.SERVER_PORT), handler)
+    server.daemon_threads = True
+    server.service = service
+    return server
+
+
+def serve(system: Any, host: Optional[str] = None, port: Optional[int] = None):
+    """启动常驻服务（阻塞直到 Ctrl+C）"""
+    server = create_server(system, host, port)
+    address, bound_port = server.server_address[:2]
+    logger.info(f"分析服务已启动: http://{address}:{bound_port}")
+    print(f"🚀 分析服务已启动: http://{address}:{bound_port}（POST /analyze、POST /batch、GET /status）")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n⚠️ 服务已停止")
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    # 独立测试（模拟分析系统，不访问网络）
+    import urllib.error
+    import urllib.request
+    from concurrent.futures import ThreadPoolExecutor
+
+    class FakeSystem:
+        agents = [object()]
+        loaded_agent_names = ["Fake Analyst"]
+
+        def run_analysis(self, symbol, save=True):
+            time.sleep(0.2)
+            return {"symbol": symbol, "trend": "neutral"}
+
+        def iter_batch(self, symbols, max_concurrency=None):
+            for symbol in symbols:
+                yield self.run_analysis(symbol)
+
+    server = create_server(FakeSystem(), "127.0.0.1", 0, workers=1, max_queue=1)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    def post(path, payload):
+        request = urllib.request.Request(base_url + path, data=json.dumps(payload).encode(), method="POST")
+        try:
+            with urllib.request.urlopen(request) as response:
+                return response.status, json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            return e.code, json.loads(e.read())
+
+    print(f"analyze: {post('/analyze', {'symbol': 'BTC/USDT'})}")
+
+    # 1个工作线程 + 容量为1的队列：第3个并发请求被拒绝
+    with ThreadPoolExecutor(3) as executor:
+        codes = sorted(code for code, _ in executor.map(lambda s: post('/analyze', {'symbol': s}), ["A", "B", "C"]))
+    print(f"并发请求状态码: {codes}（预期包含 503）")
+
+    status, job = post('/batch', {'symbols': ['BTC/USDT', 'ETH/USDT']})
+    time.sleep(0.6)
+    with urllib.request.urlopen(f"{base_url}/jobs/{job['job_id']}") as response:
+        print(f"batch: {status} -> {json.loads(response.read())['status']}")
+
+    print(f"非法 timeout: {post('/analyze', {'symbol': 'BTC/USDT', 'timeout': 'abc'})}")
+    print(f"非法 max_concurrency: {post('/batch', {'symbols': ['BTC/USDT'], 'max_concurrency': 0})}")
+    with urllib.request.urlopen(f"{base_url}/status") as response:
+        print(f"status: {json.loads(response.read())['jobs']}")
+    server.shutdown()
+    print("测试完成！")
@@ -0,0 +1,179 @@
+"""
+并发限制模块
+提供进程级的具名并发限制器，用于约束同时在途的LLM请求与HTTP请求数量
+"""
+
+import asyncio
+import threading
+import weakref
+from contextlib import asynccontextmanager
+from typing import Dict
+from utils.config import Config
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# 异步获取全局槽位时的轮询间隔（秒）：从最小值开始，每次翻倍直到最大值
+_ASYNC_POLL_MIN = 0.001
+_ASYNC_POLL_MAX = 0.05
+
+
+class ConcurrencyLimiter:
+    """
+    具名并发限制器（基于有界信号量）
+
+    同步与异步调用共用同一个线程信号量，上限对整个进程（所有线程与事件循环）生效
+    """
+
+    def __init__(self, name: str, limit: int):
+        self.name = name
+        self.limit = max(1, int(limit))
+        self._semaphore = threading.BoundedSemaphore(self.limit)
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.total_acquired = 0
+        # 异步信号量按事件循环分别创建（asyncio.Semaphore 不能跨事件循环使用），
+        # 只用于在事件循环内排队，真正的槽位仍来自线程信号量
+        self._async_semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+
+    def acquire(self):
+        """获取一个并发槽位（阻塞等待）"""
+        self._semaphore.acquire()
+        self._mark_acquired()
+
+    def release(self):
+        """释放并发槽位"""
+        with self._lock:
+            self.in_flight -= 1
+        self._semaphore.release()
+
+    def _mark_acquired(self):
+        with self._lock:
+            self.in_flight += 1
+            self.total_acquired += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+    def _get_async_semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            semaphore = self._async_semaphores.get(loop)
+            if semaphore is None:
+                semaphore = asyncio.Semaphore(self.limit)
+                self._async_semaphores[loop] = semaphore
+            return semaphore
+
+    @asynccontextmanager
+    async def aslot(self):
+        """异步获取并发槽位（用于 async with，不阻塞事件循环）"""
+        async with self._get_async_semaphore():
+            # 非阻塞获取全局槽位，失败时退避后重试，不占用事件循环线程
+            delay = _ASYNC_POLL_MIN
+            while not self._semaphore.acquire(blocking=False):
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, _ASYNC_POLL_MAX)
+            self._mark_acquired()
+            try:
+                yield self
+            finally:
+                self.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.release()
+        return False
+
+    def stats(self) -> Dict[str, int]:
+        """获取限制器统计信息"""
+        return {
+            "limit": self.limit,
+            "in_flight": self.in_flight,
+            "peak_in_flight": self.peak_in_flight,
+            "total_acquired": self.total_acquired
+        }
+
+
+_limiters: Dict[str, ConcurrencyLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def _default_limit(name: str) -> int:
+    """从配置读取默认并发上限"""
+    defaults = {
+        "llm": Config.MAX_INFLIGHT_LLM,
+        "http": Config.MAX_INFLIGHT_HTTP
+    }
+    return defaults.get(name, Config.MAX_INFLIGHT_HTTP)
+
+
+def get_limiter(name: str) -> ConcurrencyLimiter:
+    """获取（必要时创建）具名并发限制器"""
+    with _limiters_lock:
+        limiter = _limiters.get(name)
+        if limiter is None:
+            limiter = ConcurrencyLimiter(name, _default_limit(name))
+            _limiters[name] = limiter
+        return limiter
+
+
+def configure_limits(**limits: int):
+    """
+    调整并发上限，如 configure_limits(llm=32, http=64)
+
+    应在请求开始之前调用；已在途的请求仍受旧限制器约束
+    """
+    with _limiters_lock:
+        for name, limit in limits.items():
+            _limiters[name] = ConcurrencyLimiter(name, limit)
+            logger.info(f"并发限制器 {name} 上限设置为 {limit}")
+
+
+def get_limiter_stats() -> Dict[str, Dict[str, int]]:
+    """获取全部限制器统计"""
+    with _limiters_lock:
+        return {name: limiter.stats() for name, limiter in _limiters.items()}
+
+
+if __name__ == "__main__":
+    # 独立测试
+    import time
+    from concurrent.futures import ThreadPoolExecutor
+
+    configure_limits(llm=2)
+
+    def fake_call(i):
+        with get_limiter("llm"):
+            time.sleep(0.1)
+        return i
+
+    start = time.time()
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(fake_call, range(8)))
+
+    print(f"8个请求，上限2，耗时 {time.time() - start:.2f}s（预期约0.4s）")
+    print(f"统计: {get_limiter_stats()}")
+
+    async def fake_async_call(i):
+        async with get_limiter("llm").aslot():
+            await asyncio.sleep(0.1)
+        return i
+
+    async def run_async():
+        await asyncio.gather(*(fake_async_call(i) for i in range(8)))
+
+    start = time.time()
+    asyncio.run(run_async())
+    print(f"8个异步请求，上限2，耗时 {time.time() - start:.2f}s（预期约0.4s）")
+
+    # 线程与多个事件循环同时使用，上限仍是全局的
+    configure_limits(llm=2)
+    with ThreadPoolExecutor(max_workers=6) as executor:
+        futures = [executor.submit(fake_call, i) for i in range(4)]
+        futures += [executor.submit(asyncio.run, run_async()) for _ in range(2)]
+        for future in futures:
+            future.result()
+    print(f"线程 + 2个事件循环混合: 峰值 {get_limiter('llm').peak_in_flight}（上限2）")
+    print("测试完成！")
@@ -18,6 +18,15 @@ class Config:
     OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
     OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
     OPENAI_TEMPERATURE = float(os.getenv("OPENAI_TEMPERATURE", "0.1"))
+    LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))
+    LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+    LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "1.0"))
+    RISK_ASSESSOR_TIMEOUT = float(os.getenv("RISK_ASSESSOR_TIMEOUT", "120"))
+    DEBATE_ROUNDS = int(os.getenv("DEBATE_ROUNDS", "2"))
+    DEBATE_CONVERGENCE_THRESHOLD = float(os.getenv("DEBATE_CONVERGENCE_THRESHOLD", "1.0"))
+    SHARED_CONTEXT_MODE = os.getenv("SHARED_CONTEXT_MODE", "digest")
+    SHARED_CONTEXT_DIGEST_CHARS = int(os.getenv("SHARED_CONTEXT_DIGEST_CHARS", "400"))
+    STRUCTURED_OUTPUT_REPAIRS = int(os.getenv("STRUCTURED_OUTPUT_REPAIRS", "1"))
     
     # 交易所配置
     EXCHANGE_NAME = os.getenv("EXCHANGE_NAME", "binance")
@@ -38,6 +47,40 @@ class Config:
     DEFAULT_TIMEFRAME = os.getenv("DEFAULT_TIMEFRAME", "1h")
     DEFAULT_LIMIT = int(os.getenv("DEFAULT_LIMIT", "100"))
     
+    # 并发配置
+    PIPELINE_MAX_WORKERS = int(os.getenv("PIPELINE_MAX_WORKERS", "4"))
+    BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "8"))
+    MAX_INFLIGHT_LLM = int(os.getenv("MAX_INFLIGHT_LLM", "16"))
+    MAX_INFLIGHT_HTTP = int(os.getenv("MAX_INFLIGHT_HTTP", "32"))
+    HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "15"))
+    
+    # 缓存配置
+    CACHE_DIR = os.getenv("CACHE_DIR", "cache")
+    LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+    LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", "3600"))
+    LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "5000"))
+    OHLCV_STORE_ENABLED = os.getenv("OHLCV_STORE_ENABLED", "true").lower() in ("1", "true", "yes")
+    OHLCV_STORE_MAX_CANDLES = int(os.getenv("OHLCV_STORE_MAX_CANDLES", "1000"))
+    MARKETS_CACHE_TTL = float(os.getenv("MARKETS_CACHE_TTL", "86400"))
+    COIN_INDEX_TTL = float(os.getenv("COIN_INDEX_TTL", "86400"))
+    COIN_INDEX_RANK_PAGES = int(os.getenv("COIN_INDEX_RANK_PAGES", "2"))
+    FUNDAMENTALS_MARKETS_TTL = float(os.getenv("FUNDAMENTALS_MARKETS_TTL", "300"))
+    FUNDAMENTALS_DETAILS_TTL = float(os.getenv("FUNDAMENTALS_DETAILS_TTL", "86400"))
+    FUNDAMENTALS_PROFILE_TTL = float(os.getenv("FUNDAMENTALS_PROFILE_TTL", "604800"))
+    FUNDAMENTALS_STALE_FACTOR = float(os.getenv("FUNDAMENTALS_STALE_FACTOR", "2"))
+    NEWS_GENERAL_TTL = float(os.getenv("NEWS_GENERAL_TTL", "600"))
+    NEWS_STORE_ENABLED = os.getenv("NEWS_STORE_ENABLED", "true").lower() in ("1", "true", "yes")
+    NEWS_POLL_INTERVAL = float(os.getenv("NEWS_POLL_INTERVAL", "300"))
+    NEWS_MAX_PAGES = int(os.getenv("NEWS_MAX_PAGES", "5"))
+    NEWS_WINDOW_HOURS = float(os.getenv("NEWS_WINDOW_HOURS", "24"))
+    
+    # 服务模式配置
+    SERVER_HOST = os.getenv("SERVER_HOST", "127.0.0.1")
+    SERVER_PORT = int(os.getenv("SERVER_PORT", "8765"))
+    SERVER_WORKERS = int(os.getenv("SERVER_WORKERS", "4"))
+    SERVER_MAX_QUEUE = int(os.getenv("SERVER_MAX_QUEUE", "32"))
+    SERVER_REQUEST_TIMEOUT = float(os.getenv("SERVER_REQUEST_TIMEOUT", "300"))
+    
     @classmethod
     def validate_config(cls) -> bool:
         """验证配置是否完整"""
@@ -0,0 +1,143 @@
+"""
+HTTP客户端模块
+提供进程共享的连接池会话（同步 requests 与异步 aiohttp），所有数据提供模块复用同一组连接并受全局HTTP并发上限约束；
+相同的在途GET请求经 single-flight 合并为一次
+"""
+
+import asyncio
+import json
+import threading
+import weakref
+from typing import TYPE_CHECKING, Any, Dict, Optional, Tuple
+import requests
+from requests.adapters import HTTPAdapter
+from utils.config import Config
+from utils.concurrency import get_limiter
+from utils.singleflight import get_singleflight
+from utils.logger import get_logger
+
+if TYPE_CHECKING:
+    import aiohttp
+
+logger = get_logger(__name__)
+
+
+class PooledSession(requests.Session):
+    """带连接池与并发上限的会话"""
+
+    def __init__(self, pool_size: int):
+        super().__init__()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.mount("https://", adapter)
+        self.mount("http://", adapter)
+
+    def request(self, method, url, *args, **kwargs):
+        """
+        发送请求（占用一个全局HTTP并发槽位；无请求体的GET请求与相同的在途请求合并）；
+        未指定 timeout 时使用 HTTP_TIMEOUT，避免无响应的服务器让整个流程无限期挂起
+        """
+        send = super().request
+        # timeout 是 Session.request 在 url 之后的第 7 个位置参数
+        if len(args) < 7:
+            kwargs.setdefault("timeout", Config.HTTP_TIMEOUT)
+
+        def do_request():
+            with get_limiter("http"):
+                return send(method, url, *args, **kwargs)
+
+        if method.upper() != "GET" or args or any(kwargs.get(name) for name in ("data", "json", "files", "stream")):
+            return do_request()
+
+        key = request_key(url, kwargs.get("params"), self.headers.get("User-Agent", ""))
+        return get_singleflight("http").do(key, do_request)
+
+
+def request_key(url: str, params: Optional[Dict[str, Any]], user_agent: str) -> str:
+    """GET请求的合并键"""
+    return f"{user_agent}|{url}|{json.dumps(params or {}, sort_keys=True, default=str)}"
+
+
+_sessions: Dict[str, PooledSession] = {}
+_sessions_lock = threading.Lock()
+
+
+def get_http_session(user_agent: str = "Crypto-Agent/1.0") -> PooledSession:
+    """按 User-Agent 获取共享会话"""
+    with _sessions_lock:
+        session = _sessions.get(user_agent)
+        if session is None:
+            session = PooledSession(pool_size=Config.MAX_INFLIGHT_HTTP)
+            session.headers.update({'User-Agent': user_agent})
+            _sessions[user_agent] = session
+            logger.debug(f"创建共享HTTP会话: {user_agent}")
+        return session
+
+
+# 事件循环 -> {User-Agent: 会话}；aiohttp 会话不能跨事件循环使用
+_async_sessions: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, aiohttp.ClientSession]]" = weakref.WeakKeyDictionary()
+
+
+def get_async_http_session(user_agent: str = "Crypto-Agent/1.0") -> "aiohttp.ClientSession":
+    """获取当前事件循环中按 User-Agent 共享的 aiohttp 会话（aiohttp 仅在异步模式下导入）"""
+    import aiohttp
+
+    loop = asyncio.get_running_loop()
+    with _sessions_lock:
+        loop_sessions = _async_sessions.setdefault(loop, {})
+        session = loop_sessions.get(user_agent)
+        if session is None or session.closed:
+            connector = aiohttp.TCPConnector(limit=Config.MAX_INFLIGHT_HTTP)
+            session = aiohttp.ClientSession(connector=connector, headers={'User-Agent': user_agent},
+                                            timeout=aiohttp.ClientTimeout(total=Config.HTTP_TIMEOUT))
+            loop_sessions[user_agent] = session
+            logger.debug(f"创建共享异步HTTP会话: {user_agent}")
+        return session
+
+
+async def aget_json(url: str, params: Optional[Dict[str, Any]] = None,
+                    user_agent: str = "Crypto-Agent/1.0") -> Tuple[int, Any]:
+    """
+    异步GET请求并解析JSON（占用一个全局HTTP并发槽位，总超时 HTTP_TIMEOUT，超时抛出 asyncio.TimeoutError）
+
+    Returns:
+        (状态码, JSON数据)；状态码非200时数据为 None
+    """
+    session = get_async_http_session(user_agent)
+    # aiohttp 查询参数只接受字符串/数字
+    query = {key: str(value) for key, value in (params or {}).items()}
+
+    async def fetch() -> Tuple[int, Any]:
+        async with get_limiter("http").aslot():
+            async with session.get(url, params=query) as response:
+                if response.status != 200:
+                    return response.status, None
+                return response.status, await response.json(content_type=None)
+
+    # 相同的在途请求共享同一次响应（调用方只读取返回数据）
+    return await get_singleflight("http").ado(request_key(url, query, user_agent), fetch)
+
+
+async def close_async_http_sessions():
+    """关闭当前事件循环中的全部 aiohttp 会话"""
+    with _sessions_lock:
+        loop_sessions = _async_sessions.pop(asyncio.get_running_loop(), {})
+    for session in loop_sessions.values():
+        if not session.closed:
+            await session.close()
+
+
+if __name__ == "__main__":
+    # 独立测试
+    session_a = get_http_session()
+    session_b = get_http_session()
+    print(f"会话共享: {session_a is session_b}")
+    print(f"User-Agent: {session_a.headers.get('User-Agent')}")
+
+    async def check_async_session():
+        first = get_async_http_session()
+        second = get_async_http_session()
+        print(f"异步会话共享: {first is second}")
+        await close_async_http_sessions()
+
+    asyncio.run(check_async_session())
+    print("测试完成！")
@@ -0,0 +1,225 @@
+"""
+LLM响应缓存模块
+以 (模型, 温度, 消息, max_tokens) 的哈希为键，将LLM响应持久化到本地SQLite，
+支持按智能体设置有效期、按最近访问时间的LRU淘汰以及命中统计
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+from utils.config import Config
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# 内存中累积的最近访问时间超过该数量时写回磁盘
+ACCESS_FLUSH_THRESHOLD = 256
+
+
+class LLMCache:
+    """磁盘LLM响应缓存（SQLite）"""
+
+    def __init__(self, path: Optional[str] = None, max_entries: Optional[int] = None, default_ttl: Optional[float] = None):
+        self.path = path or os.path.join(Config.CACHE_DIR, "llm_cache.sqlite3")
+        self.max_entries = max(1, max_entries if max_entries is not None else Config.LLM_CACHE_MAX_ENTRIES)
+        self.default_ttl = default_ttl if default_ttl is not None else Config.LLM_CACHE_TTL
+        self._lock = threading.Lock()
+        self._conn = self._connect()
+        self._stats: Dict[str, Dict[str, int]] = {}
+        # 命中时只在内存中记录最近访问时间，淘汰前、关闭时或累积过多时批量写回（避免每次命中都提交一次事务）
+        self._pending_access: Dict[str, float] = {}
+        self.evictions = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                key TEXT PRIMARY KEY,
+                agent TEXT,
+                response TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                expires_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_last_access ON llm_cache (last_access)")
+        conn.commit()
+        return conn
+
+    @staticmethod
+    def make_key(model: str, temperature: float, messages: List[Dict[str, str]], max_tokens: int,
+                 response_format: Optional[Dict[str, Any]] = None) -> str:
+        """根据请求内容计算缓存键（未指定 response_format 时与旧版键一致）"""
+        request = {
+            "model": model,
+            "temperature": temperature,
+            "messages": messages,
+            "max_tokens": max_tokens
+        }
+        if response_format is not None:
+            request["response_format"] = response_format
+        payload = json.dumps(request, ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _count(self, agent: str, outcome: str):
+        stats = self._stats.setdefault(agent, {"hits": 0, "misses": 0, "expired": 0, "writes": 0})
+        stats[outcome] += 1
+
+    def _flush_access(self):
+        """将内存中的最近访问时间写回磁盘（调用方持有锁，由调用方提交）"""
+        if self._pending_access:
+            self._conn.executemany("UPDATE llm_cache SET last_access = ? WHERE key = ?",
+                                   [(last_access, key) for key, last_access in self._pending_access.items()])
+            self._pending_access.clear()
+
+    def get(self, key: str, agent: str = "unknown") -> Optional[str]:
+        """读取缓存，未命中或已过期时返回 None"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT response, expires_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self._count(agent, "misses")
+                return None
+
+            response, expires_at = row
+            if expires_at <= now:
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self._conn.commit()
+                self._pending_access.pop(key, None)
+                self._count(agent, "expired")
+                self._count(agent, "misses")
+                return None
+
+            self._pending_access[key] = now
+            if len(self._pending_access) >= ACCESS_FLUSH_THRESHOLD:
+                self._flush_access()
+                self._conn.commit()
+            self._count(agent, "hits")
+            return response
+
+    def set(self, key: str, response: str, agent: str = "unknown", ttl: Optional[float] = None):
+        """写入缓存，超出条目上限时淘汰最久未访问的条目"""
+        ttl = self.default_ttl if ttl is None else ttl
+        if ttl <= 0:
+            return
+
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, agent, response, created_at, expires_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, agent, response, now, now + ttl, now)
+            )
+            self._pending_access.pop(key, None)
+            # 淘汰按最近访问时间排序，先写回内存中的访问记录
+            self._flush_access()
+            cursor = self._conn.execute(
+                "DELETE FROM llm_cache WHERE key IN "
+                "(SELECT key FROM llm_cache ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+            self._conn.commit()
+            self.evictions += max(cursor.rowcount, 0)
+            self._count(agent, "writes")
+
+    def purge_expired(self) -> int:
+        """删除全部过期条目，返回删除数量"""
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM llm_cache WHERE expires_at <= ?", (time.time(),))
+            self._conn.commit()
+            return max(cursor.rowcount, 0)
+
+    def clear(self):
+        """清空缓存与统计"""
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_cache")
+            self._conn.commit()
+            self._pending_access.clear()
+            self._stats.clear()
+            self.evictions = 0
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+
+    def stats(self) -> Dict[str, Any]:
+        """获取命中统计（总计与按智能体）"""
+        with self._lock:
+            per_agent = {agent: dict(stats) for agent, stats in self._stats.items()}
+        hits = sum(stats["hits"] for stats in per_agent.values())
+        misses = sum(stats["misses"] for stats in per_agent.values())
+        return {
+            "entries": len(self),
+            "max_entries": self.max_entries,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+            "evictions": self.evictions,
+            "agents": per_agent
+        }
+
+    def close(self):
+        """写回访问记录并关闭数据库连接"""
+        with self._lock:
+            self._flush_access()
+            self._conn.commit()
+            self._conn.close()
+
+
+_cache: Optional[LLMCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_llm_cache() -> Optional[LLMCache]:
+    """获取进程共享的LLM缓存；LLM_CACHE_ENABLED 关闭或初始化失败时返回 None"""
+    global _cache
+    if not Config.LLM_CACHE_ENABLED:
+        return None
+
+    with _cache_lock:
+        if _cache is None:
+            try:
+                _cache = LLMCache()
+                logger.info(f"LLM缓存已启用: {_cache.path}")
+            except Exception as e:
+                logger.error(f"LLM缓存初始化失败，将直接调用LLM: {e}")
+                Config.LLM_CACHE_ENABLED = False
+                return None
+        return _cache
+
+
+if __name__ == "__main__":
+    # 独立测试
+    cache = LLMCache(path=":memory:", max_entries=2, default_ttl=60)
+    messages = [{"role": "user", "content": "分析BTC"}]
+
+    key = LLMCache.make_key("gpt-4o-mini", 0.1, messages, 2000)
+    print(f"缓存键: {key[:16]}...")
+    print(f"首次读取: {cache.get(key, 'Test')}")
+
+    cache.set(key, "BTC看涨", agent="Test")
+    print(f"再次读取: {cache.get(key, 'Test')}")
+
+    cache.set("short", "过期内容", agent="Test", ttl=0.01)
+    time.sleep(0.02)
+    print(f"过期读取: {cache.get('short', 'Test')}")
+
+    for index in range(3):
+        cache.set(f"k{index}", f"v{index}", agent="Test")
+    print(f"LRU淘汰后条目数: {len(cache)}")
+
+    # 命中只更新内存中的访问时间，淘汰前写回，因此刚命中的 k1 保留、k2 被淘汰
+    time.sleep(0.01)
+    cache.get("k1", "Test")
+    cache.set("k3", "v3", agent="Test")
+    print(f"命中后再写入: k1={cache.get('k1', 'Test')}，k2={cache.get('k2', 'Test')}")
+    print(f"统计: {cache.stats()}")
+    print("测试完成！")
@@ -0,0 +1,297 @@
+"""
+LLM网关模块
+进程内共享的LLM调用入口：复用同一个连接池客户端，受全局在途LLM请求上限约束，
+对 429/5xx 做带随机抖动的指数退避重试，命中本地响应缓存时直接返回，相同的在途请求合并为一次，
+并按智能体统计延迟与token用量
+"""
+
+import asyncio
+import random
+import threading
+import time
+import weakref
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+from utils.config import Config
+from utils.concurrency import get_limiter
+from utils.llm_cache import LLMCache, get_llm_cache
+from utils.singleflight import get_singleflight
+from utils.logger import get_logger
+
+if TYPE_CHECKING:
+    import openai
+
+logger = get_logger(__name__)
+
+
+class LLMGateway:
+    """共享LLM网关（openai 在首次调用时才导入）"""
+
+    def __init__(self, timeout: Optional[float] = None, max_retries: Optional[int] = None,
+                 backoff_base: Optional[float] = None, backoff_max: float = 30.0):
+        self.timeout = timeout if timeout is not None else Config.LLM_TIMEOUT
+        self.max_retries = max_retries if max_retries is not None else Config.LLM_MAX_RETRIES
+        self.backoff_base = backoff_base if backoff_base is not None else Config.LLM_BACKOFF_BASE
+        self.backoff_max = backoff_max
+        self._client: Optional["openai.OpenAI"] = None
+        # AsyncOpenAI 的底层连接池绑定到创建时的事件循环，按事件循环分别创建
+        self._async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, openai.AsyncOpenAI]" = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, float]] = {}
+
+    @property
+    def available(self) -> bool:
+        """是否已配置API密钥"""
+        return bool(Config.OPENAI_API_KEY)
+
+    @staticmethod
+    def retryable_errors() -> Tuple[type, ...]:
+        """可重试的错误类型（其余 APIStatusError 仅在状态码为 5xx 时重试）"""
+        import openai
+
+        return (
+            openai.RateLimitError,
+            openai.APITimeoutError,
+            openai.APIConnectionError,
+            openai.InternalServerError
+        )
+
+    def _get_client(self) -> "openai.OpenAI":
+        """获取共享同步客户端（重试由网关负责，关闭SDK内置重试）"""
+        import openai
+
+        with self._lock:
+            if self._client is None:
+                self._client = openai.OpenAI(api_key=Config.OPENAI_API_KEY, max_retries=0, timeout=self.timeout)
+                logger.info("LLM网关客户端初始化成功")
+            return self._client
+
+    def _get_async_client(self) -> "openai.AsyncOpenAI":
+        """获取当前事件循环共享的异步客户端"""
+        import openai
+
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            client = self._async_clients.get(loop)
+            if client is None:
+                client = openai.AsyncOpenAI(api_key=Config.OPENAI_API_KEY, max_retries=0, timeout=self.timeout)
+                self._async_clients[loop] = client
+                logger.debug("创建LLM网关异步客户端")
+            return client
+
+    async def aclose(self):
+        """关闭当前事件循环中的异步客户端"""
+        with self._lock:
+            client = self._async_clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.close()
+
+    def _request_kwargs(self, messages: List[Dict[str, str]], model: Optional[str], temperature: Optional[float],
+                        max_tokens: int, timeout: Optional[float],
+                        response_format: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        kwargs = {
+            "model": model or Config.OPENAI_MODEL,
+            "messages": messages,
+            "temperature": temperature or Config.OPENAI_TEMPERATURE,
+            "max_tokens": max_tokens,
+            "timeout": timeout or self.timeout
+        }
+        if response_format is not None:
+            kwargs["response_format"] = response_format
+        return kwargs
+
+    def _request_key(self, kwargs: Dict[str, Any]) -> str:
+        """请求内容哈希，同时用作缓存键与请求合并键"""
+        return LLMCache.make_key(kwargs["model"], kwargs["temperature"], kwargs["messages"], kwargs["max_tokens"],
+                                 kwargs.get("response_format"))
+
+    def _cache_lookup(self, key: str, agent: str, cache_ttl: Optional[float]) -> Optional[str]:
+        """查询响应缓存；缓存关闭或 cache_ttl<=0 时返回 None"""
+        cache = get_llm_cache()
+        if cache is None or (cache_ttl is not None and cache_ttl <= 0):
+            return None
+        return cache.get(key, agent)
+
+    def _cache_store(self, key: str, content: Optional[str], agent: str, cache_ttl: Optional[float]):
+        cache = get_llm_cache()
+        if cache is not None and content and (cache_ttl is None or cache_ttl > 0):
+            cache.set(key, content, agent=agent, ttl=cache_ttl)
+
+    def _is_retryable(self, error: Exception) -> bool:
+        """判断错误是否可重试（429、超时、连接错误与5xx）"""
+        if isinstance(error, self.retryable_errors()):
+            return True
+        status_code = getattr(error, "status_code", None)
+        return isinstance(status_code, int) and status_code >= 500
+
+    def _backoff_delay(self, attempt: int, error: Exception) -> float:
+        """计算重试等待时间：指数退避 + 全随机抖动，服务端给出 Retry-After 时取两者较大值"""
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+        response = getattr(error, "response", None)
+        retry_after = response.headers.get("retry-after") if response is not None else None
+        try:
+            if retry_after:
+                delay = max(delay, min(self.backoff_max, float(retry_after)))
+        except ValueError:
+            pass
+        return delay
+
+    def _agent_stats(self, agent: str) -> Dict[str, float]:
+        return self._stats.setdefault(agent, {
+            "calls": 0,
+            "errors": 0,
+            "retries": 0,
+            "total_latency": 0.0,
+            "max_latency": 0.0,
+            "prompt_tokens": 0,
+            # 命中服务端提示词前缀缓存的输入token
+            "cached_prompt_tokens": 0,
+            "completion_tokens": 0,
+            "total_tokens": 0
+        })
+
+    def _record_success(self, agent: str, latency: float, response: Any):
+        usage = getattr(response, "usage", None)
+        with self._lock:
+            stats = self._agent_stats(agent)
+            stats["calls"] += 1
+            stats["total_latency"] += latency
+            stats["max_latency"] = max(stats["max_latency"], latency)
+            if usage is not None:
+                stats["prompt_tokens"] += getattr(usage, "prompt_tokens", 0) or 0
+                details = getattr(usage, "prompt_tokens_details", None)
+                stats["cached_prompt_tokens"] += getattr(details, "cached_tokens", 0) or 0
+                stats["completion_tokens"] += getattr(usage, "completion_tokens", 0) or 0
+                stats["total_tokens"] += getattr(usage, "total_tokens", 0) or 0
+
+    def _record_retry(self, agent: str, attempt: int, delay: float, error: Exception):
+        logger.warning(f"{agent} LLM调用失败（第 {attempt + 1} 次）: {error}，{delay:.1f}s 后重试")
+        with self._lock:
+            self._agent_stats(agent)["retries"] += 1
+
+    def _record_error(self, agent: str):
+        with self._lock:
+            stats = self._agent_stats(agent)
+            stats["calls"] += 1
+            stats["errors"] += 1
+
+    def chat(self, messages: List[Dict[str, str]], agent: str = "unknown", model: Optional[str] = None,
+             temperature: Optional[float] = None, max_tokens: int = 2000, timeout: Optional[float] = None,
+             cache_ttl: Optional[float] = None, response_format: Optional[Dict[str, Any]] = None) -> str:
+        """
+        同步调用对话补全
+
+        Args:
+            messages: 对话消息
+            agent: 调用方名称，用于统计
+            model / temperature: 默认取 Config.OPENAI_MODEL / OPENAI_TEMPERATURE
+            max_tokens: 最大生成token数
+            timeout: 单次调用超时（秒），默认 LLM_TIMEOUT
+            cache_ttl: 响应缓存有效期（秒），None 使用 LLM_CACHE_TTL，<=0 不使用缓存
+            response_format: 输出格式，如 {"type": "json_object"}（JSON模式）
+
+        Returns:
+            模型回复文本；重试耗尽或遇到不可重试错误时抛出原异常
+        """
+        kwargs = self._request_kwargs(messages, model, temperature, max_tokens, timeout, response_format)
+        key = self._request_key(kwargs)
+        cached = self._cache_lookup(key, agent, cache_ttl)
+        if cached is not None:
+            return cached
+
+        # 相同请求在途时（如并发批量中的相同提示词）等待其结果
+        return get_singleflight("llm").do(key, lambda: self._chat_with_retry(kwargs, key, agent, cache_ttl))
+
+    def _chat_with_retry(self, kwargs: Dict[str, Any], key: str, agent: str, cache_ttl: Optional[float]) -> str:
+        client = self._get_client()
+
+        for attempt in range(self.max_retries + 1):
+            try:
+                # 只在请求期间占用并发槽位，退避等待时释放
+                with get_limiter("llm"):
+                    start = time.perf_counter()
+                    response = client.chat.completions.create(**kwargs)
+                self._record_success(agent, time.perf_counter() - start, response)
+                content = response.choices[0].message.content
+                self._cache_store(key, content, agent, cache_ttl)
+                return content
+            except Exception as e:
+                if attempt >= self.max_retries or not self._is_retryable(e):
+                    self._record_error(agent)
+                    raise
+                delay = self._backoff_delay(attempt, e)
+                self._record_retry(agent, attempt, delay, e)
+                time.sleep(delay)
+
+    async def achat(self, messages: List[Dict[str, str]], agent: str = "unknown", model: Optional[str] = None,
+                    temperature: Optional[float] = None, max_tokens: int = 2000, timeout: Optional[float] = None,
+                    cache_ttl: Optional[float] = None, response_format: Optional[Dict[str, Any]] = None) -> str:
+        """异步调用对话补全，参数与返回值同 chat"""
+        kwargs = self._request_kwargs(messages, model, temperature, max_tokens, timeout, response_format)
+        key = self._request_key(kwargs)
+        cached = self._cache_lookup(key, agent, cache_ttl)
+        if cached is not None:
+            return cached
+
+        return await get_singleflight("llm").ado(key, lambda: self._achat_with_retry(kwargs, key, agent, cache_ttl))
+
+    async def _achat_with_retry(self, kwargs: Dict[str, Any], key: str, agent: str, cache_ttl: Optional[float]) -> str:
+        client = self._get_async_client()
+
+        for attempt in range(self.max_retries + 1):
+            try:
+                async with get_limiter("llm").aslot():
+                    start = time.perf_counter()
+                    response = await client.chat.completions.create(**kwargs)
+                self._record_success(agent, time.perf_counter() - start, response)
+                content = response.choices[0].message.content
+                self._cache_store(key, content, agent, cache_ttl)
+                return content
+            except Exception as e:
+                if attempt >= self.max_retries or not self._is_retryable(e):
+                    self._record_error(agent)
+                    raise
+                delay = self._backoff_delay(attempt, e)
+                self._record_retry(agent, attempt, delay, e)
+                await asyncio.sleep(delay)
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """按智能体获取调用统计（含平均延迟）"""
+        with self._lock:
+            snapshot = {agent: dict(stats) for agent, stats in self._stats.items()}
+        for stats in snapshot.values():
+            succeeded = stats["calls"] - stats["errors"]
+            stats["avg_latency"] = stats["total_latency"] / succeeded if succeeded else 0.0
+        return snapshot
+
+    def reset_stats(self):
+        """清空调用统计"""
+        with self._lock:
+            self._stats.clear()
+
+
+_gateway: Optional[LLMGateway] = None
+_gateway_lock = threading.Lock()
+
+
+def get_llm_gateway() -> LLMGateway:
+    """获取进程共享的LLM网关"""
+    global _gateway
+    with _gateway_lock:
+        if _gateway is None:
+            _gateway = LLMGateway()
+        return _gateway
+
+
+if __name__ == "__main__":
+    # 独立测试
+    gateway = get_llm_gateway()
+    print(f"网关共享: {gateway is get_llm_gateway()}")
+    print(f"API密钥已配置: {gateway.available}")
+    print(f"超时: {gateway.timeout}s，最大重试: {gateway.max_retries}，退避基数: {gateway.backoff_base}s")
+    print(f"退避序列示例: {[round(gateway._backoff_delay(i, Exception()), 2) for i in range(4)]}")
+
+    if gateway.available:
+        reply = gateway.chat([{"role": "user", "content": "用一句话介绍比特币"}], agent="Gateway Test")
+        print(f"回复: {reply}")
+        print(f"统计: {gateway.stats()}")
+    print("测试完成！")
@@ -0,0 +1,188 @@
+"""
+提示词模板注册表
+每个智能体的提示词拆成两部分：
+- 静态前缀（system 消息）：角色、规则与输出格式，不含任何币种、价格或报告等动态数据，逐字节稳定
+- 动态后缀（user 消息）：本次调用的交易对、市场数据与上游报告
+静态前缀放在最前面，重复调用可命中服务端的提示词前缀缓存（更低的首token延迟与费用）。
+修改静态前缀时需要同时提升模板版本号；锁文件记录每个版本的前缀哈希，用于检查前缀是否意外变化
+
+用法:
+    python -m utils.prompt_templates            # 检查静态前缀与锁文件是否一致
+    python -m utils.prompt_templates --update   # 更新锁文件（修改模板并提升版本号后）
+"""
+
+import argparse
+import hashlib
+import importlib
+import json
+import os
+import re
+import sys
+import threading
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LOCK_PATH = os.path.join(ROOT, "agents", "prompt_prefixes.lock.json")
+
+# 定义了提示词模板的模块（检查前导入，完成注册）
+PROMPT_MODULES = (
+    "agents.analysts.market_analyst",
+    "agents.analysts.fundamentals_analyst",
+    "agents.analysts.news_analyst",
+    "agents.analysts.social_media_analyst",
+    "agents.researchers.base",
+    "agents.researchers.bull_researcher",
+    "agents.researchers.bear_researcher",
+    "agents.managers.research_manager",
+    "agents.risk_management.aggressive_risk",
+    "agents.risk_management.conservative_risk",
+    "agents.risk_management.neutral_risk",
+    "agents.trader.trader",
+    "agents.managers.risk_manager",
+)
+
+# f-string 漏渲染留下的占位符，如 {state.symbol}
+_PLACEHOLDER = re.compile(r"\{[A-Za-z_][\w.\[\]'\"]*\}")
+
+
+@dataclass(frozen=True)
+class PromptTemplate:
+    """版本化的提示词模板（静态前缀）"""
+    name: str
+    version: str
+    system: str
+
+    @property
+    def prefix_hash(self) -> str:
+        return hashlib.sha256(self.system.encode("utf-8")).hexdigest()
+
+    def messages(self, dynamic: str) -> List[Dict[str, str]]:
+        """静态前缀在前、动态后缀在后的对话消息"""
+        return [
+            {"role": "system", "content": self.system},
+            {"role": "user", "content": dynamic.strip()}
+        ]
+
+
+class PromptRegistry:
+    """提示词模板注册表"""
+
+    def __init__(self):
+        self._templates: Dict[str, PromptTemplate] = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, version: str, system: str) -> PromptTemplate:
+        """注册模板；同名模板只能注册一次（模块重复导入时内容必须一致）"""
+        template = PromptTemplate(name, version, system.strip() + "\n")
+        with self._lock:
+            existing = self._templates.get(name)
+            if existing is not None and existing != template:
+                raise ValueError(f"提示词模板 {name} 重复注册且内容不同")
+            self._templates[name] = template
+        return template
+
+    def get(self, name: str) -> PromptTemplate:
+        with self._lock:
+            return self._templates[name]
+
+    def templates(self) -> List[PromptTemplate]:
+        with self._lock:
+            return sorted(self._templates.values(), key=lambda template: template.name)
+
+    def manifest(self) -> Dict[str, Dict[str, object]]:
+        """{模板名: {version, prefix_sha256, prefix_chars}}"""
+        return {
+            template.name: {
+                "version": template.version,
+                "prefix_sha256": template.prefix_hash,
+                "prefix_chars": len(template.system)
+            }
+            for template in self.templates()
+        }
+
+
+_registry = PromptRegistry()
+
+
+def register_prompt(name: str, version: str, system: str) -> PromptTemplate:
+    """注册提示词模板（在智能体模块顶层调用）"""
+    return _registry.register(name, version, system)
+
+
+def get_prompt_registry() -> PromptRegistry:
+    """获取全局提示词模板注册表"""
+    return _registry
+
+
+def load_all_prompts() -> PromptRegistry:
+    """导入所有定义了提示词模板的模块"""
+    for module in PROMPT_MODULES:
+        importlib.import_module(module)
+    return _registry
+
+
+def check_prefix_stability(lock_path: str = LOCK_PATH) -> List[str]:
+    """检查静态前缀：不得包含未渲染的占位符；与锁文件相比，前缀变化时必须提升版本号"""
+    registry = load_all_prompts()
+    problems = []
+
+    for template in registry.templates():
+        if _PLACEHOLDER.search(template.system):
+            problems.append(f"{template.name}: 静态前缀疑似包含未渲染的占位符")
+
+    if not os.path.exists(lock_path):
+        return problems + [f"锁文件不存在: {lock_path}（运行 --update 生成）"]
+    with open(lock_path, "r", encoding="utf-8") as f:
+        locked = json.load(f)
+
+    manifest = registry.manifest()
+    for name, entry in manifest.items():
+        previous = locked.get(name)
+        if previous is None:
+            problems.append(f"{name}: 新模板未写入锁文件")
+        elif previous["prefix_sha256"] != entry["prefix_sha256"]:
+            if previous["version"] == entry["version"]:
+                problems.append(f"{name}: 静态前缀已变化但版本号仍为 {entry['version']}（会使前缀缓存失效）")
+            else:
+                problems.append(f"{name}: 版本 {previous['version']} -> {entry['version']}，请运行 --update 更新锁文件")
+    for name in locked:
+        if name not in manifest:
+            problems.append(f"{name}: 模板已删除，请运行 --update 更新锁文件")
+    return problems
+
+
+def write_lock(lock_path: str = LOCK_PATH):
+    """写入锁文件"""
+    manifest = load_all_prompts().manifest()
+    with open(lock_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2, sort_keys=True)
+        f.write("\n")
+    return manifest
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="提示词静态前缀稳定性检查")
+    parser.add_argument("--update", action="store_true", help="更新锁文件")
+    args = parser.parse_args(argv)
+
+    if args.update:
+        manifest = write_lock()
+        print(f"已写入 {len(manifest)} 个模板到 {os.path.relpath(LOCK_PATH, ROOT)}")
+        return 0
+
+    problems = check_prefix_stability()
+    for template in _registry.templates():
+        print(f"  {template.name:<22} {template.version:<4} {template.prefix_hash[:12]}  {len(template.system)} 字符")
+    if problems:
+        for problem in problems:
+            print(f"❌ {problem}")
+        return 1
+    print(f"✅ {len(_registry.templates())} 个模板的静态前缀与锁文件一致")
+    return 0
+
+
+if __name__ == "__main__":
+    # 以 python -m 运行时本文件是 __main__，智能体注册到的是 utils.prompt_templates 中的注册表
+    from utils.prompt_templates import main as registry_main
+    sys.exit(registry_main())
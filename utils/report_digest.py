@@ -0,0 +1,181 @@
+"""
+分析报告摘要
+对分析师报告做抽取式摘要（不调用LLM）：按关键信息打分挑选句子，生成长度受限的结构化摘要，
+按报告内容哈希缓存；研究员、风险分析师与交易员引用摘要而不是完整报告
+"""
+
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+from utils.config import Config
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+_SENTENCE_END = re.compile(r"(?<=[。！？!?；;\n])")
+# 行首的引用/列表符号与编号，以及行内的加粗、代码标记
+_MARKUP = re.compile(r"^(?:[\s>*\-•·|]+|\d+[.、)]\s*)+|[*`_]{2,}")
+_NUMBER = re.compile(r"\d")
+_PRICE = re.compile(r"(当前价格|现价|价格)[：:]")
+
+KEYWORDS: Tuple[str, ...] = (
+    "趋势", "支撑", "阻力", "突破", "跌破", "建议", "风险", "信号", "RSI", "MACD", "布林", "均线",
+    "成交量", "资金", "流入", "流出", "市值", "监管", "情绪", "利好", "利空", "结论", "总结"
+)
+BULLISH_WORDS: Tuple[str, ...] = ("看涨", "上涨", "多头", "利好", "金叉", "突破", "买入", "乐观", "积极", "流入")
+BEARISH_WORDS: Tuple[str, ...] = ("看跌", "下跌", "空头", "利空", "死叉", "跌破", "卖出", "悲观", "消极", "流出")
+
+
+def split_sentences(text: str) -> List[str]:
+    """切分句子并去掉 Markdown 标记，丢弃标题与过短的片段（分隔线等）"""
+    sentences = []
+    for raw in _SENTENCE_END.split(text or ""):
+        if raw.lstrip().startswith("#"):
+            continue
+        sentence = _MARKUP.sub("", raw.strip()).strip()
+        if len(sentence) >= 6:
+            sentences.append(sentence)
+    return sentences
+
+
+def _score(sentence: str, index: int, total: int) -> float:
+    score = sum(2.0 for keyword in KEYWORDS if keyword in sentence)
+    if _NUMBER.search(sentence):
+        score += 1.0
+    # 报告开头通常是概况，结尾通常是结论
+    if index < 2 or index >= total - 2:
+        score += 1.5
+    return score
+
+
+def _signal(text: str) -> str:
+    bullish = sum(text.count(word) for word in BULLISH_WORDS)
+    bearish = sum(text.count(word) for word in BEARISH_WORDS)
+    if bullish > bearish * 1.2:
+        return "看涨"
+    if bearish > bullish * 1.2:
+        return "看跌"
+    return "中性"
+
+
+def build_digest(text: str, max_chars: int) -> Dict[str, Any]:
+    """生成结构化摘要：{"signal", "key_points", "summary", "source_chars"}，summary 不超过 max_chars"""
+    # 去重（报告中重复出现的句子只保留第一次）
+    sentences = list(dict.fromkeys(split_sentences(text)))
+    signal = _signal(text or "")
+    prefix = f"【信号: {signal}】"
+    budget = max(0, max_chars - len(prefix))
+
+    # 价格句优先保留（交易员从摘要中提取当前价格），其余按得分从高到低
+    ranked = sorted(
+        range(len(sentences)),
+        key=lambda i: (not _PRICE.search(sentences[i]), -_score(sentences[i], i, len(sentences)), i)
+    )
+    chosen, used = [], 0
+    for i in ranked:
+        # 句间以空格分隔
+        cost = len(sentences[i]) + (1 if chosen else 0)
+        if used + cost > budget:
+            continue
+        chosen.append(i)
+        used += cost
+
+    key_points = [sentences[i] for i in sorted(chosen)]
+    if not key_points and sentences:
+        # 单句超长时截断第一句
+        key_points = [sentences[0][:max(1, budget - 1)] + "…"]
+
+    return {
+        "signal": signal,
+        "key_points": key_points,
+        "summary": prefix + " ".join(key_points),
+        "source_chars": len(text or "")
+    }
+
+
+class DigestCache:
+    """按报告内容哈希缓存摘要（LRU，线程安全）"""
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(text: str, max_chars: int) -> str:
+        return hashlib.sha256(f"{max_chars}\0{text}".encode("utf-8")).hexdigest()
+
+    def get_or_build(self, text: str, max_chars: int) -> Dict[str, Any]:
+        key = self.key(text, max_chars)
+        with self._lock:
+            digest = self._entries.get(key)
+            if digest is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return digest
+            self.misses += 1
+
+        digest = build_digest(text, max_chars)
+        with self._lock:
+            self._entries[key] = digest
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return digest
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+_digest_cache: Optional[DigestCache] = None
+_digest_cache_lock = threading.Lock()
+
+
+def get_digest_cache() -> DigestCache:
+    """获取全局摘要缓存"""
+    global _digest_cache
+    with _digest_cache_lock:
+        if _digest_cache is None:
+            _digest_cache = DigestCache()
+        return _digest_cache
+
+
+def digest_report(text: str, max_chars: Optional[int] = None) -> Dict[str, Any]:
+    """报告摘要（带缓存），max_chars 默认 SHARED_CONTEXT_DIGEST_CHARS"""
+    return get_digest_cache().get_or_build(text or "", max_chars or Config.SHARED_CONTEXT_DIGEST_CHARS)
+
+
+if __name__ == "__main__":
+    # 独立测试
+    import time
+
+    report = """
+## 📈 BTC/USDT 技术分析报告
+当前价格：67250.5 USDT。
+### 1. 趋势分析
+- 价格位于20日均线上方，短期趋势偏多。
+- MACD 在零轴上方形成金叉，多头动能增强。
+### 2. 关键价位
+- 支撑位 65800 USDT，阻力位 68900 USDT，放量突破阻力后有望继续上涨。
+- RSI 为 62，尚未进入超买区间。
+### 3. 其他
+社区讨论较多。近期没有特别的事件。
+### 4. 结论
+综合来看技术面偏多，建议在回踩支撑位时分批买入，并将止损设在 65000 USDT 下方以控制风险。
+""" * 3
+
+    start = time.perf_counter()
+    digest = digest_report(report, 160)
+    first = time.perf_counter() - start
+    start = time.perf_counter()
+    digest_report(report, 160)
+    second = time.perf_counter() - start
+
+    print(f"原文 {digest['source_chars']} 字符 -> 摘要 {len(digest['summary'])} 字符，信号: {digest['signal']}")
+    print(f"要点: {digest['key_points']}")
+    print(f"首次 {first * 1000:.2f}ms，缓存命中 {second * 1000:.3f}ms，统计: {get_digest_cache().stats()}")
+    print("测试完成！")
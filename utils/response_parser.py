@@ -0,0 +1,141 @@
+"""
+自由文本响应解析
+把多个字段的候选正则预编译成带命名分组的交替式，一次扫描提取全部带标签的价格字段，
+替代逐条 re.search 的多次全文扫描（用于非JSON输出的兜底解析与当前价格提取）
+"""
+
+import re
+from typing import Dict, List, Sequence, Tuple
+
+# 数值（允许千分位逗号与小数），模式中以 {n} 表示
+NUMBER = r"\d+(?:,\d+)*(?:\.\d+)?"
+
+# 紧挨在某个位置之前的数值（用于以数值开头的候选：先定位数值后的标签，再向前读取数值）
+_TRAILING_NUMBER = re.compile(rf"(?<![\d,.])({NUMBER})\s*\Z")
+_TRAILING_WINDOW = 64
+
+# 交易价格字段的候选标签，按优先级排列（同一字段取优先级最高的匹配）
+TRADE_PRICE_PATTERNS: Dict[str, Tuple[str, ...]] = {
+    "entry_price": (
+        r"入场价格[：:]\s*{n}",
+        r"买入目标价[：:]\s*{n}",
+        r"建议在\s*{n}\s*USDT",
+        r"{n}\s*USDT\s*附近买入",
+        r"入场价[：:]\s*{n}",
+        r"买入价[：:]\s*{n}",
+        r"建议买入价格[：:]\s*{n}",
+        r"当前价格[：:]\s*{n}",
+        r"价格[：:]\s*{n}",
+    ),
+    "stop_loss": (
+        r"止损价格[：:]\s*{n}",
+        r"止损位[：:]\s*{n}",
+        r"设置止损位在\s*{n}",
+        r"止损位在\s*{n}",
+        r"止损价[：:]\s*{n}",
+        r"止损价位[：:]\s*{n}",
+        r"建议止损[：:]\s*{n}",
+    ),
+    "take_profit": (
+        r"止盈目标[：:]\s*{n}",
+        r"目标价[：:]\s*{n}",
+        r"目标价为\s*{n}",
+        r"目标价设定为\s*{n}",
+        r"止盈价[：:]\s*{n}",
+        r"止盈价位[：:]\s*{n}",
+        r"建议止盈[：:]\s*{n}",
+        r"目标价格[：:]\s*{n}",
+    ),
+}
+
+CURRENT_PRICE_PATTERNS: Dict[str, Tuple[str, ...]] = {
+    "current_price": (
+        r"当前价格[：:]\s*{n}",
+        r"价格[：:]\s*{n}",
+        r"{n}\s*USDT",
+        r"{n}\s*美元",
+    ),
+}
+
+
+class PatternBank:
+    """
+    预编译的字段模式库
+
+    所有字段中以标签开头的候选模式合并为一个交替式（每个候选的数值是一个命名分组），finditer 一次扫描全文。
+    以数值开头的候选（形如 {n}\\s*标签，如“67000 USDT 附近买入”）不能并入这个交替式——以 \\d 开头的分支会让 re
+    无法按首字符快速跳过无关文本，并在每个数字处回溯；这类候选改为合并扫描其后的标签，命中后再向前读取数值。
+    同一字段命中多个候选时取优先级最高者，同优先级取最先出现者。
+    交替式内匹配从左到右且不重叠，因此较长的标签（如“止损价格：”）不会再被较短的通用标签（如“价格：”）
+    重复匹配到其他字段
+    """
+
+    def __init__(self, patterns: Dict[str, Sequence[str]]):
+        self.patterns = {field: tuple(field_patterns) for field, field_patterns in patterns.items()}
+        self._slots: Dict[str, Tuple[str, int]] = {}
+        label_first: List[str] = []
+        number_first: List[str] = []
+        # 以数值开头的候选在各字段中的最高优先级：标签扫描已取得更高优先级的结果时跳过第二次扫描
+        self._suffix_floor: Dict[str, int] = {}
+        for field, field_patterns in self.patterns.items():
+            for priority, pattern in enumerate(field_patterns):
+                group = f"g{len(self._slots)}"
+                self._slots[group] = (field, priority)
+                if pattern.startswith("{n}"):
+                    if not pattern.startswith("{n}\\s*") or "{n}" in pattern[3:]:
+                        raise ValueError(f"以数值开头的模式必须形如 {{n}}\\s*标签: {pattern}")
+                    # 空分组标记命中的是哪个候选
+                    number_first.append(f"(?:{pattern[6:]}(?P<{group}>))")
+                    self._suffix_floor.setdefault(field, priority)
+                else:
+                    label_first.append(f"(?:{pattern.replace('{n}', f'(?P<{group}>{NUMBER})')})")
+
+        self._label_regex = re.compile("|".join(label_first)) if label_first else None
+        # 同一位置先尝试较长的标签，避免被较短的标签抢先匹配
+        number_first.sort(key=len, reverse=True)
+        self._suffix_regex = re.compile("|".join(number_first)) if number_first else None
+
+    def _offer(self, best: Dict[str, Tuple[int, str]], group: str, value: str):
+        field, priority = self._slots[group]
+        current = best.get(field)
+        if current is None or priority < current[0]:
+            best[field] = (priority, value.replace(",", ""))
+
+    def extract(self, text: str) -> Dict[str, str]:
+        """扫描提取各字段，返回 {字段: 去掉千分位逗号的数值文本}，未命中的字段不出现"""
+        best: Dict[str, Tuple[int, str]] = {}
+        if not text:
+            return {}
+        if self._label_regex is not None:
+            for match in self._label_regex.finditer(text):
+                self._offer(best, match.lastgroup, match.group(match.lastgroup))
+        if self._suffix_regex is not None and any(
+            field not in best or best[field][0] > floor for field, floor in self._suffix_floor.items()
+        ):
+            for match in self._suffix_regex.finditer(text):
+                start = match.start()
+                number = _TRAILING_NUMBER.search(text, max(0, start - _TRAILING_WINDOW), start)
+                if number:
+                    self._offer(best, match.lastgroup, number.group(1))
+        return {field: value for field, (_, value) in best.items()}
+
+    def extract_floats(self, text: str) -> Dict[str, float]:
+        """同 extract，数值转为 float"""
+        return {field: float(value) for field, value in self.extract(text).items()}
+
+
+TRADE_PRICE_BANK = PatternBank(TRADE_PRICE_PATTERNS)
+CURRENT_PRICE_BANK = PatternBank(CURRENT_PRICE_PATTERNS)
+
+
+if __name__ == "__main__":
+    # 独立测试
+    response = """当前价格：67,250.5 USDT
+入场价格：67000
+止损价格：65,500
+止盈目标：71000
+-最终交易建议: 买入"""
+    print(f"交易价格: {TRADE_PRICE_BANK.extract_floats(response)}")
+    print(f"当前价格: {CURRENT_PRICE_BANK.extract(response)}")
+    print(f"只有止损价格时不会误作入场价: {TRADE_PRICE_BANK.extract('止损价格：100')}")
+    print("测试完成！")
@@ -0,0 +1,333 @@
+"""
+DAG调度模块
+根据智能体声明的 AgentState 读写字段构建依赖图，并发执行所有就绪节点
+"""
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+def fields_overlap(field_a: str, field_b: str) -> bool:
+    """判断两个状态字段是否重叠（相同或存在前缀关系，如 research_consensus 与 research_consensus.bull_analysis）"""
+    if field_a == field_b:
+        return True
+    return field_a.startswith(field_b + ".") or field_b.startswith(field_a + ".")
+
+
+@dataclass
+class TaskNode:
+    """调度节点"""
+    name: str
+    func: Optional[Callable[[Any], Any]]
+    afunc: Optional[Callable[[Any], Awaitable[Any]]] = None
+    reads: Tuple[str, ...] = ()
+    writes: Tuple[str, ...] = ()
+    cost: float = 1.0
+    depends_on: Set[str] = field(default_factory=set)
+
+
+class DAGScheduler:
+    """声明式DAG调度器"""
+
+    def __init__(self, max_workers: int = 8):
+        self.max_workers = max(1, max_workers)
+        self.nodes: Dict[str, TaskNode] = {}
+        self._graph_built = False
+
+    def add_node(self, name: str, func: Optional[Callable[[Any], Any]], reads=(), writes=(), cost: float = 1.0,
+                 afunc: Optional[Callable[[Any], Awaitable[Any]]] = None) -> TaskNode:
+        """添加调度节点（afunc 为可选的协程版本，供 arun 使用）"""
+        if name in self.nodes:
+            raise ValueError(f"重复的调度节点: {name}")
+
+        node = TaskNode(name=name, func=func, afunc=afunc, reads=tuple(reads), writes=tuple(writes), cost=float(cost))
+        self.nodes[name] = node
+        self._graph_built = False
+        return node
+
+    def add_agent(self, agent: Any, name: Optional[str] = None) -> TaskNode:
+        """
+        添加智能体节点
+
+        agent 可以是实例（run 执行 agent.process，arun 执行 agent.aprocess）或类（仅用于 dry-run 规划），
+        读写字段取自 agent.reads / agent.writes，预估耗时取自 agent.estimated_cost
+        """
+        node_name = name or getattr(agent, "name", None) or getattr(agent, "__name__", str(agent))
+        is_class = isinstance(agent, type)
+        return self.add_node(
+            node_name,
+            None if is_class else agent.process,
+            reads=getattr(agent, "reads", ()),
+            writes=getattr(agent, "writes", ()),
+            cost=getattr(agent, "estimated_cost", 1.0),
+            afunc=None if is_class else getattr(agent, "aprocess", None)
+        )
+
+    def build_graph(self) -> Dict[str, Set[str]]:
+        """根据读写声明构建依赖图"""
+        names = list(self.nodes)
+
+        for node in self.nodes.values():
+            node.depends_on = set()
+
+        for index, name in enumerate(names):
+            node = self.nodes[name]
+            for other_index, other_name in enumerate(names):
+                if other_name == name:
+                    continue
+                other = self.nodes[other_name]
+
+                # 读后写依赖：读取的字段由其他节点写入
+                if any(fields_overlap(r, w) for r in node.reads for w in other.writes):
+                    node.depends_on.add(other_name)
+                # 写写冲突：按注册顺序串行，保证结果确定
+                elif other_index < index and any(fields_overlap(w, ow) for w in node.writes for ow in other.writes):
+                    logger.warning(f"调度节点 {other_name} 与 {name} 写入相同字段，按注册顺序串行执行")
+                    node.depends_on.add(other_name)
+
+        self.topological_order()
+        self._graph_built = True
+        return {name: set(node.depends_on) for name, node in self.nodes.items()}
+
+    def topological_order(self) -> List[str]:
+        """拓扑排序，存在环时抛出 ValueError"""
+        indegree = {name: len(node.depends_on) for name, node in self.nodes.items()}
+        ready = [name for name in self.nodes if indegree[name] == 0]
+        order = []
+
+        while ready:
+            name = ready.pop(0)
+            order.append(name)
+            for dependent in self._dependents(name):
+                indegree[dependent] -= 1
+                if indegree[dependent] == 0:
+                    ready.append(dependent)
+
+        if len(order) != len(self.nodes):
+            cyclic = [name for name in self.nodes if name not in order]
+            raise ValueError(f"调度图存在循环依赖: {cyclic}")
+
+        return order
+
+    def _dependents(self, name: str) -> List[str]:
+        """获取依赖指定节点的所有节点"""
+        return [other for other, node in self.nodes.items() if name in node.depends_on]
+
+    def upstream(self, name: str) -> Set[str]:
+        """获取节点及其全部上游依赖节点"""
+        self._ensure_graph()
+        if name not in self.nodes:
+            raise KeyError(f"未知的调度节点: {name}")
+
+        required, pending = set(), [name]
+        while pending:
+            current = pending.pop()
+            if current not in required:
+                required.add(current)
+                pending.extend(self.nodes[current].depends_on)
+        return required
+
+    def _ensure_graph(self):
+        if not self._graph_built:
+            self.build_graph()
+
+    def plan(self) -> Dict[str, Any]:
+        """计算执行计划：分层、关键路径与预期并行度"""
+        self._ensure_graph()
+        order = self.topological_order()
+
+        # 最早完成时间与关键路径前驱
+        finish: Dict[str, float] = {}
+        previous: Dict[str, Optional[str]] = {}
+        level: Dict[str, int] = {}
+        for name in order:
+            node = self.nodes[name]
+            start = 0.0
+            previous[name] = None
+            level[name] = 0
+            for dep in node.depends_on:
+                if finish[dep] > start:
+                    start = finish[dep]
+                    previous[name] = dep
+                level[name] = max(level[name], level[dep] + 1)
+            finish[name] = start + node.cost
+
+        critical_path: List[str] = []
+        if finish:
+            cursor = max(finish, key=finish.get)
+            while cursor:
+                critical_path.insert(0, cursor)
+                cursor = previous[cursor]
+
+        levels: List[List[str]] = []
+        for name in order:
+            while len(levels) <= level[name]:
+                levels.append([])
+            levels[level[name]].append(name)
+
+        total_cost = sum(node.cost for node in self.nodes.values())
+        critical_path_cost = max(finish.values()) if finish else 0.0
+
+        return {
+            "levels": levels,
+            "critical_path": critical_path,
+            "critical_path_cost": critical_path_cost,
+            "total_cost": total_cost,
+            "expected_parallelism": total_cost / critical_path_cost if critical_path_cost else 0.0,
+            "max_width": max((len(names) for names in levels), default=0)
+        }
+
+    def format_plan(self) -> str:
+        """格式化执行计划（dry-run 输出）"""
+        plan = self.plan()
+        lines = ["📋 执行计划（dry-run）:"]
+
+        for index, names in enumerate(plan["levels"]):
+            lines.append(f"  层级 {index + 1}: {', '.join(names)}")
+            for name in names:
+                deps = sorted(self.nodes[name].depends_on)
+                lines.append(f"    - {name} (预估 {self.nodes[name].cost:g}) ← {', '.join(deps) if deps else '无依赖'}")
+
+        lines.append(f"🔗 关键路径: {' → '.join(plan['critical_path'])}")
+        lines.append(f"⏱️ 关键路径耗时: {plan['critical_path_cost']:g} / 串行总耗时: {plan['total_cost']:g}")
+        lines.append(f"⚡ 预期并行度: {plan['expected_parallelism']:.2f}（最大并发节点数 {plan['max_width']}）")
+        return "\n".join(lines)
+
+    def run(self, state: Any) -> Any:
+        """执行调度图，节点失败时记录错误并继续执行下游节点"""
+        self._ensure_graph()
+
+        remaining = {name: set(node.depends_on) for name, node in self.nodes.items()}
+        timings: Dict[str, float] = {}
+        failed: List[str] = []
+        run_start = time.perf_counter()
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="dag") as executor:
+            running = {}
+
+            def submit_ready():
+                for name in [n for n, deps in remaining.items() if not deps]:
+                    del remaining[name]
+                    logger.info(f"调度执行 {name}")
+                    running[executor.submit(self._run_node, self.nodes[name], state)] = name
+
+            submit_ready()
+            while running:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        timings[name] = future.result()
+                    except Exception as e:
+                        logger.error(f"{name} 执行失败: {e}")
+                        failed.append(name)
+                    for deps in remaining.values():
+                        deps.discard(name)
+                submit_ready()
+
+        self._record_telemetry(state, timings, failed, time.perf_counter() - run_start)
+        return state
+
+    async def arun(self, state: Any) -> Any:
+        """在当前事件循环中执行调度图（协程版本，不占用线程池），失败处理与 run 相同"""
+        self._ensure_graph()
+
+        remaining = {name: set(node.depends_on) for name, node in self.nodes.items()}
+        timings: Dict[str, float] = {}
+        failed: List[str] = []
+        run_start = time.perf_counter()
+        running: Dict[asyncio.Task, str] = {}
+
+        def submit_ready():
+            for name in [n for n, deps in remaining.items() if not deps]:
+                del remaining[name]
+                logger.info(f"调度执行 {name}")
+                running[asyncio.ensure_future(self._arun_node(self.nodes[name], state))] = name
+
+        submit_ready()
+        while running:
+            done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                name = running.pop(task)
+                try:
+                    timings[name] = task.result()
+                except Exception as e:
+                    logger.error(f"{name} 执行失败: {e}")
+                    failed.append(name)
+                for deps in remaining.values():
+                    deps.discard(name)
+            submit_ready()
+
+        self._record_telemetry(state, timings, failed, time.perf_counter() - run_start)
+        return state
+
+    def _record_telemetry(self, state: Any, timings: Dict[str, float], failed: List[str], wall_time: float):
+        """记录调度遥测到 state.telemetry"""
+        serial_time = sum(timings.values())
+        logger.info(f"调度完成，耗时 {wall_time:.2f}s（串行累计 {serial_time:.2f}s）")
+
+        telemetry = getattr(state, "telemetry", None)
+        if isinstance(telemetry, dict):
+            telemetry["scheduler"] = {
+                "node_timings": timings,
+                "failed_nodes": failed,
+                "wall_time": wall_time,
+                "serial_time": serial_time,
+                "speedup": serial_time / wall_time if wall_time else 0.0
+            }
+
+    def _run_node(self, node: TaskNode, state: Any) -> float:
+        """执行单个节点并返回耗时"""
+        if node.func is None:
+            raise RuntimeError(f"节点 {node.name} 未绑定可执行函数")
+
+        start = time.perf_counter()
+        node.func(state)
+        return time.perf_counter() - start
+
+    async def _arun_node(self, node: TaskNode, state: Any) -> float:
+        """执行单个节点（协程版本）；未提供 afunc 时在线程中执行 func"""
+        if node.afunc is None and node.func is None:
+            raise RuntimeError(f"节点 {node.name} 未绑定可执行函数")
+
+        start = time.perf_counter()
+        if node.afunc is not None:
+            await node.afunc(state)
+        else:
+            await asyncio.to_thread(node.func, state)
+        return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    # 独立测试
+    from utils.state import AgentState
+
+    def make_task(report_type, delay):
+        def task(state):
+            time.sleep(delay)
+            state.update_analysis_report(report_type, {"analysis": f"{report_type} done"})
+        return task
+
+    scheduler = DAGScheduler()
+    scheduler.add_node("technical", make_task("technical", 0.2), writes=("analysis_reports.technical",))
+    scheduler.add_node("news", make_task("news", 0.1), writes=("analysis_reports.news",))
+    scheduler.add_node("bull", lambda s: time.sleep(0.1), reads=("analysis_reports",), writes=("research_consensus.bull_analysis",))
+    scheduler.add_node("bear", lambda s: time.sleep(0.1), reads=("analysis_reports",), writes=("research_consensus.bear_analysis",))
+    scheduler.add_node("manager", lambda s: None, reads=("research_consensus.bull_analysis", "research_consensus.bear_analysis"), writes=("research_consensus.manager_consensus",))
+
+    print(scheduler.format_plan())
+
+    state = AgentState("BTC/USDT")
+    scheduler.run(state)
+    print(f"调度遥测: {state.telemetry.get('scheduler')}")
+
+    async_state = AgentState("ETH/USDT")
+    asyncio.run(scheduler.arun(async_state))
+    print(f"异步调度遥测: {async_state.telemetry.get('scheduler')}")
+    print("测试完成！")
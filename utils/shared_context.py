@@ -0,0 +1,107 @@
+"""
+单次运行共享的提示词上下文
+四份分析师报告在同一次分析中被看涨/看跌研究员、研究经理、三位风险分析师反复嵌入提示词，
+这里只渲染一次并缓存（完整版 / 摘要版），下游智能体直接引用，减少重复拼接与提示词token
+"""
+
+import threading
+from typing import Any, Dict, Optional, Tuple
+from utils.config import Config
+from utils.report_digest import digest_report
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# (报告类型, 标题, 缺失时的占位文本)
+ANALYST_SECTIONS: Tuple[Tuple[str, str, str], ...] = (
+    ("technical", "技术分析报告", "无技术分析数据"),
+    ("fundamental", "基本面分析报告", "无基本面分析数据"),
+    ("news", "新闻分析报告", "无新闻分析数据"),
+    ("social", "社交情绪分析报告", "无社交分析数据"),
+)
+
+CONTEXT_MODES = ("full", "digest")
+
+
+class SharedContext:
+    """分析师报告块：同一份报告只渲染一次，报告更新后自动重新渲染"""
+
+    def __init__(self, state: Any):
+        self.state = state
+        self._lock = threading.Lock()
+        self._cache: Dict[Tuple[str, int], str] = {}
+        self._version: Optional[Tuple[int, int]] = None
+        self.stats = {"renders": 0, "hits": 0}
+
+    def _current_version(self) -> Tuple[int, int]:
+        # 直接替换 analysis_reports 字典（测试中常见）时 id 也会变化
+        return getattr(self.state, "reports_version", 0), id(self.state.analysis_reports)
+
+    def report_text(self, report_type: str, mode: str = "full") -> str:
+        """单份报告的正文（缺失时返回占位文本）"""
+        placeholder = next((p for key, _, p in ANALYST_SECTIONS if key == report_type), "无分析数据")
+        report = (self.state.analysis_reports or {}).get(report_type)
+        if not report:
+            return placeholder
+        text = report.get("analysis") if isinstance(report, dict) else str(report)
+        if not text:
+            return placeholder
+        if mode != "digest":
+            return text
+        # 分析师写入报告时已生成摘要；其他来源的报告按内容哈希现算（有缓存）
+        summary = report.get("summary") if isinstance(report, dict) else None
+        return summary or digest_report(text)["summary"]
+
+    def _render(self, mode: str) -> str:
+        sections = [f"## {title}\n{self.report_text(key, mode)}" for key, title, _ in ANALYST_SECTIONS]
+        return "\n\n".join(sections)
+
+    def analyst_block(self, mode: Optional[str] = None) -> str:
+        """四份分析师报告的提示词块；mode 为 full（完整）或 digest（摘要），默认 SHARED_CONTEXT_MODE"""
+        mode = mode or Config.SHARED_CONTEXT_MODE
+        if mode not in CONTEXT_MODES:
+            mode = "full"
+
+        with self._lock:
+            version = self._current_version()
+            if version != self._version:
+                self._cache.clear()
+                self._version = version
+
+            key = (mode, version[0])
+            block = self._cache.get(key)
+            if block is not None:
+                self.stats["hits"] += 1
+                return block
+
+            block = self._render(mode)
+            self._cache[key] = block
+            self.stats["renders"] += 1
+            return block
+
+    def summary(self) -> Dict[str, Any]:
+        """渲染统计与各版本长度，写入运行遥测"""
+        with self._lock:
+            sizes = {mode: len(block) for (mode, _), block in self._cache.items()}
+            return {**self.stats, "chars": sizes}
+
+
+if __name__ == "__main__":
+    # 独立测试
+    from utils.state import AgentState
+
+    state = AgentState("BTC/USDT")
+    state.update_analysis_report("technical", {"analysis": "BTC技术面显示多头趋势。RSI为65，MACD金叉。" * 30})
+    state.update_analysis_report("news", {"analysis": "近期新闻情绪正面，机构投资增加。"})
+
+    context = state.shared_context
+    full = context.analyst_block("full")
+    for _ in range(7):
+        context.analyst_block("full")
+    digest = context.analyst_block("digest")
+    print(f"完整版 {len(full)} 字符，摘要版 {len(digest)} 字符")
+    print(f"统计: {context.summary()}")
+
+    state.update_analysis_report("social", {"analysis": "社交媒体情绪积极。"})
+    print(f"报告更新后重新渲染: {'社交媒体情绪积极' in context.analyst_block('full')}，统计: {context.stats}")
+    print("测试完成！")
@@ -0,0 +1,193 @@
+"""
+请求合并模块（single-flight）
+相同键的请求在途时，后来的调用方等待第一个调用的结果而不重复发起请求；
+同步调用（线程）与异步调用（事件循环）分别合并
+"""
+
+import asyncio
+import threading
+import weakref
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class _Call:
+    """一次在途的同步调用"""
+
+    __slots__ = ("done", "result", "error", "duplicates")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.duplicates = 0
+
+
+class _AsyncCall:
+    """一次在途的异步调用：func() 在单独的任务中执行，不属于任何调用方"""
+
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: "asyncio.Task"):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """具名请求合并组"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        # 事件循环 -> {键: 在途调用}；任务不能跨事件循环等待
+        self._async_calls: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Hashable, _AsyncCall]]" = weakref.WeakKeyDictionary()
+        self.executed = 0
+        self.saved = 0
+
+    def do(self, key: Hashable, func: Callable[[], Any]) -> Any:
+        """执行 func；相同键的调用在途时等待其结果（异常同样传递给所有等待方）"""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.duplicates += 1
+                self.saved += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                self.executed += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+            if call.duplicates:
+                logger.debug(f"{self.name} 合并了 {call.duplicates} 个相同请求")
+
+    async def ado(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        异步版本：执行 func() 返回的协程；相同键的调用在途时等待其结果
+
+        协程在合并组持有的任务中执行，任何调用方（包括第一个）被取消都只取消自己的等待；
+        所有调用方都取消后才取消该任务
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            loop_calls = self._async_calls.setdefault(loop, {})
+            call = loop_calls.get(key)
+            if call is not None:
+                self.saved += 1
+            else:
+                call = _AsyncCall(loop.create_task(func()))
+                loop_calls[key] = call
+                self.executed += 1
+                call.task.add_done_callback(lambda task: self._finish_async(loop_calls, key, call))
+            call.waiters += 1
+
+        try:
+            return await asyncio.shield(call.task)
+        except asyncio.CancelledError:
+            if not call.task.done():
+                with self._lock:
+                    call.waiters -= 1
+                    abandoned = call.waiters == 0
+                    if abandoned and loop_calls.get(key) is call:
+                        # 之后的相同请求重新执行，而不是等待正在取消的任务
+                        del loop_calls[key]
+                if abandoned:
+                    call.task.cancel()
+            raise
+
+    def _finish_async(self, loop_calls: Dict[Hashable, _AsyncCall], key: Hashable, call: _AsyncCall):
+        """异步调用结束：移除在途记录"""
+        with self._lock:
+            if loop_calls.get(key) is call:
+                del loop_calls[key]
+        # 所有调用方都已取消时避免 "exception was never retrieved" 警告
+        if not call.task.cancelled():
+            call.task.exception()
+        if call.waiters > 1:
+            logger.debug(f"{self.name} 合并了 {call.waiters - 1} 个相同请求")
+
+    def stats(self) -> Dict[str, int]:
+        """获取合并统计：实际执行次数与节省的调用次数"""
+        with self._lock:
+            in_flight = len(self._calls) + sum(len(calls) for calls in self._async_calls.values())
+            return {
+                "executed": self.executed,
+                "saved": self.saved,
+                "in_flight": in_flight
+            }
+
+
+_groups: Dict[str, SingleFlight] = {}
+_groups_lock = threading.Lock()
+
+
+def get_singleflight(name: str) -> SingleFlight:
+    """获取（必要时创建）具名请求合并组，如 "http"、"llm" """
+    with _groups_lock:
+        group = _groups.get(name)
+        if group is None:
+            group = SingleFlight(name)
+            _groups[name] = group
+        return group
+
+
+def get_singleflight_stats() -> Dict[str, Dict[str, int]]:
+    """获取全部请求合并组的统计"""
+    with _groups_lock:
+        return {name: group.stats() for name, group in _groups.items()}
+
+
+if __name__ == "__main__":
+    # 独立测试
+    import time
+    from concurrent.futures import ThreadPoolExecutor
+
+    group = get_singleflight("demo")
+
+    def slow_fetch():
+        time.sleep(0.2)
+        return {"news": ["BTC ETF"]}
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(lambda _: group.do("general_news", slow_fetch), range(8)))
+    print(f"8个线程请求，结果一致: {all(result is results[0] for result in results)}")
+
+    async def slow_afetch():
+        await asyncio.sleep(0.2)
+        return "ok"
+
+    async def run_async():
+        return await asyncio.gather(*(group.ado("general_news", slow_afetch) for _ in range(8)))
+
+    print(f"8个协程请求: {asyncio.run(run_async())}")
+
+    async def run_cancel_leader():
+        leader = asyncio.ensure_future(group.ado("general_news", slow_afetch))
+        await asyncio.sleep(0.05)
+        waiter = asyncio.ensure_future(group.ado("general_news", slow_afetch))
+        await asyncio.sleep(0.05)
+        leader.cancel()
+        return await waiter
+
+    print(f"第一个调用方被取消后，其他等待方仍得到结果: {asyncio.run(run_cancel_leader())}")
+    print(f"统计: {get_singleflight_stats()}（预期 executed=3, saved=15）")
+    print("测试完成！")
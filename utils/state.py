@@ -6,6 +6,7 @@ AgentState 和 AgentMessage 定义
 from typing import Dict, Any, Optional
 from dataclasses import dataclass, field
 import json
+import threading
 
 
 @dataclass
@@ -27,6 +28,9 @@ class AgentState:
         self.currency_name = symbol.split('/')[1] if '/' in symbol else "USDT"
         self.currency_symbol = self.currency_name
         
+        # 并发写入保护（分析师并行执行时共享同一个状态）
+        self._lock = threading.Lock()
+        
         # 分析报告存储
         self.analysis_reports: Dict[str, Any] = {
             "technical": None,
@@ -40,23 +44,51 @@ class AgentState:
         
         # 交易决策
         self.trade_decision: Optional[Dict[str, Any]] = None
+        self.trading_decision: Optional[Dict[str, Any]] = None
         
         # 风险评估
         self.risk_assessment: Optional[Dict[str, Any]] = None
+        self.final_risk_decision: Optional[Dict[str, Any]] = None
         
         # 辩论历史
         self.debate_history: list = []
         
         # 最终输出
         self.final_output: Optional[Dict[str, Any]] = None
+        
+        # 运行遥测（调度耗时等）
+        self.telemetry: Dict[str, Any] = {}
+        
+        # 分析报告版本号（报告更新时递增，共享上下文据此失效缓存）
+        self.reports_version = 0
+        self._shared_context = None
+    
+    @property
+    def shared_context(self):
+        """本次运行共享的提示词上下文（首次访问时创建）"""
+        with self._lock:
+            if self._shared_context is None:
+                from utils.shared_context import SharedContext
+                self._shared_context = SharedContext(self)
+            return self._shared_context
     
     def update_analysis_report(self, report_type: str, report_data: Dict[str, Any]):
-        """更新分析报告"""
-        self.analysis_reports[report_type] = report_data
+        """更新分析报告（线程安全）"""
+        with self._lock:
+            self.analysis_reports[report_type] = report_data
+            self.reports_version += 1
+    
+    def update_research_consensus(self, key: str, value: Dict[str, Any]):
+        """更新研究共识中的单个条目（线程安全，不覆盖其他研究员的结果）"""
+        with self._lock:
+            if self.research_consensus is None:
+                self.research_consensus = {}
+            self.research_consensus[key] = value
     
     def add_debate_message(self, message: AgentMessage):
-        """添加辩论消息"""
-        self.debate_history.append(message)
+        """添加辩论消息（线程安全）"""
+        with self._lock:
+            self.debate_history.append(message)
     
     def get_all_analysis_reports(self) -> Dict[str, Any]:
         """获取所有分析报告"""
@@ -72,9 +104,12 @@ class AgentState:
             "analysis_reports": self.analysis_reports,
             "research_consensus": self.research_consensus,
             "trade_decision": self.trade_decision,
+            "trading_decision": self.trading_decision,
             "risk_assessment": self.risk_assessment,
+            "final_risk_decision": self.final_risk_decision,
             "debate_history": [msg.__dict__ for msg in self.debate_history],
-            "final_output": self.final_output
+            "final_output": self.final_output,
+            "telemetry": self.telemetry
         }
     
     def save_to_json(self, filepath: str):
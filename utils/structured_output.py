@@ -0,0 +1,229 @@
+"""
+结构化输出
+让模型以JSON对象输出决策字段（JSON模式），一次解析并按字段模式校验；
+只有未通过校验的字段会在同一对话中追问重答，不重跑整次调用
+"""
+
+import json
+import re
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from utils.config import Config
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+JSON_OBJECT_FORMAT = {"type": "json_object"}
+
+_FENCED_JSON = re.compile(r"```(?:json)?\s*(\{.*?\})\s*```", re.S)
+
+
+@dataclass(frozen=True)
+class SchemaField:
+    """
+    字段定义：kind 为 choice（枚举）、number（数值）或 text（文本）
+
+    aliases 为枚举值的常见别名（如 ("中等风险", "medium")），校验时规范化为对应取值；
+    default 为追问后仍未通过校验时使用的默认值
+    """
+    name: str
+    kind: str
+    description: str
+    choices: Tuple[str, ...] = ()
+    minimum: Optional[float] = None
+    maximum: Optional[float] = None
+    nullable: bool = False
+    aliases: Tuple[Tuple[str, str], ...] = ()
+    default: Any = None
+
+    def validate(self, value: Any) -> Tuple[Any, Optional[str]]:
+        """校验并规范化字段值，返回 (值, 错误信息)"""
+        if value is None or value == "":
+            return (None, None) if self.nullable else (None, "缺失")
+
+        if self.kind == "choice":
+            text = str(value).strip()
+            text = dict(self.aliases).get(text, text)
+            if text not in self.choices:
+                # 英文取值不区分大小写
+                text = next((choice for choice in self.choices if choice.lower() == text.lower()), text)
+            return (text, None) if text in self.choices else (None, f"必须是 {' / '.join(self.choices)} 之一")
+
+        if self.kind == "number":
+            try:
+                number = float(str(value).replace(",", "").strip().rstrip("%"))
+            except ValueError:
+                return None, "必须是数值"
+            # 0-1 比例字段允许模型给出百分数（"30%" 表示 0.3）
+            if self.maximum == 1 and str(value).strip().endswith("%"):
+                number /= 100
+            if self.minimum is not None and number < self.minimum:
+                return None, f"不能小于 {self.minimum}"
+            if self.maximum is not None and number > self.maximum:
+                return None, f"不能大于 {self.maximum}"
+            return number, None
+
+        text = str(value).strip()
+        return (text, None) if text else (None, "不能为空")
+
+
+@dataclass(frozen=True)
+class OutputSchema:
+    """JSON输出模式；checks 为跨字段校验，返回 {字段: 错误信息}"""
+    name: str
+    fields: Tuple[SchemaField, ...]
+    checks: Tuple[Callable[[Dict[str, Any]], Dict[str, str]], ...] = ()
+
+    def format_instructions(self) -> str:
+        """输出格式说明（写入提示词静态前缀）"""
+        lines = ["只输出一个JSON对象，不要输出其他内容，字段如下："]
+        for spec in self.fields:
+            detail = spec.description
+            if spec.choices:
+                detail += f"，取值：{' / '.join(spec.choices)}"
+            if spec.nullable:
+                detail += "，不适用时为 null"
+            lines.append(f'- "{spec.name}"：{detail}')
+        return "\n".join(lines)
+
+    def field(self, name: str) -> SchemaField:
+        """按名称取字段定义"""
+        return next(spec for spec in self.fields if spec.name == name)
+
+    def validate(self, data: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, str]]:
+        """逐字段校验，返回 (通过校验的字段, {字段: 错误信息})"""
+        values, errors = {}, {}
+        for spec in self.fields:
+            value, error = spec.validate(data.get(spec.name))
+            if error:
+                errors[spec.name] = error
+            else:
+                values[spec.name] = value
+        if not errors:
+            for check in self.checks:
+                errors.update(check(values))
+        return values, errors
+
+
+@dataclass
+class StructuredResult:
+    """结构化调用结果"""
+    values: Dict[str, Any]
+    errors: Dict[str, str]
+    raw: str
+    parsed: bool
+    repairs: int = 0
+
+    @property
+    def ok(self) -> bool:
+        return self.parsed and not self.errors
+
+
+def extract_json(text: str) -> Optional[Dict[str, Any]]:
+    """解析模型输出中的JSON对象（整段JSON、```json 代码块或第一个 {...}），失败返回 None"""
+    if not text:
+        return None
+    candidates = [text.strip()]
+    fenced = _FENCED_JSON.search(text)
+    if fenced:
+        candidates.append(fenced.group(1))
+    start, end = text.find("{"), text.rfind("}")
+    if 0 <= start < end:
+        candidates.append(text[start:end + 1])
+
+    for candidate in candidates:
+        try:
+            data = json.loads(candidate)
+        except ValueError:
+            continue
+        if isinstance(data, dict):
+            return data
+    return None
+
+
+def _repair_messages(messages: List[Dict[str, str]], response: str, errors: Dict[str, str]) -> List[Dict[str, str]]:
+    """在原对话后追问未通过校验的字段（前缀与原请求一致，可命中提示词前缀缓存）"""
+    problems = "\n".join(f'- "{name}"：{error}' for name, error in errors.items())
+    return messages + [
+        {"role": "assistant", "content": response},
+        {"role": "user", "content": f"以下字段未通过校验：\n{problems}\n只重新输出这些字段，格式为JSON对象，不要输出其他字段。"}
+    ]
+
+
+def _merge(schema: OutputSchema, result: StructuredResult, response: str):
+    """合并追问结果：只接受此前失败的字段，然后整体复核跨字段约束"""
+    data = extract_json(response) or {}
+    candidate = dict(result.values)
+    for name in result.errors:
+        if name in data:
+            candidate[name] = data[name]
+    result.values, result.errors = schema.validate(candidate)
+
+
+def _first_pass(schema: OutputSchema, response: str) -> StructuredResult:
+    data = extract_json(response)
+    if data is None:
+        return StructuredResult({}, {}, response, parsed=False)
+    values, errors = schema.validate(data)
+    return StructuredResult(values, errors, response, parsed=True)
+
+
+def request_structured(schema: OutputSchema, chat: Callable[[List[Dict[str, str]]], str],
+                       messages: List[Dict[str, str]], max_repairs: Optional[int] = None) -> StructuredResult:
+    """
+    调用模型并解析JSON输出
+
+    Args:
+        schema: 输出模式
+        chat: 以消息列表调用模型（应启用JSON模式）并返回文本
+        messages: 初始消息
+        max_repairs: 字段追问次数上限，默认 STRUCTURED_OUTPUT_REPAIRS
+
+    Returns:
+        StructuredResult；输出不是JSON时 parsed 为 False（由调用方按文本解析）
+    """
+    max_repairs = Config.STRUCTURED_OUTPUT_REPAIRS if max_repairs is None else max_repairs
+    response = chat(messages)
+    result = _first_pass(schema, response)
+    while result.parsed and result.errors and result.repairs < max_repairs:
+        logger.info(f"{schema.name} 字段未通过校验，追问: {result.errors}")
+        repair_response = chat(_repair_messages(messages, response, result.errors))
+        result.repairs += 1
+        _merge(schema, result, repair_response)
+    return result
+
+
+async def arequest_structured(schema: OutputSchema, achat: Callable[[List[Dict[str, str]]], Awaitable[str]],
+                              messages: List[Dict[str, str]], max_repairs: Optional[int] = None) -> StructuredResult:
+    """异步调用模型并解析JSON输出，参数与返回值同 request_structured"""
+    max_repairs = Config.STRUCTURED_OUTPUT_REPAIRS if max_repairs is None else max_repairs
+    response = await achat(messages)
+    result = _first_pass(schema, response)
+    while result.parsed and result.errors and result.repairs < max_repairs:
+        logger.info(f"{schema.name} 字段未通过校验，追问: {result.errors}")
+        repair_response = await achat(_repair_messages(messages, response, result.errors))
+        result.repairs += 1
+        _merge(schema, result, repair_response)
+    return result
+
+
+if __name__ == "__main__":
+    # 独立测试（模拟模型输出）
+    schema = OutputSchema("demo", (
+        SchemaField("decision", "choice", "交易决策", choices=("买入", "卖出", "观望")),
+        SchemaField("entry_price", "number", "入场价格", minimum=0, nullable=True),
+        SchemaField("position_size", "number", "仓位比例（0-1）", minimum=0, maximum=1),
+    ))
+    print(schema.format_instructions())
+
+    replies = iter(['{"decision": "买入", "entry_price": "67,250", "position_size": "很多"}', '{"position_size": 0.3}'])
+    calls = []
+
+    def fake_chat(messages):
+        calls.append(messages)
+        return next(replies)
+
+    result = request_structured(schema, fake_chat, [{"role": "user", "content": "分析BTC"}], max_repairs=1)
+    print(f"结果: {result.values}，剩余错误: {result.errors}，追问 {result.repairs} 次，追问消息数 {len(calls[-1])}")
+    print(f"非JSON输出: parsed={request_structured(schema, lambda m: '建议买入', [], 1).parsed}")
+    print("测试完成！")